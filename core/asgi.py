@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# each request's sync code runs in its own thread here, so connections
+# kept open past a request would never be reused, only pooled ones are
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
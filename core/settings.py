@@ -52,11 +52,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'salon.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'salon.replicas.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,6 +94,27 @@ WSGI_APPLICATION = 'core.wsgi.application'
 #     }
 # }
 
+# psycopg 3 with Django's connection pool, one pool per process created on
+# first use (don't touch the database before workers fork). Keep workers x
+# DB_POOL_MAX_SIZE under the server's max_connections. DB_POOL=False falls
+# back to persistent connections kept DB_CONN_MAX_AGE seconds, which
+# core.asgi turns off because ASGI requests don't share threads.
+# DB_STATEMENT_TIMEOUT is in milliseconds, 0 for none.
+DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+DB_OPTIONS = {
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+    'options': f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT', '0'))}",
+}
+if DB_POOL:
+    DB_OPTIONS['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # seconds a request waits for a free connection before failing
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -100,9 +123,49 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        # checks pooled connections on checkout too
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': DB_OPTIONS,
     }
 }
 
+# read-only replica that owners' report and export reads go to, e.g.
+# DB_REPLICA_HOST=localhost to try the routing against the primary itself.
+# Reads stay on default for REPLICA_READ_YOUR_WRITES_SECONDS after the user
+# or the salon last wrote, keep it above the usual replication lag
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['salon.replicas.ReplicaRouter']
+REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', '10'))
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Redis (or any Redis-compatible server) when REDIS_URL is set, so that
+# every worker shares the report cache and its version counters
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -158,7 +221,8 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.SessionAuthentication',
         # 'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        # request.user from the token and the cached SalonAccess, no user query
+        'salon.authentication.SalonJWTAuthentication'
     ],
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 10,
@@ -171,11 +235,71 @@ REST_FRAMEWORK = {
 }
 
 
+# seconds a user's role / salon memberships are cached for permission checks
+SALON_ACCESS_CACHE_TTL = int(os.getenv('SALON_ACCESS_CACHE_TTL', '60'))
+
+# quick staff switching by PIN on shared salon devices: seconds the
+# salon's PIN verifiers are cached, wrong PINs a device may enter per
+# staff member and in all before it locks for STAFF_PIN_LOCKOUT seconds,
+# and the lifetime in seconds of the token a switch returns
+STAFF_PIN_CACHE_TTL = int(os.getenv('STAFF_PIN_CACHE_TTL', '300'))
+STAFF_PIN_MAX_FAILURES = int(os.getenv('STAFF_PIN_MAX_FAILURES', '5'))
+STAFF_PIN_DEVICE_MAX_FAILURES = int(os.getenv('STAFF_PIN_DEVICE_MAX_FAILURES', '20'))
+STAFF_PIN_LOCKOUT = int(os.getenv('STAFF_PIN_LOCKOUT', '300'))
+STAFF_SWITCH_TOKEN_LIFETIME = int(os.getenv('STAFF_SWITCH_TOKEN_LIFETIME', '900'))
+
+# seconds a report response is cached, writes invalidate it sooner
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', '300'))
+
+# rows per stream of a salon changes page, and without PostgreSQL how far
+# behind the clock the changes feed stops so late commits are not skipped
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '200'))
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '5'))
+
+# live receipt events: the broker shares them between workers (Redis
+# Streams) or keeps them in process, where they can't be streamed, the
+# last LIVE_HISTORY_SIZE per salon can be resumed with Last-Event-ID
+LIVE_BROKER = os.getenv(
+    'LIVE_BROKER',
+    'salon.live.RedisLiveBroker' if REDIS_URL else 'salon.live.InProcessLiveBroker')
+LIVE_HISTORY_SIZE = int(os.getenv('LIVE_HISTORY_SIZE', '1000'))
+LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', '0.5'))
+LIVE_HEARTBEAT_SECONDS = int(os.getenv('LIVE_HEARTBEAT_SECONDS', '15'))
+# streams end after this long, clients reconnect with Last-Event-ID
+LIVE_MAX_SECONDS = int(os.getenv('LIVE_MAX_SECONDS', '300'))
+
+# receipts and staff receipts are partitioned by month of created_at on
+# PostgreSQL: partitions are created this many months ahead, and
+# archive_receipt_partitions moves months older than the retention into
+# compressed ReceiptArchive chunks of at most RECEIPT_ARCHIVE_CHUNK_ROWS
+RECEIPT_PARTITION_MONTHS_AHEAD = int(os.getenv('RECEIPT_PARTITION_MONTHS_AHEAD', '3'))
+RECEIPT_RETENTION_MONTHS = int(os.getenv('RECEIPT_RETENTION_MONTHS', '24'))
+RECEIPT_ARCHIVE_CHUNK_ROWS = int(os.getenv('RECEIPT_ARCHIVE_CHUNK_ROWS', '50000'))
+
+# processes hashing passwords of a bulk staff import
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+
+# per-route request metrics served at /metrics to scrapers sending
+# METRICS_TOKEN as a bearer token (refused while it's unset), and the
+# Server-Timing header on every response
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=3600),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_REFRESH_SERIALIZER': 'salon.authentication.SalonTokenRefreshSerializer',
 }
 
 ONESIGNAL_APP_ID = os.getenv('ONESIGNAL_APP_ID')
 ONESIGNAL_REST_API_KEY = os.getenv('ONESIGNAL_REST_API_KEY')
+# point at a local stub server to exercise the notification worker
+ONESIGNAL_API_ROOT = os.getenv('ONESIGNAL_API_ROOT')
+ONESIGNAL_TIMEOUT = float(os.getenv('ONESIGNAL_TIMEOUT', '10'))
+ONESIGNAL_MAX_RETRIES = int(os.getenv('ONESIGNAL_MAX_RETRIES', '2'))
+# OneSignal accepts at most 2000 include_player_ids per request
+ONESIGNAL_CHUNK_SIZE = int(os.getenv('ONESIGNAL_CHUNK_SIZE', '2000'))
+ONESIGNAL_CONCURRENCY = int(os.getenv('ONESIGNAL_CONCURRENCY', '4'))
+ONESIGNAL_MAX_CONNECTIONS = int(os.getenv('ONESIGNAL_MAX_CONNECTIONS', '10'))
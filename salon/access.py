@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import Salon, Staff
+
+ACCESS_CACHE_KEY = 'salon-access:{user_id}'
+
+
+class SalonAccess:
+    """
+    What a user can reach: their staff row, role and the salons they own,
+    and whether they may log in at all. Resolved once per request, or from
+    a short-TTL cache, so permission checks are attribute and set lookups.
+    """
+    __slots__ = ('user_id', 'staff_id', 'staff_salon_id', 'role', 'owned_salon_ids',
+                 'is_active')
+
+    def __init__(self, user_id, staff_id=None, staff_salon_id=None, role=None,
+                 owned_salon_ids=(), is_active=True):
+        self.user_id = user_id
+        self.staff_id = staff_id
+        self.staff_salon_id = staff_salon_id
+        self.role = role
+        self.owned_salon_ids = frozenset(owned_salon_ids)
+        self.is_active = is_active
+
+    @property
+    def salon_ids(self):
+        """Salons the user owns or works in."""
+        if self.staff_salon_id is None:
+            return self.owned_salon_ids
+        return self.owned_salon_ids | {self.staff_salon_id}
+
+    def owns(self, salon_id):
+        return salon_id in self.owned_salon_ids
+
+    def to_cache(self):
+        return (self.user_id, self.staff_id, self.staff_salon_id, self.role,
+                tuple(self.owned_salon_ids), self.is_active)
+
+    @classmethod
+    def from_cache(cls, value):
+        return cls(*value)
+
+
+ANONYMOUS_ACCESS = SalonAccess(user_id=None)
+
+
+def load_salon_access(user_id):
+    staff = Staff.all_objects.filter(user_id=user_id).values(
+        'id', 'salon_id', 'role__title').first() or {}
+    owned_salon_ids = Salon.objects.filter(
+        owner_id=user_id).values_list('id', flat=True)
+    # a deleted user is as good as a deactivated one
+    is_active = User.objects.filter(id=user_id).values_list(
+        'is_active', flat=True).first() or False
+
+    return SalonAccess(
+        user_id=user_id,
+        staff_id=staff.get('id'),
+        staff_salon_id=staff.get('salon_id'),
+        role=staff.get('role__title'),
+        owned_salon_ids=owned_salon_ids,
+        is_active=is_active,
+    )
+
+
+def get_cached_salon_access(user_id):
+    """SalonAccess of the user id, from the cache or loaded into it."""
+    key = ACCESS_CACHE_KEY.format(user_id=user_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return SalonAccess.from_cache(cached)
+
+    access = load_salon_access(user_id)
+    cache.set(key, access.to_cache(), settings.SALON_ACCESS_CACHE_TTL)
+    return access
+
+
+def get_salon_access(user):
+    """SalonAccess of the user, memoized on the user instance and in the cache."""
+    if not user or not user.is_authenticated:
+        return ANONYMOUS_ACCESS
+
+    access = getattr(user, '_salon_access', None)
+    if access is None:
+        access = get_cached_salon_access(user.id)
+        user._salon_access = access
+    return access
+
+
+def invalidate_salon_access(*user_ids):
+    cache.delete_many([ACCESS_CACHE_KEY.format(user_id=user_id)
+                       for user_id in user_ids if user_id])
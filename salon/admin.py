@@ -7,9 +7,15 @@ from .models import (
     Staff,
     ReceiptModel,
     StaffReceipt,
+    StaffDailyRollup,
     Salon,
     Role,
-    UserDeviceModel
+    UserDeviceModel,
+    NotificationOutbox,
+    PayPeriod,
+    PayrollSnapshot,
+    SyncTombstone,
+    ReceiptArchive
 )
 
 
@@ -50,6 +56,15 @@ class StaffReceiptAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     date_hierarchy = 'created_at'
 
+
+@admin.register(StaffDailyRollup)
+class StaffDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('salon', 'staff', 'date', 'payment_status',
+                    'service_amount', 'tip_amount', 'turn_count')
+    list_filter = ('payment_status', 'salon')
+    ordering = ('-date',)
+    date_hierarchy = 'date'
+
 # Staff Tabular Inline
 class StaffInline(admin.TabularInline):
     model = Staff
@@ -81,4 +96,43 @@ class UserDeviceModelAdmin(admin.ModelAdmin):
     list_display = ('user', 'device_id', 'device_type')
     search_fields = ('user', 'device_id', 'device_type')
     ordering = ('user', 'device_id', 'device_type')
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('event', 'receipt', 'status', 'attempts',
+                    'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'event')
+    ordering = ('-created_at',)
+    date_hierarchy = 'created_at'
+
+
+@admin.register(PayPeriod)
+class PayPeriodAdmin(admin.ModelAdmin):
+    list_display = ('start_date', 'end_date', 'salon', 'status', 'closed_at')
+    list_filter = ('status', 'salon')
+    ordering = ('-start_date',)
+
+
+@admin.register(PayrollSnapshot)
+class PayrollSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('pay_period', 'salon', 'staff', 'service_amount',
+                    'commission_amount', 'tip_amount', 'net_payout')
+    list_filter = ('pay_period', 'salon')
+    readonly_fields = [field.name for field in PayrollSnapshot._meta.fields]
+
+
+@admin.register(SyncTombstone)
+class SyncTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('salon', 'entity', 'object_id', 'deleted_at')
+    list_filter = ('entity',)
+    ordering = ('-deleted_at',)
+
+
+@admin.register(ReceiptArchive)
+class ReceiptArchiveAdmin(admin.ModelAdmin):
+    list_display = ('table_name', 'month', 'chunk', 'row_count', 'created_at')
+    list_filter = ('table_name',)
+    exclude = ('data',)
+    ordering = ('table_name', '-month', 'chunk')
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from salon.access import SalonAccess, get_cached_salon_access, load_salon_access
+
+SALON_CLAIMS = ('staff_id', 'salon_id', 'role', 'owned_salon_ids')
+STAFF_SWITCH_SCOPE = 'staff-switch'
+
+
+class SalonClaimsMixin:
+
+    def set_salon_claims(self, access):
+        self['staff_id'] = access.staff_id
+        self['salon_id'] = access.staff_salon_id
+        self['role'] = access.role
+        self['owned_salon_ids'] = sorted(access.owned_salon_ids)
+
+
+class SalonRefreshToken(SalonClaimsMixin, RefreshToken):
+    """Refresh token carrying the user's staff, salon and role claims."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_salon_claims(load_salon_access(user.id))
+        return token
+
+
+class StaffSwitchToken(SalonClaimsMixin, AccessToken):
+    """
+    Short-lived access token from a PIN switch on a shared salon device.
+    It carries only the staff member's own salon and role, never salons
+    they own, and comes without a refresh token.
+    """
+    lifetime = timedelta(seconds=settings.STAFF_SWITCH_TOKEN_LIFETIME)
+
+    @classmethod
+    def for_access(cls, access):
+        token = cls()
+        token[api_settings.USER_ID_CLAIM] = access.user_id
+        token['scope'] = STAFF_SWITCH_SCOPE
+        token.set_salon_claims(access)
+        return token
+
+
+class SalonTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = SalonRefreshToken
+
+    def validate(self, attrs):
+        # re-read the claims so role / salon changes reach the new tokens
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        access = load_salon_access(user_id)
+        if not access.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        refresh.set_salon_claims(access)
+        return super().validate({'refresh': str(refresh)})
+
+
+class SalonTokenUser(TokenUser):
+    """
+    User of a salon token with its current SalonAccess, without touching
+    the database. Attributes the access doesn't carry, the admin flags
+    and permissions included, are read from the User row, which is loaded
+    on first use only.
+    """
+
+    def __init__(self, token, access):
+        super().__init__(token)
+        self._salon_access = access
+        self.is_active = access.is_active
+
+    @cached_property
+    def _user(self):
+        return User.objects.get(id=self.id)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._user, attr)
+
+    # TokenUser reads these from claims the salon tokens don't carry
+    @property
+    def username(self):
+        return self._user.username
+
+    @property
+    def is_staff(self):
+        return self._user.is_staff
+
+    @property
+    def is_superuser(self):
+        return self._user.is_superuser
+
+    @property
+    def groups(self):
+        return self._user.groups
+
+    @property
+    def user_permissions(self):
+        return self._user.user_permissions
+
+    def get_group_permissions(self, obj=None):
+        return self._user.get_group_permissions(obj)
+
+    def get_all_permissions(self, obj=None):
+        return self._user.get_all_permissions(obj)
+
+    def has_perm(self, perm, obj=None):
+        return self._user.has_perm(perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return self._user.has_perms(perm_list, obj)
+
+    def has_module_perms(self, module):
+        return self._user.has_module_perms(module)
+
+
+class SalonJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that checks salon tokens against the user's cached
+    SalonAccess instead of loading the User row. The token's claims can be
+    up to an access token lifetime old, the cached access is cleared when
+    the user is deactivated, their staff row changes or a salon they own
+    changes hands, and expires after SALON_ACCESS_CACHE_TTL regardless.
+    Tokens issued before the claims existed still load the user.
+
+    A staff-switch token only acts as the staff member in the salon it was
+    switched in, never as the owner of any salon, and stops working once
+    the staff member leaves that salon.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        if any(claim not in validated_token for claim in SALON_CLAIMS):
+            return super().get_user(validated_token)
+
+        access = get_cached_salon_access(validated_token[api_settings.USER_ID_CLAIM])
+        if not access.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if validated_token.get('scope') == STAFF_SWITCH_SCOPE:
+            if (access.staff_id != validated_token['staff_id'] or
+                    access.staff_salon_id != validated_token['salon_id']):
+                raise AuthenticationFailed(
+                    _('Staff member left the salon'), code='staff_switch_stale')
+            access = SalonAccess(
+                user_id=access.user_id,
+                staff_id=access.staff_id,
+                staff_salon_id=access.staff_salon_id,
+                role=access.role,
+                is_active=access.is_active,
+            )
+        return SalonTokenUser(validated_token, access)
@@ -0,0 +1,356 @@
+import copy
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import live
+from .enums import PaymentStatusEnums, UserRoleEnums
+from .models import ReceiptModel, Role, Salon, Staff, StaffReceipt
+from .rollups import business_date, rebuild_staff_daily_rollups
+
+SERVICE_AMOUNTS = [Decimal(amount) for amount in ('25', '35', '40', '45', '60', '80')]
+TIP_AMOUNTS = [Decimal(amount) for amount in ('0', '5', '8', '10', '12.5', '15')]
+
+
+@contextmanager
+def isolated_backends():
+    """
+    Swap the cache for a private in-memory one and the live broker for an
+    in-process one while benchmarking, so clearing the report cache and
+    publishing events never touch a Redis shared with other processes.
+    """
+    live._broker = None
+    try:
+        with override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'salon-benchmark',
+            }},
+            LIVE_BROKER='salon.live.InProcessLiveBroker',
+        ):
+            yield
+    finally:
+        live._broker = None
+
+
+def seed_salons(salons, staff, receipts, lines, days=30, seed=0):
+    """
+    Synthetic salons, each with its owner, staff and PAID / PENDING
+    receipts spread over the last days. Everything is bulk inserted and
+    the rollups rebuilt once. Returns the salons.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+    now = timezone.now()
+
+    roles = {
+        role.value: Role.objects.get_or_create(title=role.value)[0]
+        for role in UserRoleEnums
+    }
+
+    owners = User.objects.bulk_create([
+        User(username=f'bench-owner-{index}', password=password)
+        for index in range(salons)
+    ])
+    salon_rows = Salon.objects.bulk_create([
+        Salon(name=f'Bench Salon {index}', email=f'salon{index}@bench.test',
+              owner=owner)
+        for index, owner in enumerate(owners)
+    ])
+
+    staff_users = User.objects.bulk_create([
+        User(username=f'bench-staff-{salon.id}-{index}', password=password)
+        for salon in salon_rows
+        for index in range(staff)
+    ])
+    staff_rows = Staff.objects.bulk_create([
+        Staff(
+            first_name=f'Staff {index}',
+            last_name=f'Salon {index // staff}',
+            phone=f'555{index:07d}',
+            salon=salon_rows[index // staff],
+            user=user,
+            role=roles[UserRoleEnums.STAFF.value],
+            commission_rate=rng.choice([0.4, 0.5, 0.6]),
+        )
+        for index, user in enumerate(staff_users)
+    ])
+
+    receipt_rows = []
+    for salon in salon_rows:
+        for _ in range(receipts):
+            created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            receipt_rows.append(ReceiptModel(
+                salon=salon,
+                payment_status=(PaymentStatusEnums.PAID.value
+                                if rng.random() < 0.9
+                                else PaymentStatusEnums.PENDING.value),
+                tip_total_amount=rng.choice(TIP_AMOUNTS),
+                created_at=created_at,
+            ))
+    receipt_rows = ReceiptModel.objects.bulk_create(receipt_rows, batch_size=1000)
+
+    staff_by_salon = {}
+    for staff_member in staff_rows:
+        staff_by_salon.setdefault(staff_member.salon_id, []).append(staff_member)
+
+    line_rows = []
+    for receipt in receipt_rows:
+        for _ in range(rng.randint(1, lines)):
+            line_rows.append(StaffReceipt(
+                receipt=receipt,
+                staff=rng.choice(staff_by_salon[receipt.salon_id]),
+                service_amount=rng.choice(SERVICE_AMOUNTS),
+                tip_amount=rng.choice(TIP_AMOUNTS),
+                service_name='Bench service',
+                created_at=receipt.created_at,
+            ))
+    StaffReceipt.objects.bulk_create(line_rows, batch_size=1000)
+
+    rebuild_staff_daily_rollups(
+        business_date(now - timedelta(days=days)), business_date(now))
+    return salon_rows
+
+
+def get_endpoints(salon, include_writes=True):
+    """
+    (label, method, path, body, as_staff) for every router endpoint worth
+    timing. Deletes, push notifications and the live stream are left out.
+    """
+    receipt = ReceiptModel.objects.filter(salon=salon).order_by('id').first()
+    line = StaffReceipt.objects.filter(receipt=receipt).first()
+    staff = Staff.objects.filter(salon=salon).order_by('id').first()
+    today = timezone.localdate()
+    month_ago = (today - timedelta(days=30)).isoformat()
+
+    endpoints = [
+        ('GET', '/api/staff/', None, False),
+        ('GET', f'/api/staff/{staff.id}/', None, False),
+        ('GET', '/api/staff-receipt/', None, False),
+        ('GET', f'/api/staff-receipt/{line.id}/', None, False),
+        ('GET', '/api/receipt/', None, False),
+        ('GET', f'/api/receipt/{receipt.id}/', None, False),
+        ('GET', '/api/salons/', None, False),
+        ('GET', f'/api/salons/{salon.id}/', None, False),
+        ('GET', '/api/salons/my-salons/', None, False),
+        ('GET', f'/api/salons/{salon.id}/staffs/', None, True),
+        ('GET', f'/api/salons/{salon.id}/receipts/', None, False),
+        ('GET', f'/api/salons/{salon.id}/staff-receipts/', None, False),
+        ('GET', f'/api/salons/{salon.id}/staff-receipts/', None, True),
+        ('GET', f'/api/salons/{salon.id}/staff-receipts-statistics/', None, False),
+        ('GET', f'/api/salons/{salon.id}/staff-receipts-statistics/', None, True),
+        ('GET', f'/api/salons/{salon.id}/staff-service-revenue/', None, False),
+        ('GET', f'/api/salons/{salon.id}/staff-receipts/export.csv/', None, False),
+        ('GET', f'/api/salons/{salon.id}/payroll/?start_date={month_ago}'
+                f'&end_date={today.isoformat()}', None, False),
+        ('GET', f'/api/salons/{salon.id}/changes/', None, False),
+        ('GET', '/api/user-devices/', None, False),
+    ]
+
+    if include_writes:
+        new_receipt = {
+            'payment_status': PaymentStatusEnums.PAID.value,
+            'tip_total_amount': '10',
+            'staff_receipts': [
+                {'staff': staff.id, 'service_amount': '40'},
+                {'staff': staff.id, 'service_amount': '25'},
+            ],
+        }
+        endpoints += [
+            ('POST', '/api/receipt/create-receipt/',
+             {**new_receipt, 'salon': salon.id}, False),
+            ('POST', f'/api/salons/{salon.id}/create-receipt/', new_receipt, False),
+            ('POST', '/api/receipt/bulk-create/',
+             [{**new_receipt, 'salon': salon.id}] * 20, False),
+            ('PUT', f'/api/receipt/{receipt.id}/update-receipt/', {
+                'payment_method': 'cash',
+                'staff_receipts': [{
+                    'id': line.id, 'staff': line.staff_id,
+                    'service_amount': str(line.service_amount),
+                }],
+            }, False),
+        ]
+
+    return [
+        (
+            resolve(path.split('?')[0]).view_name + (':staff' if as_staff else ''),
+            method, path, body, as_staff,
+        )
+        for method, path, body, as_staff in endpoints
+    ]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+def measure(client, method, path, body=None, clear_cache=True):
+    """
+    One request: (seconds, queries, response bytes, status code). Only
+    run it inside isolated_backends(), clear_cache empties the whole cache.
+    """
+    if clear_cache:
+        cache.clear()
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, method.lower())(path, body, format='json')
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+
+    return elapsed, len(queries), size, response.status_code
+
+
+def run_benchmarks(salon, iterations, include_writes=True, clear_cache=True):
+    owner_client = APIClient()
+    owner_client.force_authenticate(salon.owner)
+    staff_client = APIClient()
+    staff_client.force_authenticate(
+        Staff.objects.filter(salon=salon).order_by('id').first().user)
+
+    results = {}
+    for label, method, path, body, as_staff in get_endpoints(salon, include_writes):
+        client = staff_client if as_staff else owner_client
+        # one warm-up request so imports and first-use setup aren't timed
+        measure(client, method, path, body, clear_cache)
+
+        samples = [measure(client, method, path, body, clear_cache)
+                   for _ in range(iterations)]
+        timings = [sample[0] * 1000 for sample in samples]
+        results[label] = {
+            'method': method,
+            'path': path,
+            'status': samples[-1][3],
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(sample[1] for sample in samples),
+            'bytes': samples[-1][2],
+        }
+    return results
+
+
+def compare_results(baseline, current):
+    """Rows of (label, metric, baseline, current, change %) for shared endpoints."""
+    rows = []
+    for label, result in current['endpoints'].items():
+        before = baseline['endpoints'].get(label)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes'):
+            old, new = before[metric], result[metric]
+            change = round((new - old) / old * 100, 1) if old else None
+            rows.append((label, metric, old, new, change))
+    return rows
+
+
+CONNECTION_MODES = ('connect', 'persistent', 'pool')
+
+
+def connection_settings(mode):
+    """
+    The default database's settings for one connection mode: a new
+    connection per request, persistent connections, or the pool (the
+    configured one, else the pool defaults).
+    """
+    settings_dict = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+    options = settings_dict['OPTIONS']
+    pool = options.pop('pool', None)
+    settings_dict['CONN_HEALTH_CHECKS'] = True
+    settings_dict['CONN_MAX_AGE'] = None if mode == 'persistent' else 0
+    if mode == 'pool':
+        options['pool'] = pool or True
+    return settings_dict
+
+
+def benchmark_connection(mode, settings_dict=None):
+    wrapper_class = connections[DEFAULT_DB_ALIAS].__class__
+    return wrapper_class(settings_dict or connection_settings(mode),
+                         alias=f'benchmark-{mode}')
+
+
+def run_connection_benchmark(mode, requests, threads, queries):
+    """
+    Time requests spread over threads, each connecting, running queries
+    and finishing the way a request does, so connections are closed,
+    kept or handed back to the pool. Returns per-request latencies in ms
+    and the elapsed wall time.
+    """
+    settings_dict = connection_settings(mode)
+
+    def worker(count):
+        # each thread gets its own wrapper like Django's per-thread ones,
+        # pooled wrappers share the pool through the alias
+        wrapper = benchmark_connection(mode, settings_dict)
+        timings = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                for _ in range(queries):
+                    with wrapper.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                # what request_finished does
+                wrapper.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            wrapper.close()
+        return timings
+
+    counts = [requests // threads + (index < requests % threads)
+              for index in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(worker, counts))
+    elapsed = time.perf_counter() - started
+
+    timings = [timing for worker_timings in results for timing in worker_timings]
+    return timings, elapsed
+
+
+def run_connection_benchmarks(modes, requests, threads, queries):
+    results = {}
+    for mode in modes:
+        # one warm-up pass so imports, DNS and the pool's first fill aren't timed
+        run_connection_benchmark(mode, threads, threads, queries)
+        timings, elapsed = run_connection_benchmark(mode, requests, threads, queries)
+        results[mode] = {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'requests_per_s': round(len(timings) / elapsed, 1),
+        }
+        if mode == 'pool':
+            benchmark_connection(mode).close_pool()
+    return results
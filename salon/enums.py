@@ -22,4 +22,28 @@ class UserRoleEnums(Enum):
 
 class PaymentStatusEnums(Enum):
   PAID = "PAID"
-  PENDING = "PENDING"
\ No newline at end of file
+  PENDING = "PENDING"
+
+class NotificationStatusEnums(Enum):
+  PENDING = "PENDING"
+  SENDING = "SENDING"
+  SENT = "SENT"
+  FAILED = "FAILED"
+
+
+class PayPeriodStatusEnums(Enum):
+  OPEN = "OPEN"
+  CLOSED = "CLOSED"
+
+
+class TipSplitRuleEnums(Enum):
+  MANUAL = "MANUAL"
+  PROPORTIONAL = "PROPORTIONAL"
+  EQUAL = "EQUAL"
+  POOLED = "POOLED"
+
+
+class SyncEntityEnums(Enum):
+  RECEIPT = "RECEIPT"
+  STAFF_RECEIPT = "STAFF_RECEIPT"
+  STAFF = "STAFF"
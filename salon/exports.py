@@ -0,0 +1,94 @@
+import csv
+from decimal import Decimal
+
+from django.utils import timezone
+
+STAFF_RECEIPT_CSV_HEADER = [
+    'staff_id',
+    'staff_name',
+    'receipt_id',
+    'created_at',
+    'service_name',
+    'service_amount',
+    'tip_amount',
+    'discount_price',
+    'discount_percent',
+    'payment_method',
+]
+
+STAFF_RECEIPT_CSV_FIELDS = [
+    'staff_id',
+    'staff__first_name',
+    'staff__last_name',
+    'receipt_id',
+    'created_at',
+    'service_name',
+    'service_amount',
+    'tip_amount',
+    'discount_price',
+    'discount_percent',
+    'receipt__payment_method',
+]
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _subtotal_row(label, staff_id, staff_name, totals):
+    return [staff_id, staff_name, label, '', '',
+            totals[0], totals[1], totals[2], '', '']
+
+
+def staff_receipt_csv_rows(queryset, chunk_size=2000):
+    """
+    Yield CSV lines for StaffReceipt rows grouped by staff, with a subtotal
+    line after each staff and a grand total at the end. Rows are read with
+    a chunked iterator so memory does not grow with the export size.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(STAFF_RECEIPT_CSV_HEADER)
+
+    rows = queryset.order_by('staff_id', 'created_at', 'id').values_list(
+        *STAFF_RECEIPT_CSV_FIELDS)
+
+    current_staff = None
+    staff_totals = [Decimal(0)] * 3
+    grand_totals = [Decimal(0)] * 3
+    for (staff_id, first_name, last_name, receipt_id, created_at,
+         service_name, service_amount, tip_amount, discount_price,
+         discount_percent, payment_method) in rows.iterator(chunk_size=chunk_size):
+
+        if current_staff is None or current_staff[0] != staff_id:
+            if current_staff is not None:
+                yield writer.writerow(
+                    _subtotal_row('SUBTOTAL', *current_staff, staff_totals))
+            current_staff = (
+                staff_id, f"{first_name or ''} {last_name or ''}".strip())
+            staff_totals = [Decimal(0)] * 3
+
+        amounts = (service_amount, tip_amount, discount_price)
+        staff_totals = [total + amount for total, amount in zip(staff_totals, amounts)]
+        grand_totals = [total + amount for total, amount in zip(grand_totals, amounts)]
+
+        yield writer.writerow([
+            staff_id,
+            current_staff[1],
+            receipt_id,
+            timezone.localtime(created_at).isoformat(),
+            service_name,
+            service_amount,
+            tip_amount,
+            discount_price,
+            discount_percent,
+            payment_method,
+        ])
+
+    if current_staff is not None:
+        yield writer.writerow(
+            _subtotal_row('SUBTOTAL', *current_staff, staff_totals))
+        yield writer.writerow(
+            _subtotal_row('TOTAL', '', '', grand_totals))
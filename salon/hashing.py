@@ -0,0 +1,33 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+
+# below this many passwords starting worker processes costs more than it saves
+PARALLEL_HASH_MIN = 4
+
+
+def encode_password(hasher, password, salt):
+    return hasher.encode(password, salt)
+
+
+def make_passwords(passwords, workers=None):
+    """
+    make_password() for many passwords, hashed in a process pool. Workers
+    are spawned rather than forked so they never share this process's
+    database connections. Salts come from here, workers only hash.
+    """
+    passwords = list(passwords)
+    hasher = get_hasher()
+    salts = [hasher.salt() for _ in passwords]
+
+    workers = min(workers or settings.PASSWORD_HASH_WORKERS, len(passwords))
+    if workers <= 1 or len(passwords) < PARALLEL_HASH_MIN:
+        return [hasher.encode(password, salt)
+                for password, salt in zip(passwords, salts)]
+
+    with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(
+            encode_password, [hasher] * len(passwords), passwords, salts))
@@ -0,0 +1,261 @@
+import abc
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+
+from .models import StaffReceipt
+
+logger = logging.getLogger(__name__)
+
+
+class LiveUnavailable(Exception):
+    pass
+
+
+class LiveBroker(abc.ABC):
+    """
+    Per-salon stream of receipt events. Event ids are opaque strings,
+    increasing within a salon, that clients send back as Last-Event-ID.
+    Shared brokers are seen by every worker, the live endpoint refuses to
+    stream from one that isn't.
+    """
+    shared = True
+
+    @abc.abstractmethod
+    def publish(self, salon_id, event):
+        """Append event to the salon's stream and return its id."""
+
+    @abc.abstractmethod
+    def last_id(self, salon_id):
+        """Id of the newest event, reading after it yields only new events."""
+
+    @abc.abstractmethod
+    def read(self, salon_id, after_id):
+        """[(event_id, event)] published after after_id, oldest first."""
+
+    @abc.abstractmethod
+    def has_gap(self, salon_id, after_id):
+        """True when events after after_id are no longer kept (or it's unknown)."""
+
+
+class InProcessLiveBroker(LiveBroker):
+    """
+    Keeps the streams in this process. Events published by other workers
+    never reach it, so it only records them, e.g. when REDIS_URL is unset.
+    """
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ids = defaultdict(int)
+        self._streams = defaultdict(
+            lambda: deque(maxlen=settings.LIVE_HISTORY_SIZE))
+
+    def publish(self, salon_id, event):
+        with self._lock:
+            self._last_ids[salon_id] += 1
+            event_id = self._last_ids[salon_id]
+            self._streams[salon_id].append((event_id, event))
+        return str(event_id)
+
+    def last_id(self, salon_id):
+        with self._lock:
+            return str(self._last_ids[salon_id])
+
+    def read(self, salon_id, after_id):
+        after_id = int(after_id)
+        with self._lock:
+            return [(str(event_id), event)
+                    for event_id, event in self._streams[salon_id]
+                    if event_id > after_id]
+
+    def has_gap(self, salon_id, after_id):
+        try:
+            after_id = int(after_id)
+        except ValueError:
+            return True
+        with self._lock:
+            last_id = self._last_ids[salon_id]
+            stream = self._streams[salon_id]
+            oldest_id = stream[0][0] if stream else last_id + 1
+        # ahead of us means this process restarted since
+        return after_id > last_id or after_id + 1 < oldest_id
+
+
+class RedisLiveBroker(LiveBroker):
+    """
+    Redis Streams, shared by every worker. Stream ids are the event ids,
+    trimmed to about LIVE_HISTORY_SIZE entries per salon.
+    """
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(
+            settings.REDIS_URL, decode_responses=True)
+
+    @staticmethod
+    def _key(salon_id):
+        return f'live:salon:{salon_id}'
+
+    @staticmethod
+    def _parse_id(event_id):
+        milliseconds, sequence = event_id.split('-')
+        return int(milliseconds), int(sequence)
+
+    def publish(self, salon_id, event):
+        return self.client.xadd(
+            self._key(salon_id),
+            {'data': json.dumps(event)},
+            maxlen=settings.LIVE_HISTORY_SIZE,
+            approximate=True,
+        )
+
+    def last_id(self, salon_id):
+        entries = self.client.xrevrange(self._key(salon_id), count=1)
+        return entries[0][0] if entries else '0-0'
+
+    def read(self, salon_id, after_id):
+        entries = self.client.xrange(
+            self._key(salon_id), min=f'({after_id}', count=500)
+        return [(event_id, json.loads(fields['data']))
+                for event_id, fields in entries]
+
+    def has_gap(self, salon_id, after_id):
+        try:
+            after_id = self._parse_id(after_id)
+        except ValueError:
+            return True
+        if after_id > self._parse_id(self.last_id(salon_id)):
+            return True
+
+        try:
+            info = self.client.xinfo_stream(self._key(salon_id))
+        except Exception:
+            return False
+        # Redis 7+ reports the newest entry trimmed away
+        max_deleted_id = info.get('max-deleted-entry-id')
+        return bool(max_deleted_id) and self._parse_id(max_deleted_id) > after_id
+
+
+_broker = None
+
+
+def get_live_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.LIVE_BROKER)()
+    return _broker
+
+
+def publish_receipt_events(event, receipts, staff_ids=None):
+    """
+    Publish event for every receipt once the transaction commits. staff_ids
+    ({receipt_id: ids}) is for deleted receipts, whose lines are gone;
+    otherwise they are read in one query at commit time.
+    """
+    receipts = [(receipt.id, receipt.salon_id)
+                for receipt in receipts if receipt.salon_id]
+    if not receipts:
+        return
+
+    def publish():
+        receipt_staff_ids = staff_ids
+        if receipt_staff_ids is None:
+            receipt_staff_ids = defaultdict(set)
+            for receipt_id, staff_id in StaffReceipt.objects.filter(
+                receipt_id__in=[receipt_id for receipt_id, _ in receipts],
+            ).values_list('receipt_id', 'staff_id'):
+                receipt_staff_ids[receipt_id].add(staff_id)
+
+        broker = get_live_broker()
+        published_at = timezone.now().isoformat()
+        for receipt_id, salon_id in receipts:
+            try:
+                broker.publish(salon_id, {
+                    'event': event,
+                    'receipt_id': receipt_id,
+                    'salon_id': salon_id,
+                    'staff_ids': sorted(receipt_staff_ids.get(receipt_id, ())),
+                    'at': published_at,
+                })
+            except Exception:
+                # live events are best effort, the write already committed
+                logger.exception('live event %s of receipt %s not published',
+                                 event, receipt_id)
+
+    transaction.on_commit(publish)
+
+
+def check_live_available(request):
+    """
+    Raise LiveUnavailable unless the request came in through the ASGI app
+    and the broker is shared. Under WSGI each stream holds a worker for
+    LIVE_MAX_SECONDS, and an unshared broker misses other workers' events.
+    """
+    if not isinstance(request, ASGIRequest):
+        raise LiveUnavailable('Live events are only served by the ASGI app')
+    if not get_live_broker().shared:
+        raise LiveUnavailable('Live events need a shared broker, set REDIS_URL')
+
+
+def format_sse(event_id, event_name, data):
+    return f'id: {event_id}\nevent: {event_name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def live_event_stream(salon_id, last_event_id=None, staff_id=None):
+    """
+    Server-sent events of a salon, only those touching staff_id when given.
+    Starts with `ready`, or `reset` when events after last_event_id were
+    dropped and the client should refetch, then polls the broker until
+    LIVE_MAX_SECONDS are up.
+    """
+    broker = get_live_broker()
+    read = sync_to_async(broker.read, thread_sensitive=False)
+
+    yield 'retry: 3000\n\n'
+
+    cursor = last_event_id
+    start_event = 'ready'
+    if cursor is None or await sync_to_async(
+            broker.has_gap, thread_sensitive=False)(salon_id, cursor):
+        if cursor is not None:
+            start_event = 'reset'
+        cursor = await sync_to_async(
+            broker.last_id, thread_sensitive=False)(salon_id)
+    yield format_sse(cursor, start_event, {'salon_id': salon_id})
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.LIVE_MAX_SECONDS
+    last_sent_at = loop.time()
+    while loop.time() < deadline:
+        for event_id, event in await read(salon_id, cursor):
+            cursor = event_id
+            if staff_id is None or staff_id in event['staff_ids']:
+                last_sent_at = loop.time()
+                yield format_sse(event_id, event['event'], event)
+
+        if loop.time() - last_sent_at >= settings.LIVE_HEARTBEAT_SECONDS:
+            last_sent_at = loop.time()
+            yield ': keep-alive\n\n'
+        await asyncio.sleep(settings.LIVE_POLL_SECONDS)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets text/event-stream clients through negotiation, errors become an event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'event: error\ndata: {json.dumps(data, default=str)}\n\n'
@@ -0,0 +1,93 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from salon.models import Salon
+from salon.partitions import (
+    archivable_partitions,
+    archive_partition,
+    default_partition_name,
+    ensure_partitions,
+    missing_partitions,
+    partition_name,
+    partitioned_tables,
+    restore_archived_month
+)
+from salon.report_cache import bump_salon_versions
+
+
+def parse_month(value):
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(BaseCommand):
+    help = ('Create upcoming monthly receipt partitions, and detach and archive '
+            'the ones older than the retention into compressed ReceiptArchive rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-months', type=int,
+                            default=settings.RECEIPT_RETENTION_MONTHS,
+                            help='Keep this many months before the current one')
+        parser.add_argument('--ahead', type=int,
+                            default=settings.RECEIPT_PARTITION_MONTHS_AHEAD,
+                            help='Create partitions this many months ahead')
+        parser.add_argument('--chunk-rows', type=int,
+                            default=settings.RECEIPT_ARCHIVE_CHUNK_ROWS)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the partitions that would be archived')
+        parser.add_argument('--restore', type=parse_month, metavar='YYYY-MM',
+                            help='Put an archived month back instead')
+
+    def handle(self, *args, retention_months, ahead, chunk_rows, dry_run=False,
+               restore=None, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Receipt partitions need PostgreSQL')
+        if retention_months < 1 or ahead < 0 or chunk_rows < 1:
+            raise CommandError('--retention-months and --chunk-rows must be '
+                               'at least 1, --ahead at least 0')
+
+        if restore:
+            for table in partitioned_tables():
+                count = restore_archived_month(table, restore)
+                self.stdout.write(f'{table}: {count} rows of {restore:%Y-%m} restored')
+            self.bump_versions()
+            return
+
+        if dry_run:
+            missing, blocked = missing_partitions(ahead)
+            for table, month in missing:
+                self.stdout.write(f'Would create {partition_name(table, month)}')
+        else:
+            created, blocked = ensure_partitions(ahead)
+            for name in created:
+                self.stdout.write(f'Created partition {name}')
+        for table, month in blocked:
+            self.stdout.write(self.style.WARNING(
+                f'{default_partition_name(table)} has rows of {month:%Y-%m}, '
+                f'its partition can\'t be created until they move'))
+
+        partitions = archivable_partitions(retention_months)
+        archived = 0
+        for table, month, name, attached in partitions:
+            if dry_run:
+                self.stdout.write(f'Would archive {name}')
+                continue
+
+            started = time.perf_counter()
+            count = archive_partition(table, month, name, attached, chunk_rows)
+            archived += 1
+            self.stdout.write(
+                f'Archived {name}: {count} rows in '
+                f'{time.perf_counter() - started:.1f}s')
+
+        # receipt lists and their ETags change, reports come from rollups
+        if archived:
+            self.bump_versions()
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived} partitions archived, keeping {retention_months} months'))
+
+    def bump_versions(self):
+        bump_salon_versions(Salon.objects.values_list('id', flat=True))
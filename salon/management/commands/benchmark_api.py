@@ -0,0 +1,124 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from salon.benchmarks import (
+    compare_results,
+    current_commit,
+    isolated_backends,
+    run_benchmarks,
+    seed_salons
+)
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic salons in a throwaway test database and measure '
+            'latency, query count and response size of the API endpoints')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salons', type=int, default=2)
+        parser.add_argument('--staff', type=int, default=10,
+                            help='Staff per salon')
+        parser.add_argument('--receipts', type=int, default=2000,
+                            help='Receipts per salon')
+        parser.add_argument('--lines', type=int, default=3,
+                            help='Max staff receipts per receipt')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Receipts are spread over this many days')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the report cache between requests')
+        parser.add_argument('--skip-writes', action='store_true',
+                            help='Only time GET endpoints')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file to compare with')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # never seed into the real database, or clear the real cache
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        for alias in connections:
+            if connections[alias].settings_dict['TEST'].get('MIRROR') == DEFAULT_DB_ALIAS:
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            with isolated_backends():
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved {options["output"]}'))
+        if baseline:
+            self.print_comparison(baseline, results)
+
+    def run(self, options):
+        started = time.perf_counter()
+        salons = seed_salons(
+            salons=options['salons'],
+            staff=options['staff'],
+            receipts=options['receipts'],
+            lines=options['lines'],
+            days=options['days'],
+        )
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+        endpoints = run_benchmarks(
+            salons[0],
+            iterations=options['iterations'],
+            include_writes=not options['skip_writes'],
+            clear_cache=not options['warm_cache'],
+        )
+        return {
+            'meta': {
+                'commit': current_commit(),
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'volumes': {key: options[key] for key in (
+                    'salons', 'staff', 'receipts', 'lines', 'days')},
+                'iterations': options['iterations'],
+                'warm_cache': options['warm_cache'],
+            },
+            'endpoints': endpoints,
+        }
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"endpoint":48} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} '
+            f'{"p99 ms":>9} {"queries":>7} {"bytes":>9}')
+        for label, result in results['endpoints'].items():
+            self.stdout.write(
+                f'{label:48} {result["status"]:>6} {result["p50_ms"]:>9.2f} '
+                f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                f'{result["queries"]:>7} {result["bytes"]:>9}')
+
+    def print_comparison(self, baseline, results):
+        self.stdout.write(
+            f'\nvs {baseline["meta"].get("commit")} '
+            f'({baseline["meta"].get("created_at")})')
+        for label, metric, old, new, change in compare_results(baseline, results):
+            if change is None or abs(change) < 10:
+                continue
+            style = self.style.ERROR if change > 0 else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{label:48} {metric:8} {old:>10} -> {new:<10} {change:+.1f}%'))
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from salon.benchmarks import CONNECTION_MODES, current_commit, run_connection_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Compare per-request database latency with a new connection per '
+            'request, persistent connections and the connection pool')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Concurrent request threads')
+        parser.add_argument('--queries', type=int, default=3,
+                            help='Queries per request')
+        parser.add_argument('--modes', nargs='+', choices=CONNECTION_MODES,
+                            default=list(CONNECTION_MODES))
+        parser.add_argument('--output', help='Write results to this JSON file')
+
+    def handle(self, *args, requests, threads, queries, modes, output=None, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Connection pooling needs PostgreSQL')
+        if requests < 1 or threads < 1 or queries < 1:
+            raise CommandError('--requests, --threads and --queries must be at least 1')
+
+        results = run_connection_benchmarks(modes, requests, threads, queries)
+
+        baseline = results.get('connect')
+        self.stdout.write(
+            f'{"mode":12} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+            f'{"mean ms":>9} {"req/s":>9} {"vs connect":>11}')
+        for mode, result in results.items():
+            speedup = ''
+            if baseline and mode != 'connect':
+                speedup = f'{baseline["mean_ms"] / result["mean_ms"]:.1f}x'
+            self.stdout.write(
+                f'{mode:12} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["mean_ms"]:>9.2f} '
+                f'{result["requests_per_s"]:>9.1f} {speedup:>11}')
+
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump({
+                    'meta': {
+                        'commit': current_commit(),
+                        'created_at': timezone.now().isoformat(),
+                        'requests': requests,
+                        'threads': threads,
+                        'queries': queries,
+                    },
+                    'modes': results,
+                }, output_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved {output}'))
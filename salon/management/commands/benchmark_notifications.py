@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.fake_onesignal import FakeOneSignalServer
+from services.onesignal_service import OneSignalService
+
+
+class Command(BaseCommand):
+    help = 'Measure OneSignalService fan-out throughput against a local fake provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20000)
+        parser.add_argument('--sends', type=int, default=5)
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Fake provider latency per request, seconds')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, players, sends, latency, chunk_size, concurrency, **options):
+        server = FakeOneSignalServer(latency=latency).start()
+        try:
+            service = OneSignalService(
+                api_root=server.api_root,
+                chunk_size=chunk_size,
+                concurrency=concurrency,
+            )
+            player_ids = [f'player-{index}' for index in range(players)]
+
+            started = time.perf_counter()
+            for _ in range(sends):
+                result = service.send_notification_by_ids(
+                    player_ids, heading='Benchmark', content='Benchmark',
+                    raise_errors=True)
+                self.stdout.write(str(result['metrics']))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{sends * players} players in {server.requests} requests, '
+            f'{elapsed:.2f}s, {sends * players / elapsed:.0f} players/s'))
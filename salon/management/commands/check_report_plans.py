@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from salon.models import ReceiptModel, Salon, StaffDailyRollup, StaffReceipt
+
+# SalonViewSet report actions, by url_name
+REPORT_ACTIONS = [
+    'receipts',
+    'staff-receipts',
+    'staff-receipts-statistics',
+    'staff-service-revenue',
+]
+
+LARGE_TABLES = [
+    ReceiptModel._meta.db_table,
+    StaffReceipt._meta.db_table,
+    StaffDailyRollup._meta.db_table,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the SQL of every SalonViewSet report action and fail '
+        'if the receipt tables are sequentially scanned. Run it against a '
+        'database seeded with production-like volumes: the planner always '
+        'seq scans small tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salon', dest='salon_id', type=int, required=True)
+        parser.add_argument('--user', dest='user_id', type=int,
+                            help='Request as this user, defaults to the owner')
+        parser.add_argument('--params', default='',
+                            help='Query string passed to every action, '
+                                 'e.g. created_at_range_after=2025-01-01')
+
+    def handle(self, *args, salon_id, user_id=None, params='', **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are only checked on PostgreSQL')
+
+        salon = Salon.objects.get(id=salon_id)
+        user = User.objects.get(id=user_id) if user_id else salon.owner
+        factory = APIRequestFactory()
+
+        failures = []
+        for url_name in REPORT_ACTIONS:
+            path = reverse(f'salon-{url_name}', args=[salon.id])
+            request = factory.get(f'{path}?{params}')
+            force_authenticate(request, user=user)
+            match = resolve(path)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = match.func(request, *match.args, **match.kwargs)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{url_name} returned {response.status_code}: {response.data}')
+
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(
+                        table in sql for table in LARGE_TABLES):
+                    continue
+
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN {sql}')
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+                scanned = [table for table in LARGE_TABLES
+                           if f'Seq Scan on {table}' in plan]
+                if scanned:
+                    failures.append(url_name)
+                    self.stdout.write(self.style.ERROR(
+                        f'{url_name}: seq scan on {", ".join(scanned)}'))
+                    self.stdout.write(f'{sql}\n{plan}\n')
+
+            if url_name not in failures:
+                self.stdout.write(self.style.SUCCESS(f'{url_name}: ok'))
+
+        if failures:
+            raise CommandError(
+                f'Sequential scans in: {", ".join(sorted(set(failures)))}')
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salon.models import PayPeriod, Salon
+from salon.payroll import close_pay_period
+
+
+class Command(BaseCommand):
+    help = ('Snapshot every salon\'s payroll for a pay period and close it, '
+            'or only one salon\'s with --salon')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', dest='start_date', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--end', dest='end_date', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--salon', dest='salon_id', type=int,
+                            help='A pay period of this salon only')
+
+    def handle(self, *args, start_date, end_date, salon_id=None, **options):
+        if start_date > end_date:
+            raise CommandError('--start must be before --end')
+
+        if salon_id and not Salon.objects.filter(id=salon_id).exists():
+            raise CommandError(f'Salon {salon_id} does not exist')
+
+        pay_period, _ = PayPeriod.objects.get_or_create(
+            salon_id=salon_id, start_date=start_date, end_date=end_date)
+        if pay_period.is_closed:
+            raise CommandError(f'Pay period {pay_period} is already closed')
+
+        pay_period = close_pay_period(pay_period)
+        self.stdout.write(self.style.SUCCESS(
+            f'Closed pay period {pay_period} with '
+            f'{pay_period.snapshots.count()} payroll snapshots'))
@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salon.partitions import archive_cutoff
+from salon.rollups import (
+    rebuild_staff_daily_rollups,
+    verify_staff_daily_rollups
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify StaffDailyRollup rows for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--salon', dest='salon_id', type=int,
+                            help='Only this salon')
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare, do not write')
+
+    def handle(self, *args, date_from, date_to, salon_id=None, verify=False, **options):
+        if date_from > date_to:
+            raise CommandError('--from must be before --to')
+        # the receipts of archived months are gone from the tables
+        cutoff = archive_cutoff()
+        if cutoff and date_from < cutoff:
+            raise CommandError(
+                f'Receipts before {cutoff} are archived, --from must be {cutoff} or later')
+
+        if not verify:
+            count = rebuild_staff_daily_rollups(date_from, date_to, salon_id)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {count} rollup rows from {date_from} to {date_to}'))
+            return
+
+        mismatches = verify_staff_daily_rollups(date_from, date_to, salon_id)
+        for key, stored, expected in mismatches:
+            self.stdout.write(
+                f'{key}: stored={stored} expected={expected}')
+
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup rows out of sync')
+        self.stdout.write(self.style.SUCCESS('Rollups are in sync'))
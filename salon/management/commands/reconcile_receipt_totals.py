@@ -0,0 +1,112 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salon.totals import (
+    get_receipt_total_diffs,
+    iter_receipt_total_chunks,
+    repair_receipt_totals
+)
+
+
+def format_totals(totals):
+    return ' / '.join(str(value) for value in totals)
+
+
+class Command(BaseCommand):
+    help = ('Check receipt sub total, tip total and total against the sum of '
+            'their staff receipts, chunk by chunk. Receipts with discounts or '
+            'adjustments are checked too, their total only for tip drift. '
+            'Repair chosen receipts with --fix ID [ID ...], their changes are '
+            'printed first')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salon', dest='salon_id', type=int,
+                            help='Only this salon')
+        parser.add_argument('--start-id', type=int, default=0,
+                            help='Resume after this receipt id')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--fix', dest='fix_ids', type=int, nargs='+',
+                            metavar='ID',
+                            help='Rewrite the totals of these receipts from their lines')
+        parser.add_argument('--no-input', action='store_false', dest='interactive',
+                            help="Apply --fix without asking")
+        parser.add_argument('--show', type=int, default=20,
+                            help='Print at most this many mismatches')
+        parser.add_argument('--progress-every', type=int, default=50,
+                            help='Print throughput every N chunks')
+
+    def handle(self, *args, salon_id=None, start_id=0, chunk_size=2000,
+               fix_ids=None, interactive=True, show=20, progress_every=50,
+               **options):
+        if fix_ids:
+            return self.fix(fix_ids, interactive)
+        if chunk_size < 1 or progress_every < 1:
+            raise CommandError('--chunk-size and --progress-every must be at least 1')
+
+        started = time.perf_counter()
+        receipt_count = line_count = mismatch_count = 0
+        last_id = start_id
+        chunk_number = 0
+
+        chunks = iter_receipt_total_chunks(
+            salon_id=salon_id, start_id=start_id, chunk_size=chunk_size)
+        for chunk_number, (last_id, receipts, lines, mismatches) in enumerate(chunks, 1):
+            receipt_count += receipts
+            line_count += lines
+
+            for receipt_id, receipt_salon_id, stored, expected in mismatches:
+                mismatch_count += 1
+                if mismatch_count <= show:
+                    self.stdout.write(self.style.WARNING(
+                        f'receipt {receipt_id} (salon {receipt_salon_id}): '
+                        f'sub total / tip total / total {format_totals(stored)}, '
+                        f'lines sum to {format_totals(expected)}'))
+
+            if chunk_number % progress_every == 0:
+                self.write_progress(started, last_id, receipt_count,
+                                    line_count, mismatch_count)
+
+        if chunk_number % progress_every or not chunk_number:
+            self.write_progress(started, last_id, receipt_count,
+                                line_count, mismatch_count)
+        if mismatch_count:
+            self.stdout.write(self.style.WARNING(
+                f'{mismatch_count} receipts mismatched, repair the ones to '
+                f'change with --fix ID [ID ...]'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All receipt totals match'))
+
+    def write_progress(self, started, last_id, receipt_count, line_count,
+                       mismatch_count):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(
+            f'up to receipt {last_id}: {receipt_count} receipts, '
+            f'{line_count} lines, {mismatch_count} mismatched in {elapsed:.1f}s '
+            f'({receipt_count / elapsed:.0f} receipts/s, '
+            f'{line_count / elapsed:.0f} lines/s)')
+
+    def fix(self, receipt_ids, interactive):
+        diffs = get_receipt_total_diffs(receipt_ids)
+        for receipt_id in receipt_ids:
+            if receipt_id not in diffs:
+                self.stdout.write(
+                    f'receipt {receipt_id}: nothing to fix (missing or matching)')
+                continue
+            stored, expected = diffs[receipt_id]
+            self.stdout.write(
+                f'receipt {receipt_id}: sub total / tip total / total '
+                f'{format_totals(stored)} -> {format_totals(expected)}')
+        if not diffs:
+            return
+
+        if interactive and input(
+                f'Rewrite the totals of {len(diffs)} receipts? [y/N] ').lower() != 'y':
+            self.stdout.write('Nothing changed')
+            return
+        repaired_ids = repair_receipt_totals(list(diffs))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(repaired_ids)} receipts repaired'))
+        # an edit between the preview and the repair can settle a receipt
+        for receipt_id in sorted(set(diffs) - set(repaired_ids)):
+            self.stdout.write(f'receipt {receipt_id} matched by the time it was locked')
@@ -0,0 +1,49 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salon.enums import TipSplitRuleEnums
+from salon.models import Salon
+from salon.partitions import archive_cutoff
+from salon.tips import TIP_SPLIT_RULES, resplit_salon_tips
+
+
+class Command(BaseCommand):
+    help = 'Split receipt tips again for a date range with the salon\'s tip split rule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', required=True,
+                            type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--salon', dest='salon_id', type=int,
+                            help='Only this salon')
+        parser.add_argument('--rule', choices=sorted(TIP_SPLIT_RULES),
+                            help='Use this rule instead of the salon\'s')
+
+    def handle(self, *args, date_from, date_to, salon_id=None, rule=None, **options):
+        if date_from > date_to:
+            raise CommandError('--from must be before --to')
+        # the receipts of archived months are gone from the tables
+        cutoff = archive_cutoff()
+        if cutoff and date_from < cutoff:
+            raise CommandError(
+                f'Receipts before {cutoff} are archived, --from must be {cutoff} or later')
+
+        salons = Salon.objects.all()
+        if salon_id:
+            salons = salons.filter(id=salon_id)
+        if not rule:
+            salons = salons.exclude(
+                tip_split_rule=TipSplitRuleEnums.MANUAL.value)
+
+        for salon in salons:
+            started = time.perf_counter()
+            count = resplit_salon_tips(salon, date_from, date_to, rule=rule)
+            self.stdout.write(
+                f'{salon.name}: {count} receipts re-split '
+                f'in {time.perf_counter() - started:.3f}s')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Tips re-split from {date_from} to {date_to}'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from salon.notifications import send_pending_notifications
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued push notifications from the NotificationOutbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due rows and exit')
+
+    def handle(self, *args, batch_size, max_attempts, interval, once=False, **options):
+        while True:
+            sent, retried, failed = send_pending_notifications(
+                batch_size=batch_size, max_attempts=max_attempts)
+
+            if sent or retried or failed:
+                self.stdout.write(
+                    f'sent={sent} retried={retried} failed={failed}')
+                continue
+
+            if once:
+                return
+            time.sleep(interval)
@@ -0,0 +1,276 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import (
+    LIST_SERIALIZER_KWARGS,
+    LIST_SERIALIZER_KWARGS_REMOVE,
+    ListSerializer
+)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time spent producing the response', DURATION_BUCKETS),
+    'http_request_view_seconds': (
+        'Time spent in the view', DURATION_BUCKETS),
+    'http_request_db_seconds': (
+        'Time spent running SQL queries', DURATION_BUCKETS),
+    'http_request_serialize_seconds': (
+        'Time spent in serializers and rendering the body', DURATION_BUCKETS),
+    'http_request_queries': (
+        'SQL queries run per request', QUERY_BUCKETS),
+    'http_response_size_bytes': (
+        'Size of the response body, streaming responses excluded', SIZE_BUCKETS),
+}
+
+current_timer = ContextVar('request_timer', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Histograms and response counters per (route, method), kept in this
+    process. Every worker serves its own numbers on /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in HISTOGRAMS}
+        self._responses = Counter()
+
+    def observe(self, route, method, status_code, values):
+        labels = (route, method)
+        with self._lock:
+            self._responses[(route, method, status_code)] += 1
+            for name, value in values.items():
+                if value is None:
+                    continue
+                histogram = self._histograms[name].get(labels)
+                if histogram is None:
+                    histogram = self._histograms[name][labels] = Histogram(
+                        HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = [
+            '# HELP salon_http_responses_total Responses by route and status',
+            '# TYPE salon_http_responses_total counter',
+        ]
+        with self._lock:
+            for (route, method, status_code), count in sorted(self._responses.items()):
+                lines.append(
+                    f'salon_http_responses_total'
+                    f'{_labels(route=route, method=method, status=status_code)} {count}')
+
+            for name, (help_text, _) in HISTOGRAMS.items():
+                metric = f'salon_{name}'
+                lines += [f'# HELP {metric} {help_text}',
+                          f'# TYPE {metric} histogram']
+                for (route, method), histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{metric}_bucket'
+                            f'{_labels(route=route, method=method, le=bound)} {cumulative}')
+                    labels = _labels(route=route, method=method)
+                    lines += [
+                        f'{metric}_bucket{_labels(route=route, method=method, le="+Inf")} '
+                        f'{histogram.count}',
+                        f'{metric}_sum{labels} {histogram.sum:.6f}',
+                        f'{metric}_count{labels} {histogram.count}',
+                    ]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    values = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels.items()
+    )
+    return '{' + values + '}'
+
+
+registry = MetricsRegistry()
+
+
+class RequestTimer:
+    """Timings of one request. Also the execute wrapper counting its queries."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+        self.queries = 0
+        self.db_seconds = 0
+        self.serialize_seconds = 0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def rendered(self, response):
+        self.serialize_seconds += time.perf_counter() - self.view_finished
+
+    @property
+    def total_seconds(self):
+        return self.finished - self.started
+
+    @property
+    def view_seconds(self):
+        if self.view_started is None:
+            return None
+        return (self.view_finished or self.finished) - self.view_started
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_seconds * 1000:.1f}',
+        ]
+        if self.view_started is not None:
+            metrics.append(f'view;dur={self.view_seconds * 1000:.1f}')
+        metrics.append(f'total;dur={self.total_seconds * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timing_serializer():
+    """Add the block to the request's serialize time, unless nested in one."""
+    timer = current_timer.get()
+    if timer is None or timer.serializing:
+        yield
+        return
+    timer.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.serializing = False
+        timer.serialize_seconds += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """
+    Counts building serializer.data into the serialize time of the request,
+    many=True serializers get a TimedListSerializer unless Meta sets one.
+    """
+
+    @property
+    def data(self):
+        with timing_serializer():
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if hasattr(getattr(cls, 'Meta', None), 'list_serializer_class'):
+            return super().many_init(*args, **kwargs)
+        # BaseSerializer.many_init with another default list class
+        list_kwargs = {key: kwargs.pop(key)
+                       for key in LIST_SERIALIZER_KWARGS_REMOVE if key in kwargs}
+        list_kwargs['child'] = cls(*args, **kwargs)
+        list_kwargs.update({key: value for key, value in kwargs.items()
+                            if key in LIST_SERIALIZER_KWARGS})
+        return TimedListSerializer(*args, **list_kwargs)
+
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    pass
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count and time, serializer and render time, view time
+    and response size per resolved route (e.g. salon-staff-receipts-
+    statistics) into the metrics registry, and sends them back in a
+    Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        timer.finished = time.perf_counter()
+
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(
+            match.view_name if match else 'unmatched',
+            request.method,
+            response.status_code,
+            {
+                'http_request_duration_seconds': timer.total_seconds,
+                'http_request_view_seconds': timer.view_seconds,
+                'http_request_db_seconds': timer.db_seconds,
+                'http_request_serialize_seconds': timer.serialize_seconds,
+                'http_request_queries': timer.queries,
+                'http_response_size_bytes': (
+                    None if response.streaming else len(response.content)),
+            },
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timer.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = current_timer.get()
+        if timer is not None:
+            timer.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        timer = current_timer.get()
+        if timer is not None:
+            timer.view_finished = time.perf_counter()
+            response.add_post_render_callback(timer.rendered)
+        return response
+
+
+def metrics_allowed(request):
+    """Scrapes carry METRICS_TOKEN as a bearer token, none are allowed without it."""
+    if not settings.METRICS_TOKEN:
+        return False
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode())
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_staff_daily_rollups(apps, schema_editor):
+    StaffReceipt = apps.get_model('salon', 'StaffReceipt')
+    StaffDailyRollup = apps.get_model('salon', 'StaffDailyRollup')
+
+    rows = StaffReceipt.objects.filter(
+        receipt__salon__isnull=False
+    ).annotate(
+        date=TruncDate('created_at')
+    ).values(
+        'receipt__salon_id', 'staff_id', 'date', 'receipt__payment_status'
+    ).annotate(
+        total_service_amount=Sum('service_amount'),
+        total_tip_amount=Sum('tip_amount'),
+        total_discount_price=Sum('discount_price'),
+        total_turn=Count('id'),
+    ).order_by()
+
+    StaffDailyRollup.objects.bulk_create(
+        (
+            StaffDailyRollup(
+                salon_id=row['receipt__salon_id'],
+                staff_id=row['staff_id'],
+                date=row['date'],
+                payment_status=row['receipt__payment_status'],
+                service_amount=row['total_service_amount'],
+                tip_amount=row['total_tip_amount'],
+                discount_price=row['total_discount_price'],
+                turn_count=row['total_turn'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='staff',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='StaffDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid')], max_length=20)),
+                ('service_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tip_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('discount_price', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('turn_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('salon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='salon.salon')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='salon.staff')),
+            ],
+            options={
+                'verbose_name': 'Staff Daily Rollup',
+                'verbose_name_plural': 'Staff Daily Rollups',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['salon', 'payment_status', 'date'], name='salon_staff_salon_i_c4988f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('salon', 'staff', 'date', 'payment_status'), name='unique_staff_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(
+            backfill_staff_daily_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+from salon.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('salon', '0002_staffdailyrollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='receiptmodel',
+            index=models.Index(fields=['salon', 'payment_status', 'created_at'],
+                               name='receipt_salon_status_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='staffreceipt',
+            index=models.Index(fields=['staff', 'created_at'],
+                               name='staffreceipt_staff_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='staffreceipt',
+            index=models.Index(fields=['receipt', 'created_at'],
+                               name='staffreceipt_receipt_created'),
+        ),
+    ]
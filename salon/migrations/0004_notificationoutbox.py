@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0003_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=50)),
+                ('heading', models.CharField(max_length=255)),
+                ('content', models.TextField(blank=True, default='')),
+                ('user_ids', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('receipt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='salon.receiptmodel')),
+            ],
+            options={
+                'verbose_name': 'Notification Outbox',
+                'verbose_name_plural': 'Notification Outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='salon_notif_status_eddcf6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0004_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('CLOSED', 'Closed')], default='OPEN', max_length=20)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Pay Period',
+                'verbose_name_plural': 'Pay Periods',
+                'ordering': ['-start_date'],
+                'constraints': [models.UniqueConstraint(fields=('start_date', 'end_date'), name='unique_pay_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commission_rate', models.DecimalField(decimal_places=4, max_digits=7)),
+                ('service_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('commission_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tip_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('discount_price', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('turn_count', models.IntegerField(default=0)),
+                ('net_payout', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pay_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='salon.payperiod')),
+                ('salon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='salon.salon')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='salon.staff')),
+            ],
+            options={
+                'verbose_name': 'Payroll Snapshot',
+                'verbose_name_plural': 'Payroll Snapshots',
+                'ordering': ['salon', 'staff'],
+                'constraints': [models.UniqueConstraint(fields=('pay_period', 'salon', 'staff'), name='unique_payroll_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:59
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0005_payroll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptmodel',
+            name='house_tip_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='tip_house_share',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Share of a pooled tip kept by the house, 0 to 1', max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0')), django.core.validators.MaxValueValidator(Decimal('1'))]),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='tip_split_rule',
+            field=models.CharField(choices=[('MANUAL', 'Manual'), ('PROPORTIONAL', 'Proportional to service'), ('EQUAL', 'Equal'), ('POOLED', 'Pooled with house share')], default='MANUAL', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0006_tip_split'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='data_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0007_salon_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('RECEIPT', 'Receipt'), ('STAFF_RECEIPT', 'Staff Receipt'), ('STAFF', 'Staff')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Tombstone',
+                'verbose_name_plural': 'Sync Tombstones',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='receiptmodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='staffreceipt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='salon',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='salon.salon'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['salon', 'deleted_at', 'id'], name='salon_synct_salon_i_ff63a5_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+from salon.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('salon', '0008_sync_feed'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='receiptmodel',
+            index=models.Index(fields=['salon', 'updated_at', 'id'],
+                               name='receipt_salon_updated'),
+        ),
+        AddIndexConcurrently(
+            model_name='staffreceipt',
+            index=models.Index(fields=['updated_at', 'id'],
+                               name='staffreceipt_updated'),
+        ),
+        AddIndexConcurrently(
+            model_name='staff',
+            index=models.Index(fields=['salon', 'updated_at', 'id'],
+                               name='staff_salon_updated'),
+        ),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:23
+
+import re
+from datetime import date, datetime, time
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# partitioned by month of created_at, see salon/partitions.py
+PARTITIONED_TABLES = ('salon_receiptmodel', 'salon_staffreceipt')
+MONTHS_AHEAD = 3
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_bound(month):
+    # local midnight, like salon.rollups.day_start
+    return timezone.make_aware(datetime.combine(month, time.min)).isoformat()
+
+
+def rebuild_table(cursor, table, partitioned):
+    """
+    Copy table into a new one, range partitioned by month of created_at
+    or plain, keeping its columns, defaults, checks, indexes and foreign
+    keys. A partitioned table's primary key has to include created_at.
+    Rows of months without a partition go to the default one.
+    """
+    old_table = f'{table}_old'
+    sequence = f'{table}_id_seq'
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+        'WHERE indrelid = %s::regclass AND NOT indisprimary', [old_table])
+    index_definitions = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = %s::regclass AND contype = 'f'", [old_table])
+    foreign_keys = cursor.fetchall()
+
+    if partitioned:
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)')
+
+        cursor.execute(f'SELECT min(created_at) FROM {old_table}')
+        month = timezone.localdate(cursor.fetchone()[0] or timezone.now()).replace(day=1)
+        last_month = timezone.localdate().replace(day=1)
+        for _ in range(MONTHS_AHEAD):
+            last_month = next_month(last_month)
+        while month <= last_month:
+            cursor.execute(
+                f'CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{month_bound(month)}') "
+                f"TO ('{month_bound(next_month(month))}')")
+            month = next_month(month)
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    else:
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS)')
+
+    # the old id sequence, identity or serial, is dropped with the old table
+    cursor.execute(f'CREATE SEQUENCE {sequence}_new OWNED BY {table}.id')
+    cursor.execute(
+        f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}_new')")
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+    cursor.execute(
+        f"SELECT setval('{sequence}_new', COALESCE(max(id), 0) + 1, false) FROM {table}")
+    cursor.execute(f'DROP TABLE {old_table}')
+    cursor.execute(f'ALTER SEQUENCE {sequence}_new RENAME TO {sequence}')
+
+    # after the drop, so the old table's index names are free again
+    if partitioned:
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+    else:
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    for definition in index_definitions:
+        cursor.execute(re.sub(
+            r' ON (ONLY )?\S+ USING ', f' ON {table} USING ', definition, count=1))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    cursor.execute(f'ANALYZE {table}')
+
+
+def partition_receipt_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            rebuild_table(cursor, table, partitioned=True)
+
+
+def unpartition_receipt_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            rebuild_table(cursor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    # rewrites both tables under an exclusive lock, run it in a quiet window
+
+    dependencies = [
+        ('salon', '0009_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='receipt',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='salon.receiptmodel'),
+        ),
+        migrations.AlterField(
+            model_name='staffreceipt',
+            name='receipt',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='staff_receipts', to='salon.receiptmodel'),
+        ),
+        migrations.CreateModel(
+            name='ReceiptArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=63)),
+                ('month', models.DateField()),
+                ('chunk', models.IntegerField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('row_count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Receipt Archive',
+                'verbose_name_plural': 'Receipt Archives',
+                'ordering': ['table_name', 'month', 'chunk'],
+                'constraints': [models.UniqueConstraint(fields=('table_name', 'month', 'chunk'), name='unique_receipt_archive_chunk')],
+            },
+        ),
+        migrations.RunPython(
+            partition_receipt_tables, unpartition_receipt_tables),
+    ]
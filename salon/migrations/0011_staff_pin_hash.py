@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0010_receipt_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staff',
+            name='pin_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
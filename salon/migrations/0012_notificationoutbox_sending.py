@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0011_staff_pin_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+    ]
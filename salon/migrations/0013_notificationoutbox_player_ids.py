@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0012_notificationoutbox_sending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='player_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
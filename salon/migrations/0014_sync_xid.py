@@ -0,0 +1,85 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+SYNC_TABLES = (
+    'salon_receiptmodel',
+    'salon_staffreceipt',
+    'salon_staff',
+    'salon_synctombstone',
+)
+
+
+def create_sync_xid_triggers(apps, schema_editor):
+    # stamp every written row with the id of its transaction, on a
+    # partitioned table the trigger is cloned to every partition
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE FUNCTION salon_set_sync_xid() RETURNS trigger AS $$ '
+            'BEGIN NEW.sync_xid := pg_current_xact_id()::text::bigint; '
+            'RETURN NEW; END $$ LANGUAGE plpgsql')
+        for table in SYNC_TABLES:
+            cursor.execute(
+                f'CREATE TRIGGER {table}_sync_xid BEFORE INSERT OR UPDATE '
+                f'ON {table} FOR EACH ROW EXECUTE FUNCTION salon_set_sync_xid()')
+
+
+def drop_sync_xid_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in SYNC_TABLES:
+            cursor.execute(f'DROP TRIGGER {table}_sync_xid ON {table}')
+        cursor.execute('DROP FUNCTION salon_set_sync_xid()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0013_notificationoutbox_player_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receiptmodel',
+            name='sync_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='sync_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='staffreceipt',
+            name='sync_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='sync_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='receiptmodel',
+            index=models.Index(fields=['salon', 'sync_xid', 'id'], name='receipt_salon_xid'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['salon', 'sync_xid', 'id'], name='staff_salon_xid'),
+        ),
+        migrations.AddIndex(
+            model_name='staffreceipt',
+            index=models.Index(fields=['sync_xid', 'id'], name='staffreceipt_xid'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['salon', 'sync_xid', 'id'], name='synctombstone_salon_xid'),
+        ),
+        migrations.RunPython(
+            create_sync_xid_triggers, drop_sync_xid_triggers),
+    ]
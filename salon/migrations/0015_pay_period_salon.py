@@ -0,0 +1,41 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salon', '0014_sync_xid'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='payperiod',
+            name='unique_pay_period',
+        ),
+        migrations.AddField(
+            model_name='payperiod',
+            name='salon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pay_periods', to='salon.salon'),
+        ),
+        migrations.AlterField(
+            model_name='payrollsnapshot',
+            name='salon',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='salon.salon'),
+        ),
+        migrations.AlterField(
+            model_name='payrollsnapshot',
+            name='staff',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='salon.staff'),
+        ),
+        migrations.AddConstraint(
+            model_name='payperiod',
+            constraint=models.UniqueConstraint(fields=('salon', 'start_date', 'end_date'), name='unique_pay_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='payperiod',
+            constraint=models.UniqueConstraint(condition=models.Q(('salon__isnull', True)), fields=('start_date', 'end_date'), name='unique_shared_pay_period'),
+        ),
+    ]
@@ -1,7 +1,17 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
-from salon.enums import UserRoleEnums
+from salon.enums import (
+    UserRoleEnums,
+    NotificationStatusEnums,
+    PayPeriodStatusEnums,
+    TipSplitRuleEnums,
+    SyncEntityEnums
+)
 # Create your models here.
 
 class SoftDeleteManager(models.Manager):
@@ -29,6 +39,13 @@ class SoftDeleteModel(models.Model):
         
 
 class Salon(models.Model):
+    TIP_SPLIT_RULE_CHOICES = (
+        (TipSplitRuleEnums.MANUAL.value, 'Manual'),
+        (TipSplitRuleEnums.PROPORTIONAL.value, 'Proportional to service'),
+        (TipSplitRuleEnums.EQUAL.value, 'Equal'),
+        (TipSplitRuleEnums.POOLED.value, 'Pooled with house share'),
+    )
+
     name = models.CharField(max_length=100)
     address = models.TextField(null=True, blank=True)
     phone = models.CharField(max_length=15, null=True, blank=True)
@@ -37,6 +54,18 @@ class Salon(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(
         User, on_delete=models.CASCADE, null=True, blank=True)
+    tip_split_rule = models.CharField(
+        max_length=20, choices=TIP_SPLIT_RULE_CHOICES,
+        default=TipSplitRuleEnums.MANUAL.value)
+    tip_house_share = models.DecimalField(
+        max_digits=5, decimal_places=4, default=0,
+        validators=[MinValueValidator(Decimal('0')),
+                    MaxValueValidator(Decimal('1'))],
+        help_text="Share of a pooled tip kept by the house, 0 to 1")
+    # change watermark of the salon's receipts, bumped by every write
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+    data_changed_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.name} - {self.owner}'
@@ -56,12 +85,34 @@ class Salon(models.Model):
 #         return self.title
 
 
+ROLE_IDS_CACHE_KEY = 'role-ids'
+
+
+class RoleManager(models.Manager):
+
+    def get_ids(self):
+        """{title: id} of every role, cached until a role changes."""
+        role_ids = cache.get(ROLE_IDS_CACHE_KEY)
+        if role_ids is None:
+            role_ids = dict(self.values_list('title', 'id'))
+            cache.set(ROLE_IDS_CACHE_KEY, role_ids, None)
+        return role_ids
+
+    def get_id(self, title):
+        role_id = self.get_ids().get(title)
+        if role_id is None:
+            raise Role.DoesNotExist(f'No role titled {title}')
+        return role_id
+
+
 class Role(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RoleManager()
+
     def __str__(self):
         return self.title
 
@@ -85,6 +136,9 @@ class Staff(SoftDeleteModel):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # id of the transaction that last wrote the row, set by a PostgreSQL
+    # trigger (migration 0014), orders the salon changes feed
+    sync_xid = models.BigIntegerField(default=0, editable=False)
     salon = models.ForeignKey(
         Salon, on_delete=models.CASCADE, null=True, blank=True)
     user = models.OneToOneField(
@@ -97,11 +151,14 @@ class Staff(SoftDeleteModel):
     role = models.ForeignKey(
         Role, on_delete=models.SET_NULL, null=True, blank=True, related_name='role')
 
+    # keyed digest of the quick-switch PIN, see salon.staff_pins
+    pin_hash = models.CharField(max_length=64, blank=True, default='')
+
     def save(self, *args, **kwargs):
         # Create User instance if not exists
         if not self.user and self.phone:
             username = self.phone  # Use phone as username
-            user = User.objects.create(
+            user = User(
                 username=username,
                 email=self.email,
                 first_name=self.first_name,
@@ -111,9 +168,8 @@ class Staff(SoftDeleteModel):
             user.save()
             self.user = user
 
-        if not self.role:
-            role = Role.objects.get(title=UserRoleEnums.STAFF.value)
-            self.role = role
+        if not self.role_id:
+            self.role_id = Role.objects.get_id(UserRoleEnums.STAFF.value)
 
         super().save(*args, **kwargs)
     
@@ -124,6 +180,12 @@ class Staff(SoftDeleteModel):
         verbose_name = "Staff"
         verbose_name_plural = "Staff"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['salon', 'updated_at', 'id'],
+                         name='staff_salon_updated'),
+            models.Index(fields=['salon', 'sync_xid', 'id'],
+                         name='staff_salon_xid'),
+        ]
 
 
 class ReceiptModel(models.Model):
@@ -144,7 +206,10 @@ class ReceiptModel(models.Model):
     payment_status = models.CharField(
         max_length=20, choices=PAYMENT_STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(default=timezone.now)
-    updated_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # id of the transaction that last wrote the row, set by a PostgreSQL
+    # trigger (migration 0014), orders the salon changes feed
+    sync_xid = models.BigIntegerField(default=0, editable=False)
     salon = models.ForeignKey(
         Salon, on_delete=models.CASCADE, null=True, blank=True)
     total_amount = models.DecimalField(
@@ -152,6 +217,8 @@ class ReceiptModel(models.Model):
     custom_discount = models.FloatField(default=0)
     bonus_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0, null=True, blank=True)
+    house_tip_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0)
 
     def __str__(self):
         return f"Receipt_id {self.id}"
@@ -160,12 +227,23 @@ class ReceiptModel(models.Model):
         verbose_name = "Receipt"
         verbose_name_plural = "Receipts"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['salon', 'payment_status', 'created_at'],
+                         name='receipt_salon_status_created'),
+            models.Index(fields=['salon', 'updated_at', 'id'],
+                         name='receipt_salon_updated'),
+            models.Index(fields=['salon', 'sync_xid', 'id'],
+                         name='receipt_salon_xid'),
+        ]
 
 
 class StaffReceipt(models.Model):
     staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    # no database constraint, a partitioned receipt table has no unique id
+    # to reference (its primary key is id, created_at), Django cascades
     receipt = models.ForeignKey(ReceiptModel, on_delete=models.CASCADE,
-                                null=True, blank=True, related_name='staff_receipts')
+                                null=True, blank=True, related_name='staff_receipts',
+                                db_constraint=False)
     service_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=0)
     tip_amount = models.DecimalField(
@@ -180,7 +258,10 @@ class StaffReceipt(models.Model):
     )
 
     created_at = models.DateTimeField(default=timezone.now)
-    updated_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # id of the transaction that last wrote the row, set by a PostgreSQL
+    # trigger (migration 0014), orders the salon changes feed
+    sync_xid = models.BigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"Receipt for {self.staff.first_name} {self.staff.last_name}"
@@ -189,6 +270,53 @@ class StaffReceipt(models.Model):
         verbose_name = "Staff Receipt"
         verbose_name_plural = "Staff Receipts"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['staff', 'created_at'],
+                         name='staffreceipt_staff_created'),
+            models.Index(fields=['receipt', 'created_at'],
+                         name='staffreceipt_receipt_created'),
+            models.Index(fields=['updated_at', 'id'],
+                         name='staffreceipt_updated'),
+            models.Index(fields=['sync_xid', 'id'],
+                         name='staffreceipt_xid'),
+        ]
+
+
+class StaffDailyRollup(models.Model):
+    """
+    Per staff, per business day totals of StaffReceipt rows.
+    Kept in sync by salon.signals, rebuilt by `rebuild_staff_rollups`.
+    """
+    salon = models.ForeignKey(Salon, on_delete=models.CASCADE)
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    date = models.DateField()
+    payment_status = models.CharField(
+        max_length=20, choices=ReceiptModel.PAYMENT_STATUS_CHOICES)
+    service_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    tip_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    discount_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    turn_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.staff_id} - {self.date} - {self.payment_status}"
+
+    class Meta:
+        verbose_name = "Staff Daily Rollup"
+        verbose_name_plural = "Staff Daily Rollups"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['salon', 'staff', 'date', 'payment_status'],
+                name='unique_staff_daily_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['salon', 'payment_status', 'date'])
+        ]
 
 
 class UserDeviceModel(models.Model):
@@ -209,3 +337,197 @@ class UserDeviceModel(models.Model):
         verbose_name = "User Device"
         verbose_name_plural = "User Devices"
         ordering = ['-created_at']
+
+
+class NotificationOutbox(models.Model):
+    """
+    Push notifications written in the same transaction as the receipt that
+    triggered them, delivered later by the `send_notifications` worker.
+    """
+    STATUS_CHOICES = (
+        (NotificationStatusEnums.PENDING.value, 'Pending'),
+        (NotificationStatusEnums.SENDING.value, 'Sending'),
+        (NotificationStatusEnums.SENT.value, 'Sent'),
+        (NotificationStatusEnums.FAILED.value, 'Failed'),
+    )
+
+    event = models.CharField(max_length=50)
+    receipt = models.ForeignKey(
+        ReceiptModel, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='notifications', db_constraint=False)
+    heading = models.CharField(max_length=255)
+    content = models.TextField(blank=True, default='')
+    user_ids = models.JSONField(default=list)
+    # players a partly failed send still owes, null for every device of user_ids
+    player_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES,
+        default=NotificationStatusEnums.PENDING.value)
+    attempts = models.IntegerField(default=0)
+    # when a SENDING row's lease runs out and another worker may claim it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.event} - {self.status}"
+
+    class Meta:
+        verbose_name = "Notification Outbox"
+        verbose_name_plural = "Notification Outbox"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'])
+        ]
+
+
+class PayPeriod(models.Model):
+    """
+    A payroll period of one salon, or shared by every salon when salon is
+    empty. Closing it stores a PayrollSnapshot per salon and staff, which
+    is served from then on.
+    """
+    STATUS_CHOICES = (
+        (PayPeriodStatusEnums.OPEN.value, 'Open'),
+        (PayPeriodStatusEnums.CLOSED.value, 'Closed'),
+    )
+
+    salon = models.ForeignKey(
+        Salon, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='pay_periods')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES,
+        default=PayPeriodStatusEnums.OPEN.value)
+    closed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_closed(self):
+        return self.status == PayPeriodStatusEnums.CLOSED.value
+
+    def __str__(self):
+        return f"{self.start_date} - {self.end_date}"
+
+    class Meta:
+        verbose_name = "Pay Period"
+        verbose_name_plural = "Pay Periods"
+        ordering = ['-start_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['salon', 'start_date', 'end_date'],
+                name='unique_pay_period'
+            ),
+            models.UniqueConstraint(
+                fields=['start_date', 'end_date'],
+                condition=models.Q(salon__isnull=True),
+                name='unique_shared_pay_period'
+            ),
+        ]
+
+
+class PayrollSnapshot(models.Model):
+    """
+    Immutable payroll figures of one staff member for a closed PayPeriod.
+    Its salon and staff can only be soft-deleted while it exists.
+    """
+    pay_period = models.ForeignKey(
+        PayPeriod, on_delete=models.CASCADE, related_name='snapshots')
+    salon = models.ForeignKey(Salon, on_delete=models.PROTECT)
+    staff = models.ForeignKey(Staff, on_delete=models.PROTECT)
+    commission_rate = models.DecimalField(max_digits=7, decimal_places=4)
+    service_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    commission_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    tip_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    discount_price = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    turn_count = models.IntegerField(default=0)
+    net_payout = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Payroll snapshots can't be changed")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.pay_period} - {self.staff_id}"
+
+    class Meta:
+        verbose_name = "Payroll Snapshot"
+        verbose_name_plural = "Payroll Snapshots"
+        ordering = ['salon', 'staff']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pay_period', 'salon', 'staff'],
+                name='unique_payroll_snapshot'
+            )
+        ]
+
+
+class SyncTombstone(models.Model):
+    """
+    Record of a deleted (or soft-deleted) receipt, staff receipt or staff,
+    so the salon changes feed can tell clients to drop their copy.
+    """
+    ENTITY_CHOICES = (
+        (SyncEntityEnums.RECEIPT.value, 'Receipt'),
+        (SyncEntityEnums.STAFF_RECEIPT.value, 'Staff Receipt'),
+        (SyncEntityEnums.STAFF.value, 'Staff'),
+    )
+
+    salon = models.ForeignKey(Salon, on_delete=models.CASCADE)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    sync_xid = models.BigIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Sync Tombstone"
+        verbose_name_plural = "Sync Tombstones"
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['salon', 'deleted_at', 'id']),
+            models.Index(fields=['salon', 'sync_xid', 'id'],
+                         name='synctombstone_salon_xid'),
+        ]
+
+
+class ReceiptArchive(models.Model):
+    """
+    One gzip-compressed chunk of a receipt table's monthly partition,
+    written by `archive_receipt_partitions` before the partition is
+    dropped. data holds the rows as JSON lines, in id order.
+    """
+    table_name = models.CharField(max_length=63)
+    month = models.DateField()
+    chunk = models.IntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    row_count = models.IntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.table_name} {self.month:%Y-%m} #{self.chunk}"
+
+    class Meta:
+        verbose_name = "Receipt Archive"
+        verbose_name_plural = "Receipt Archives"
+        ordering = ['table_name', 'month', 'chunk']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table_name', 'month', 'chunk'],
+                name='unique_receipt_archive_chunk'
+            )
+        ]
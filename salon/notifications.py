@@ -0,0 +1,210 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from services.onesignal_service import OneSignalSendError, OneSignalService
+from .enums import NotificationStatusEnums
+from .models import NotificationOutbox, Salon, StaffReceipt, UserDeviceModel
+
+RETRY_BACKOFF_BASE = timedelta(seconds=30)
+RETRY_BACKOFF_MAX = timedelta(hours=1)
+# how long a claimed batch stays with its worker, longer than sending it takes
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+NOTIFICATION_LINE_FIELDS = (
+    'staff__user_id',
+    'staff__user__first_name',
+    'service_amount',
+    'tip_amount',
+)
+
+
+def build_receipt_notification(receipt):
+    """Heading, content and recipient user ids for a receipt notification."""
+    lines = receipt.staff_receipts.values_list(*NOTIFICATION_LINE_FIELDS)
+    owner_id = receipt.salon.owner_id if receipt.salon_id else None
+    return _receipt_notification(receipt, owner_id, lines)
+
+
+def _receipt_notification(receipt, owner_id, lines):
+    content = ""
+    user_ids = [owner_id]
+
+    for user_id, first_name, service_amount, tip_amount in lines:
+        user_ids.append(user_id)
+        content += f"{first_name} - "
+        content += f"Sale: ${service_amount} - "
+        content += f"Tip: ${tip_amount} \n"
+
+    heading = f"New receipt: {receipt.payment_status}"
+    user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+    return heading, content, user_ids
+
+
+def enqueue_receipt_notification(receipt, event):
+    """
+    Queue a notification for the receipt. Call it inside the transaction that
+    wrote the receipt so that both commit or roll back together.
+    """
+    heading, content, user_ids = build_receipt_notification(receipt)
+    return NotificationOutbox.objects.create(
+        event=event,
+        receipt=receipt,
+        heading=heading,
+        content=content,
+        user_ids=user_ids,
+    )
+
+
+def enqueue_receipt_notifications(receipts, event):
+    """
+    enqueue_receipt_notification() for many receipts, with one query for
+    their lines, one for their salons' owners and one insert.
+    """
+    lines = {receipt.id: [] for receipt in receipts}
+    rows = StaffReceipt.objects.filter(
+        receipt_id__in=lines,
+    ).values_list('receipt_id', *NOTIFICATION_LINE_FIELDS)
+    for receipt_id, *line in rows:
+        lines[receipt_id].append(line)
+    owner_ids = dict(Salon.objects.filter(
+        id__in={receipt.salon_id for receipt in receipts if receipt.salon_id},
+    ).values_list('id', 'owner_id'))
+
+    notifications = []
+    for receipt in receipts:
+        heading, content, user_ids = _receipt_notification(
+            receipt, owner_ids.get(receipt.salon_id), lines[receipt.id])
+        notifications.append(NotificationOutbox(
+            event=event,
+            receipt=receipt,
+            heading=heading,
+            content=content,
+            user_ids=user_ids,
+        ))
+    return NotificationOutbox.objects.bulk_create(notifications)
+
+
+def retry_delay(attempts):
+    return min(RETRY_BACKOFF_BASE * 2 ** (attempts - 1), RETRY_BACKOFF_MAX)
+
+
+def claim_notifications(batch_size, max_attempts, lease=CLAIM_LEASE):
+    """
+    Mark one batch of due outbox rows SENDING for this worker, in a short
+    transaction with SKIP LOCKED so several workers can drain the outbox
+    side by side. A SENDING row whose lease ran out belongs to a worker
+    that died mid-batch: it is claimed again, or failed once it is out of
+    attempts. The claim counts as an attempt.
+    """
+    now = timezone.now()
+    sending = NotificationStatusEnums.SENDING.value
+
+    with transaction.atomic():
+        NotificationOutbox.objects.filter(
+            status=sending,
+            next_attempt_at__lte=now,
+            attempts__gte=max_attempts,
+        ).update(
+            status=NotificationStatusEnums.FAILED.value,
+            last_error='Lease expired while sending',
+        )
+
+        batch = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+                status__in=[NotificationStatusEnums.PENDING.value, sending],
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for item in batch:
+            item.status = sending
+            item.attempts += 1
+            item.next_attempt_at = now + lease
+        NotificationOutbox.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at'])
+
+    return batch
+
+
+def save_notification_result(item, **fields):
+    """
+    Record how sending a claimed row went. Only while the claim holds: a row
+    whose lease ran out and was claimed again belongs to the new worker.
+    """
+    return NotificationOutbox.objects.filter(
+        id=item.id,
+        status=NotificationStatusEnums.SENDING.value,
+        attempts=item.attempts,
+    ).update(**fields)
+
+
+def send_pending_notifications(batch_size=100, max_attempts=5, service=None):
+    """
+    Deliver one batch of due outbox rows. The rows are claimed first, sent
+    outside any transaction and each result is saved on its own, so a slow
+    provider holds no locks and a failure later in the batch never sends
+    the earlier rows again.
+    Returns (sent, retried, failed) counts.
+    """
+    service = service or OneSignalService()
+    sent = retried = failed = 0
+
+    batch = claim_notifications(batch_size, max_attempts)
+    if not batch:
+        return sent, retried, failed
+
+    user_ids = {user_id for item in batch if item.player_ids is None
+                for user_id in item.user_ids}
+    devices = {}
+    for user_id, device_id in UserDeviceModel.objects.filter(
+        user_id__in=user_ids,
+        device_id__isnull=False,
+    ).values_list('user_id', 'device_id'):
+        devices.setdefault(user_id, []).append(device_id)
+
+    for item in batch:
+        player_ids = item.player_ids
+        if player_ids is None:
+            player_ids = [device_id for user_id in item.user_ids
+                          for device_id in devices.get(user_id, [])]
+        try:
+            if player_ids:
+                service.send_notification_by_ids(
+                    player_ids=player_ids,
+                    heading=item.heading,
+                    content=item.content,
+                    raise_errors=True,
+                )
+        except Exception as e:
+            # the chunks that went out are not sent again
+            if isinstance(e, OneSignalSendError):
+                player_ids = e.failed_player_ids
+            if item.attempts >= max_attempts:
+                save_notification_result(
+                    item,
+                    status=NotificationStatusEnums.FAILED.value,
+                    player_ids=player_ids,
+                    last_error=str(e),
+                )
+                failed += 1
+            else:
+                save_notification_result(
+                    item,
+                    status=NotificationStatusEnums.PENDING.value,
+                    next_attempt_at=timezone.now() + retry_delay(item.attempts),
+                    player_ids=player_ids,
+                    last_error=str(e),
+                )
+                retried += 1
+        else:
+            save_notification_result(
+                item,
+                status=NotificationStatusEnums.SENT.value,
+                sent_at=timezone.now(),
+                last_error=None,
+            )
+            sent += 1
+
+    return sent, retried, failed
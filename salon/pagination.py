@@ -0,0 +1,112 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (created_at, id), newest first.
+
+    The cursor is an opaque token holding the key of the last row of the
+    previous page, so every page is a single range scan on the
+    (..., created_at) indexes no matter how deep it is.
+    """
+    page_size = 100
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor = self.decode_cursor(request)
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor:
+            created_at, pk = self.cursor
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=pk)
+            )
+
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    @property
+    def is_first_page(self):
+        return self.cursor is None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, instance):
+        key = f'{instance.created_at.isoformat()}|{instance.id}'
+        return base64.urlsafe_b64encode(key.encode()).decode()
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(
+                token.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class OptInKeysetPagination(KeysetPagination):
+    """
+    KeysetPagination only for requests that pass page_size or cursor, the
+    rest get the whole unpaginated list like before.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not any(param in request.query_params
+                   for param in (self.page_size_query_param, self.cursor_query_param)):
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,266 @@
+import gzip
+import itertools
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ReceiptArchive, ReceiptModel, StaffReceipt
+from .rollups import day_start
+
+PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def partitioned_tables():
+    """Tables partitioned by month of created_at, see migration 0010."""
+    return [ReceiptModel._meta.db_table, StaffReceipt._meta.db_table]
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def partition_month(table, name):
+    """Month of one of table's monthly partitions, None for other names."""
+    match = PARTITION_SUFFIX.search(name)
+    if not match or name != f'{table}{match[0]}':
+        return None
+    return date(int(match[1]), int(match[2]), 1)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def create_month_partition(cursor, table, month):
+    """Partition for one month, bounded by local midnight like business_date()."""
+    quote_name = connection.ops.quote_name
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {quote_name(partition_name(table, month))} '
+        f'PARTITION OF {quote_name(table)} '
+        f"FOR VALUES FROM ('{day_start(month).isoformat()}') "
+        f"TO ('{day_start(add_months(month, 1)).isoformat()}')"
+    )
+
+
+def attached_partitions(cursor, table):
+    """{month: name} of the table's monthly partitions."""
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        """,
+        [table],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        month = partition_month(table, name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+def detached_partitions(cursor, table):
+    """{month: name} of partitions detached by an archive run that stopped."""
+    cursor.execute(
+        """
+        SELECT relname
+        FROM pg_class
+        WHERE relkind = 'r'
+          AND NOT relispartition
+          AND relnamespace = current_schema()::regnamespace
+          AND starts_with(relname, %s)
+        """,
+        [f'{table}_p'],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        month = partition_month(table, name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+def default_partition_months(cursor, table):
+    """
+    Local months of the rows in the table's default partition. PostgreSQL
+    refuses to create a partition for rows the default one already holds.
+    """
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE %s)::date "
+        f'FROM {connection.ops.quote_name(default_partition_name(table))}',
+        [timezone.get_current_timezone_name()])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def missing_partitions(months_ahead=None):
+    """
+    ([(table, month)] of the partitions to create from this month to
+    months_ahead months from now, [(table, month)] of the ones left out
+    because the default partition has rows of that month).
+    """
+    if months_ahead is None:
+        months_ahead = settings.RECEIPT_PARTITION_MONTHS_AHEAD
+    current = month_start(timezone.localdate())
+
+    missing = []
+    blocked = []
+    with connection.cursor() as cursor:
+        for table in partitioned_tables():
+            if not is_partitioned(cursor, table):
+                continue
+            existing = attached_partitions(cursor, table)
+            in_default = default_partition_months(cursor, table)
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if month in existing:
+                    continue
+                if month in in_default:
+                    blocked.append((table, month))
+                else:
+                    missing.append((table, month))
+    return missing, blocked
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the monthly partitions from this month to months_ahead months
+    from now, so new receipts never land in the default partition. Months
+    with rows in the default partition are skipped. Returns the names
+    created and the (table, month) skipped.
+    """
+    missing, blocked = missing_partitions(months_ahead)
+    with connection.cursor() as cursor:
+        for table, month in missing:
+            create_month_partition(cursor, table, month)
+    return [partition_name(table, month) for table, month in missing], blocked
+
+
+def archive_cutoff():
+    """
+    First day whose receipts are all still in the receipt tables, None
+    when nothing was archived. Earlier months were archived, or detached
+    by an archive run that stopped, so rollups and tips of those days
+    can't be computed again.
+    """
+    months = set(ReceiptArchive.objects.values_list('month', flat=True).distinct())
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for table in partitioned_tables():
+                months.update(detached_partitions(cursor, table))
+    return add_months(max(months), 1) if months else None
+
+
+def archivable_partitions(retention_months=None):
+    """
+    [(table, month, name, attached)] of partitions wholly older than the
+    retention, plus ones left detached by an earlier run, oldest first.
+    """
+    if retention_months is None:
+        retention_months = settings.RECEIPT_RETENTION_MONTHS
+    cutoff = add_months(month_start(timezone.localdate()), -retention_months)
+
+    partitions = []
+    with connection.cursor() as cursor:
+        for table in partitioned_tables():
+            if not is_partitioned(cursor, table):
+                continue
+            partitions += [
+                (table, month, name, True)
+                for month, name in attached_partitions(cursor, table).items()
+                if month < cutoff
+            ]
+            partitions += [
+                (table, month, name, False)
+                for month, name in detached_partitions(cursor, table).items()
+            ]
+    return sorted(partitions, key=lambda partition: (partition[1], partition[0]))
+
+
+def archive_partition(table, month, name, attached=True, chunk_rows=None):
+    """
+    Detach a monthly partition, copy its rows into gzip-compressed
+    ReceiptArchive chunks and drop it. The detach commits on its own so
+    the parent table is only locked briefly; a run stopped after it picks
+    the detached table up again. Returns the number of rows archived.
+    """
+    quote_name = connection.ops.quote_name
+    chunk_rows = chunk_rows or settings.RECEIPT_ARCHIVE_CHUNK_ROWS
+
+    if attached:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}')
+
+    row_count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # chunks of a run that stopped before the drop are written again
+        ReceiptArchive.objects.filter(table_name=table, month=month).delete()
+
+        last_id = 0
+        for chunk in itertools.count():
+            cursor.execute(
+                f'SELECT id, row_to_json(t)::text FROM {quote_name(name)} t '
+                f'WHERE id > %s ORDER BY id LIMIT %s',
+                [last_id, chunk_rows],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            ReceiptArchive.objects.create(
+                table_name=table,
+                month=month,
+                chunk=chunk,
+                first_id=rows[0][0],
+                last_id=rows[-1][0],
+                row_count=len(rows),
+                data=gzip.compress('\n'.join(row for _, row in rows).encode()),
+            )
+            last_id = rows[-1][0]
+            row_count += len(rows)
+
+        cursor.execute(f'DROP TABLE {quote_name(name)}')
+    return row_count
+
+
+@transaction.atomic
+def restore_archived_month(table, month):
+    """Put an archived month back into its partition. Returns rows restored."""
+    quote_name = connection.ops.quote_name
+    archives = ReceiptArchive.objects.filter(table_name=table, month=month)
+
+    row_count = 0
+    with connection.cursor() as cursor:
+        create_month_partition(cursor, table, month)
+        for archive in archives.order_by('chunk').iterator(chunk_size=1):
+            rows = gzip.decompress(archive.data).decode().splitlines()
+            cursor.execute(
+                f'INSERT INTO {quote_name(table)} '
+                f'SELECT * FROM json_populate_recordset(NULL::{quote_name(table)}, %s::json)',
+                ['[' + ','.join(rows) + ']'],
+            )
+            row_count += archive.row_count
+
+    archives.delete()
+    return row_count
@@ -0,0 +1,134 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .enums import PaymentStatusEnums, PayPeriodStatusEnums
+from .models import PayPeriod, PayrollSnapshot, StaffDailyRollup
+
+CENT = Decimal('0.01')
+RATE_PLACES = Decimal('0.0001')
+
+PAYROLL_FIELDS = [
+    'salon_id',
+    'staff_id',
+    'commission_rate',
+    'service_amount',
+    'commission_amount',
+    'tip_amount',
+    'discount_price',
+    'turn_count',
+    'net_payout',
+]
+
+
+def to_rate(value):
+    # commission_rate is a FloatField, go through str() to keep 0.6 as 0.6
+    return Decimal(str(value or 0)).quantize(RATE_PLACES, ROUND_HALF_UP)
+
+
+def compute_payroll(start_date, end_date, salon_ids=None):
+    """
+    Payroll rows of every staff member with PAID work between the dates,
+    from one grouped query over StaffDailyRollup. Money is Decimal and
+    rounded to the cent once per staff.
+    """
+    rollups = StaffDailyRollup.objects.filter(
+        payment_status=PaymentStatusEnums.PAID.value,
+        date__gte=start_date,
+        date__lte=end_date,
+    )
+    if salon_ids is not None:
+        rollups = rollups.filter(salon_id__in=salon_ids)
+
+    rows = rollups.values(
+        'salon_id',
+        'staff_id',
+        'staff__first_name',
+        'staff__last_name',
+        'staff__commission_rate',
+    ).annotate(
+        total_service_amount=Sum('service_amount'),
+        total_tip_amount=Sum('tip_amount'),
+        total_discount_price=Sum('discount_price'),
+        total_turn=Sum('turn_count'),
+    ).order_by('salon_id', 'staff_id')
+
+    payroll = []
+    for row in rows:
+        rate = to_rate(row['staff__commission_rate'])
+        service_amount = row['total_service_amount'] or Decimal(0)
+        tip_amount = row['total_tip_amount'] or Decimal(0)
+        commission_amount = (service_amount * rate).quantize(CENT, ROUND_HALF_UP)
+
+        payroll.append({
+            'salon_id': row['salon_id'],
+            'staff_id': row['staff_id'],
+            'staff__first_name': row['staff__first_name'],
+            'staff__last_name': row['staff__last_name'],
+            'commission_rate': rate,
+            'service_amount': service_amount,
+            'commission_amount': commission_amount,
+            'tip_amount': tip_amount,
+            'discount_price': row['total_discount_price'] or Decimal(0),
+            'turn_count': row['total_turn'] or 0,
+            'net_payout': commission_amount + tip_amount,
+        })
+    return payroll
+
+
+def close_pay_period(pay_period):
+    """
+    Snapshot the payroll of the period's salon, or of every salon for a
+    shared period, and close it. Closing twice is a no-op, a closed period
+    is never recomputed.
+    """
+    with transaction.atomic():
+        pay_period = PayPeriod.objects.select_for_update().get(id=pay_period.id)
+        if pay_period.is_closed:
+            return pay_period
+
+        PayrollSnapshot.objects.bulk_create(
+            [
+                PayrollSnapshot(pay_period=pay_period,
+                                **{field: row[field] for field in PAYROLL_FIELDS})
+                for row in compute_payroll(
+                    pay_period.start_date, pay_period.end_date,
+                    salon_ids=[pay_period.salon_id] if pay_period.salon_id else None)
+            ],
+            batch_size=1000,
+        )
+
+        pay_period.status = PayPeriodStatusEnums.CLOSED.value
+        pay_period.closed_at = timezone.now()
+        pay_period.save(update_fields=['status', 'closed_at', 'updated_at'])
+    return pay_period
+
+
+def salon_pay_periods(salon):
+    """The pay periods a salon can read: its own and the shared ones."""
+    return PayPeriod.objects.filter(Q(salon__isnull=True) | Q(salon=salon))
+
+
+def get_salon_pay_period(salon, start_date, end_date):
+    """
+    The salon's pay period with these dates, its own before a shared one,
+    or an unsaved open period when there's none.
+    """
+    pay_period = salon_pay_periods(salon).filter(
+        start_date=start_date, end_date=end_date,
+    ).order_by(F('salon_id').asc(nulls_last=True)).first()
+    if pay_period is None:
+        pay_period = PayPeriod(start_date=start_date, end_date=end_date)
+    return pay_period
+
+
+def get_salon_payroll(pay_period, salon_id):
+    """Snapshot rows of a closed period, live figures of an open one."""
+    if pay_period.is_closed:
+        return list(pay_period.snapshots.filter(salon_id=salon_id).values(
+            *PAYROLL_FIELDS, 'staff__first_name', 'staff__last_name'
+        ).order_by('staff_id'))
+    return compute_payroll(
+        pay_period.start_date, pay_period.end_date, salon_ids=[salon_id])
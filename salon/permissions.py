@@ -1,20 +1,18 @@
 # permissions.py
 from rest_framework import permissions
 
+from salon.access import get_salon_access
+from salon.enums import UserRoleEnums
+
 
 class IsStaffUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and
-                    hasattr(request.user, 'staff'))
+                    get_salon_access(request.user).staff_id is not None)
 
 
 class CanViewReceipts(permissions.BasePermission):
     def has_permission(self, request, view):
-        user_permissions = request.user.user_permissions.all()
-        print('user_permissions', user_permissions)
-        user_permission_codes = [p.codename for p in user_permissions]
-        print('user_permission_codes', user_permission_codes)
-
         return bool(request.user and request.user.has_perm('salon.view_receiptmodel'))
 
 
@@ -35,8 +33,6 @@ class CanViewReports(permissions.BasePermission):
 
 class CanViewStaff(permissions.BasePermission):
     def has_permission(self, request, view):
-        print('request.user', request.user)
-        # return False
         return bool(request.user and request.user.has_perm('salon.view_staff'))
 
 
@@ -44,8 +40,7 @@ class IsStaff(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(
             request.user and
-            hasattr(request.user, 'staff') and
-            request.user.staff.role.title == 'Staff'
+            get_salon_access(request.user).role == UserRoleEnums.STAFF.value
         )
 
 
@@ -53,8 +48,7 @@ class IsReceptionist(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(
             request.user and
-            hasattr(request.user, 'staff') and
-            request.user.staff.role.title == 'Receptionist'
+            get_salon_access(request.user).role == UserRoleEnums.RECEPTIONIST.value
         )
 
 
@@ -73,38 +67,68 @@ class IsSalonOwner(permissions.BasePermission):
         return super().has_permission(request, view)
 
     def has_object_permission(self, request, view, obj):
+        return bool(
+            request.user and
+            get_salon_access(request.user).owns(obj.salon_id)
+        )
 
-        user = request.user
 
-        receipt_salon = obj.salon
-        receipt_salon_owner = receipt_salon.owner
+class CanSyncSalon(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return bool(
+            request.user and
+            get_salon_access(request.user).owns(obj.id)
+        )
 
+
+class CanManageSalonStaff(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
         return bool(
-            user and
-            receipt_salon_owner == user
+            request.user and
+            get_salon_access(request.user).owns(obj.id)
         )
 
 
-class CanViewSalonSalaryReport(permissions.BasePermission):
+class CanFollowSalon(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        # receipt_salon_owner = obj.receipt.salon.owner
-        print("obj", obj.owner_id)
+        return bool(
+            request.user and
+            obj.id in get_salon_access(request.user).salon_ids
+        )
+
 
-        return (
-            bool(user and
-                 obj.owner_id == user.id)
+class CanSwitchSalonStaff(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return bool(
+            request.user and
+            obj.id in get_salon_access(request.user).salon_ids
         )
 
 
-class CanDeleteStaffReceipt(permissions.BasePermission):
+class CanSetStaffPin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        receipt_salon_owner = obj.receipt.salon.owner
+        access = get_salon_access(request.user)
+        return bool(
+            request.user and
+            (obj.id == access.staff_id or access.owns(obj.salon_id))
+        )
 
+
+class CanViewSalonSalaryReport(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
         return bool(
-            user and
-            receipt_salon_owner == user
+            request.user and
+            get_salon_access(request.user).owns(obj.id)
+        )
+
+
+class CanDeleteStaffReceipt(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        # receipt is select_related by StaffReceiptViewSet's queryset
+        return bool(
+            request.user and
+            obj.receipt is not None and
+            get_salon_access(request.user).owns(obj.receipt.salon_id)
         )
 
 
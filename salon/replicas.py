@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+REPLICA_DB_ALIAS = 'replica'
+RECENT_WRITE_CACHE_KEY = 'recent-write:{user_id}'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('salon_read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class ReplicaRouter:
+    """
+    Writes and reads go to default, except reads inside read_replica(),
+    which go to the replica alias. Only default is migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
+
+
+def record_write(user_id):
+    cache.set(RECENT_WRITE_CACHE_KEY.format(user_id=user_id), True,
+              settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+
+def wrote_recently(user_id):
+    return bool(cache.get(RECENT_WRITE_CACHE_KEY.format(user_id=user_id)))
+
+
+def replica_for(request, salon):
+    """
+    Alias to read the salon's report rows from: the replica, or None for
+    default when there is no replica, the user wrote in the last
+    REPLICA_READ_YOUR_WRITES_SECONDS, or the salon changed in that window.
+    The salon itself is read from default, so report cache keys and ETags
+    always carry its latest version; the window keeps a lagging replica
+    from filling that version with older rows.
+    """
+    if not replica_configured() or wrote_recently(request.user.id):
+        return None
+
+    window = timedelta(seconds=settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+    changed_at = salon.data_changed_at or salon.created_at
+    if timezone.now() - changed_at < window:
+        return None
+    return REPLICA_DB_ALIAS
+
+
+@contextmanager
+def read_replica(request, salon):
+    """Route the reads in the block as replica_for() decides."""
+    token = _read_alias.set(replica_for(request, salon))
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Remember users whose unsafe request succeeded, so their reads stay on
+    default for REPLICA_READ_YOUR_WRITES_SECONDS and they see their writes.
+    """
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # DRF sets request.user on the Django request once it authenticates
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400 and
+                user is not None and user.is_authenticated):
+            record_write(user.id)
+        return response
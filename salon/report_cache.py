@@ -0,0 +1,160 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .access import get_salon_access
+from .models import Salon
+
+REPORT_KEY = 'report:{name}:{salon_id}:{version}:{scope}:{params}'
+STATS_KEY = 'report-stats:{name}:{stat}'
+
+REPORT_NAMES = (
+    'staff-receipts',
+    'staff-receipts-statistics',
+    'staff-service-revenue',
+)
+
+
+class SalonVersionBump:
+    """on_commit callback moving the watermark of a set of salons."""
+
+    def __init__(self, salon_ids):
+        self.salon_ids = set(salon_ids)
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        Salon.objects.filter(id__in=self.salon_ids).update(
+            data_version=F('data_version') + 1,
+            data_changed_at=timezone.now(),
+        )
+
+
+def bump_salon_versions(salon_ids):
+    """
+    Move the salons' change watermark forward once the writer's transaction
+    commits, so cached reports and ETags of older versions stop matching.
+    Every bump in a transaction joins the first one: a receipt with many
+    lines updates each salon row once, and the row isn't locked for the
+    rest of the transaction. A bump from a savepoint that rolls back may
+    still run, which only costs a recompute.
+    """
+    salon_ids = {salon_id for salon_id in salon_ids if salon_id}
+    if not salon_ids:
+        return
+
+    connection = transaction.get_connection()
+    for _, func, _ in connection.run_on_commit:
+        if isinstance(func, SalonVersionBump) and not func.done:
+            func.salon_ids |= salon_ids
+            return
+    transaction.on_commit(SalonVersionBump(salon_ids))
+
+
+def normalize_params(query_params):
+    """Order-independent digest of the query string, empty values dropped."""
+    params = sorted(
+        (key, sorted(value for value in query_params.getlist(key) if value))
+        for key in query_params
+    )
+    params = [(key, values) for key, values in params if values]
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()
+
+
+def report_scope(request, salon):
+    """Owners share one entry, staff only see their own lines."""
+    if get_salon_access(request.user).owns(salon.id):
+        return 'owner'
+    return f'staff-{get_salon_access(request.user).staff_id}'
+
+
+def _incr_stat(name, stat, delta=1):
+    key = STATS_KEY.format(name=name, stat=stat)
+    if not cache.add(key, delta, None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, None)
+
+
+def cached_report(name, request, salon, compute):
+    """
+    Response data of a report, computed by compute() on a miss. Keys carry
+    the salon's version, so a receipt write makes older entries unreachable.
+    """
+    key = REPORT_KEY.format(
+        name=name,
+        salon_id=salon.id,
+        version=salon.data_version,
+        scope=report_scope(request, salon),
+        params=normalize_params(request.GET),
+    )
+
+    data = cache.get(key)
+    if data is not None:
+        _incr_stat(name, 'hits')
+        return data
+
+    started = time.perf_counter()
+    data = compute()
+    elapsed_us = int((time.perf_counter() - started) * 1000000)
+
+    cache.set(key, data, settings.REPORT_CACHE_TTL)
+    _incr_stat(name, 'misses')
+    _incr_stat(name, 'recompute_us', elapsed_us)
+    return data
+
+
+def report_etag(name, request, salon):
+    return '"{}-{}-{}-{}-{}"'.format(
+        name, salon.id, salon.data_version, report_scope(request, salon),
+        normalize_params(request.GET)[:16])
+
+
+def not_modified_response(name, request, salon):
+    """
+    304 response when the client's If-None-Match still matches the salon's
+    watermark, else None. Costs no query beyond the salon itself. Only the
+    ETag is compared: Last-Modified has one second resolution and would
+    hide a second write within the same second.
+    """
+    return get_conditional_response(
+        request, etag=report_etag(name, request, salon))
+
+
+def set_report_validators(response, name, request, salon):
+    response['ETag'] = report_etag(name, request, salon)
+    # let clients keep the body but always revalidate it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def report_cache_stats():
+    """Hit ratio and recompute time of every cached report."""
+    stats = {}
+    for name in REPORT_NAMES:
+        values = cache.get_many([
+            STATS_KEY.format(name=name, stat=stat)
+            for stat in ('hits', 'misses', 'recompute_us')
+        ])
+        hits = values.get(STATS_KEY.format(name=name, stat='hits'), 0)
+        misses = values.get(STATS_KEY.format(name=name, stat='misses'), 0)
+        recompute_us = values.get(
+            STATS_KEY.format(name=name, stat='recompute_us'), 0)
+
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'recompute_seconds_total': recompute_us / 1000000,
+            'recompute_seconds_avg': (
+                round(recompute_us / misses / 1000000, 6) if misses else None),
+        }
+    return stats
@@ -0,0 +1,248 @@
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import StaffDailyRollup, StaffReceipt
+from .report_cache import bump_salon_versions
+
+ROLLUP_TOTAL_FIELDS = [
+    'service_amount',
+    'tip_amount',
+    'discount_price',
+    'turn_count',
+]
+
+
+def business_date(value):
+    """Local business date of a datetime, same as TruncDate('created_at')."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localdate(value)
+
+
+def day_start(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def staff_receipt_rollup_keys(staff_receipts):
+    """Rollup keys touched by StaffReceipt instances with a loaded receipt."""
+    return {
+        (line.receipt.salon_id, line.staff_id, business_date(line.created_at))
+        for line in staff_receipts
+    }
+
+
+def compute_staff_daily_rollups(queryset):
+    """
+    Aggregate StaffReceipt rows into
+    {(salon_id, staff_id, date, payment_status): totals}.
+    """
+    rows = queryset.filter(
+        receipt__salon__isnull=False
+    ).annotate(
+        date=TruncDate('created_at')
+    ).values(
+        'receipt__salon_id',
+        'staff_id',
+        'date',
+        'receipt__payment_status',
+    ).annotate(
+        total_service_amount=Sum('service_amount'),
+        total_tip_amount=Sum('tip_amount'),
+        total_discount_price=Sum('discount_price'),
+        total_turn=Count('id'),
+    ).order_by()
+
+    return {
+        (
+            row['receipt__salon_id'],
+            row['staff_id'],
+            row['date'],
+            row['receipt__payment_status'],
+        ): {
+            'service_amount': row['total_service_amount'],
+            'tip_amount': row['total_tip_amount'],
+            'discount_price': row['total_discount_price'],
+            'turn_count': row['total_turn'],
+        }
+        for row in rows
+    }
+
+
+def _rollup_objects(computed):
+    return [
+        StaffDailyRollup(
+            salon_id=salon_id,
+            staff_id=staff_id,
+            date=date,
+            payment_status=payment_status,
+            **totals
+        )
+        for (salon_id, staff_id, date, payment_status), totals in computed.items()
+    ]
+
+
+ROLLUP_LOCK = 'staff-daily-rollup'
+
+
+def _advisory_xact_locks(names, shared=False):
+    """Transaction-level advisory locks on names, taken in a fixed order."""
+    if connection.vendor != 'postgresql' or not names:
+        return
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {function}(hashtextextended(key, 0)) '
+            f'FROM (SELECT unnest(%s::text[]) AS key ORDER BY 1) AS rollup_keys',
+            [sorted(names)],
+        )
+
+
+def _salon_lock_names(salon_ids):
+    return {f'{ROLLUP_LOCK}:{salon_id}' for salon_id in salon_ids}
+
+
+def lock_rollup_keys(keys):
+    """
+    Hold a transaction-level advisory lock per (salon_id, staff_id, date)
+    key, taken in a fixed order. Two writers refreshing the same key then
+    run one after the other, and the second sums the lines the first
+    committed instead of overwriting its totals from an older snapshot.
+    The keys' salons are share-locked first, so a range rebuild, which
+    locks them exclusively, waits for the writers and they wait for it.
+    """
+    _advisory_xact_locks({ROLLUP_LOCK}, shared=True)
+    _advisory_xact_locks(_salon_lock_names({key[0] for key in keys}), shared=True)
+    _advisory_xact_locks({
+        f'{ROLLUP_LOCK}:{salon_id}:{staff_id}:{date.isoformat()}'
+        for salon_id, staff_id, date in keys
+    })
+
+
+def lock_rollup_range(salon_id=None):
+    """
+    Lock the rollups of one salon, or of every salon, against
+    refresh_staff_daily_rollups() for the rest of the transaction.
+    """
+    if salon_id:
+        _advisory_xact_locks({ROLLUP_LOCK}, shared=True)
+        _advisory_xact_locks(_salon_lock_names({salon_id}))
+    else:
+        _advisory_xact_locks({ROLLUP_LOCK})
+
+
+@transaction.atomic
+def refresh_staff_daily_rollups(keys):
+    """
+    Recompute the rollup rows of the given (salon_id, staff_id, date) keys
+    from StaffReceipt, for every payment status. Every StaffReceipt write
+    path ends here, so it also invalidates the salons' cached reports.
+    """
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+
+    # before the sums are read, so they see every committed line
+    lock_rollup_keys(keys)
+
+    salon_ids = {key[0] for key in keys}
+    bump_salon_versions(salon_ids)
+    staff_ids = {key[1] for key in keys}
+    dates = {key[2] for key in keys}
+
+    source = StaffReceipt.objects.filter(
+        receipt__salon_id__in=salon_ids,
+        staff_id__in=staff_ids,
+        created_at__gte=day_start(min(dates)),
+        created_at__lt=day_start(max(dates) + timedelta(days=1)),
+    )
+    computed = {
+        key: totals
+        for key, totals in compute_staff_daily_rollups(source).items()
+        if key[:3] in keys
+    }
+
+    key_filter = Q()
+    for salon_id, staff_id, date in keys:
+        key_filter |= Q(salon_id=salon_id, staff_id=staff_id, date=date)
+
+    stale_ids = [
+        row['id']
+        for row in StaffDailyRollup.objects.filter(key_filter).values(
+            'id', 'salon_id', 'staff_id', 'date', 'payment_status')
+        if (row['salon_id'], row['staff_id'], row['date'],
+            row['payment_status']) not in computed
+    ]
+    if stale_ids:
+        StaffDailyRollup.objects.filter(id__in=stale_ids).delete()
+
+    if computed:
+        StaffDailyRollup.objects.bulk_create(
+            _rollup_objects(computed),
+            update_conflicts=True,
+            unique_fields=['salon', 'staff', 'date', 'payment_status'],
+            update_fields=ROLLUP_TOTAL_FIELDS + ['updated_at'],
+        )
+
+
+def _range_querysets(date_from, date_to, salon_id=None):
+    source = StaffReceipt.objects.filter(
+        created_at__gte=day_start(date_from),
+        created_at__lt=day_start(date_to + timedelta(days=1)),
+    )
+    rollups = StaffDailyRollup.objects.filter(
+        date__gte=date_from,
+        date__lte=date_to,
+    )
+    if salon_id:
+        source = source.filter(receipt__salon_id=salon_id)
+        rollups = rollups.filter(salon_id=salon_id)
+    return source, rollups
+
+
+@transaction.atomic
+def rebuild_staff_daily_rollups(date_from, date_to, salon_id=None):
+    """
+    Drop and recompute every rollup row in the date range. The salons are
+    locked before the sums are read, so a receipt write committing in
+    between can't have its rollups replaced with older totals.
+    """
+    lock_rollup_range(salon_id)
+
+    source, rollups = _range_querysets(date_from, date_to, salon_id)
+    computed = compute_staff_daily_rollups(source)
+
+    bump_salon_versions(
+        {key[0] for key in computed}
+        | set(rollups.values_list('salon_id', flat=True).distinct()))
+    rollups.delete()
+    StaffDailyRollup.objects.bulk_create(
+        _rollup_objects(computed), batch_size=1000)
+
+    return len(computed)
+
+
+def verify_staff_daily_rollups(date_from, date_to, salon_id=None):
+    """
+    Compare stored rollups with StaffReceipt in the date range.
+    Returns a list of (key, stored, expected) for every mismatch.
+    """
+    source, rollups = _range_querysets(date_from, date_to, salon_id)
+    expected = compute_staff_daily_rollups(source)
+
+    stored = {
+        (row['salon_id'], row['staff_id'], row['date'], row['payment_status']):
+            {field: row[field] for field in ROLLUP_TOTAL_FIELDS}
+        for row in rollups.values(
+            'salon_id', 'staff_id', 'date', 'payment_status',
+            *ROLLUP_TOTAL_FIELDS)
+    }
+
+    mismatches = []
+    for key in sorted(set(stored) | set(expected), key=str):
+        if stored.get(key) != expected.get(key):
+            mismatches.append((key, stored.get(key), expected.get(key)))
+    return mismatches
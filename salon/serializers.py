@@ -3,30 +3,51 @@ from .models import (
     Staff,
     StaffReceipt,
     ReceiptModel,
+    Role,
     Salon,
-    UserDeviceModel
+    UserDeviceModel,
+    SyncTombstone
 )
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
-
-
-class StaffSerializer(serializers.ModelSerializer):
+from django.db import transaction
+from django.db.models import Prefetch
+from .enums import SyncEntityEnums, UserRoleEnums
+from .rollups import business_date, refresh_staff_daily_rollups, staff_receipt_rollup_keys
+from .tips import get_tip_split_settings, resplit_receipt_tips, split_receipt_tips
+from .totals import apply_receipt_totals, refresh_receipt_totals
+from .live import publish_receipt_events
+from .metrics import TimedListSerializer, TimedSerializerMixin
+from .staff_import import import_staff
+
+
+class StaffSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     
     class Meta:
         model = Staff
-        fields = '__all__'
+        exclude = ['pin_hash']
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
     
-class StaffReceiptSerializer(serializers.ModelSerializer):
+class StaffReceiptSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = StaffReceipt
         fields = '__all__'
         depth = 1
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # everything to_representation walks: staff, its user, role and salon
+        return queryset.select_related(
+            'receipt',
+            'staff__user',
+            'staff__role',
+            'staff__salon',
+        )
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data['staff'] = StaffSerializer(instance.staff).data
@@ -34,7 +55,7 @@ class StaffReceiptSerializer(serializers.ModelSerializer):
         return data
 
 
-class ReceiptModelSerializer(serializers.ModelSerializer):
+class ReceiptModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     staff_receipts = StaffReceiptSerializer(
         many=True, required=False)
@@ -44,86 +65,280 @@ class ReceiptModelSerializer(serializers.ModelSerializer):
         fields = '__all__'
         depth = 1
 
-class CreateReceiptModelSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('salon').prefetch_related(
+            Prefetch(
+                'staff_receipts',
+                queryset=StaffReceiptSerializer.setup_eager_loading(
+                    StaffReceipt.objects.all())
+            )
+        )
+
+class CreateStaffReceiptSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    staff = serializers.IntegerField(source='staff_id')
+
+    class Meta:
+        model = StaffReceipt
+        fields = ['staff', 'service_amount', 'service_name', 'tip_amount',
+                  'discount_price', 'discount_percent', 'created_at']
+
+
+def validate_receipt_relations(receipts):
+    """Check the salons and staff referenced by receipts in two queries."""
+    salon_ids = {attrs['salon_id'] for attrs in receipts
+                 if attrs.get('salon_id') is not None}
+    missing_ids = salon_ids - set(Salon.objects.filter(
+        id__in=salon_ids).values_list('id', flat=True))
+    if missing_ids:
+        raise serializers.ValidationError(
+            {"salon": f"Invalid salon ids: {sorted(missing_ids)}"}
+        )
+
+    staff_ids = {line['staff_id'] for attrs in receipts
+                 for line in attrs.get('staff_receipts', [])}
+    missing_ids = staff_ids - set(Staff.objects.filter(
+        id__in=staff_ids).values_list('id', flat=True))
+    if missing_ids:
+        raise serializers.ValidationError(
+            {"staff_receipts": f"Invalid staff ids: {sorted(missing_ids)}"}
+        )
+
+
+def build_staff_receipts(receipt, staff_receipts):
+    defaults = {
+        'service_name': '',
+        'created_at': receipt.created_at,
+    }
+    return [
+        StaffReceipt(receipt=receipt, **{**defaults, **line})
+        for line in staff_receipts
+    ]
+
+
+def apply_staff_receipt_changes(receipt, staff_receipts):
+    """
+    Make the receipt's lines match staff_receipts: lines with an id are
+    updated where they differ, lines without one are added and stored
+    lines left out are deleted. A fixed number of queries whatever the
+    line count, so the signals per line are replaced by one rollup
+    refresh and one batch of tombstones.
+    """
+    stored = {line.id: line for line in StaffReceipt.objects.filter(receipt=receipt)}
+    updated_at = timezone.now()
+
+    new_lines = []
+    changed = []
+    changed_fields = set()
+    rollup_states = set()
+    for attrs in staff_receipts:
+        attrs = dict(attrs)
+        line = stored.pop(attrs.pop('id', None), None)
+        if line is None:
+            new_lines.append(attrs)
+            continue
+
+        fields = [field for field, value in attrs.items()
+                  if getattr(line, field) != value]
+        if not fields:
+            continue
+        rollup_states.add((line.staff_id, line.created_at))
+        for field in fields:
+            setattr(line, field, attrs[field])
+        line.updated_at = updated_at
+        changed.append(line)
+        changed_fields.update(fields)
+
+    # whatever is left in stored was not submitted
+    deleted = list(stored.values())
+    created = StaffReceipt.objects.bulk_create(
+        build_staff_receipts(receipt, new_lines))
+    if changed:
+        StaffReceipt.objects.bulk_update(
+            changed, [*sorted(changed_fields), 'updated_at'])
+    if deleted:
+        # StaffReceipt has no dependents, skip the collector and its signals
+        StaffReceipt.objects.filter(
+            id__in=[line.id for line in deleted])._raw_delete(receipt._state.db)
+        if receipt.salon_id:
+            SyncTombstone.objects.bulk_create([
+                SyncTombstone(
+                    salon_id=receipt.salon_id,
+                    entity=SyncEntityEnums.STAFF_RECEIPT.value,
+                    object_id=line.id,
+                )
+                for line in deleted
+            ])
+
+    rollup_states.update(
+        (line.staff_id, line.created_at) for line in [*created, *changed, *deleted])
+    refresh_staff_daily_rollups({
+        (receipt.salon_id, staff_id, business_date(created_at))
+        for staff_id, created_at in rollup_states
+    })
+
+
+class BulkCreateReceiptListSerializer(TimedListSerializer):
+
+    def validate(self, attrs):
+        validate_receipt_relations(attrs)
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        receipts = []
+        staff_receipts = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            staff_receipts.append(attrs.pop('staff_receipts', []))
+            receipts.append(ReceiptModel(**attrs))
+
+        tip_split_settings = get_tip_split_settings(
+            {receipt.salon_id for receipt in receipts})
+
+        receipt_lines = []
+        for receipt, lines in zip(receipts, staff_receipts):
+            lines = build_staff_receipts(receipt, lines)
+            if receipt.salon_id in tip_split_settings:
+                split_receipt_tips(
+                    receipt, lines, *tip_split_settings[receipt.salon_id])
+            apply_receipt_totals(receipt, lines)
+            receipt_lines.append(lines)
+
+        receipts = ReceiptModel.objects.bulk_create(receipts)
+
+        lines = []
+        for receipt, receipt_lines in zip(receipts, receipt_lines):
+            for line in receipt_lines:
+                line.receipt = receipt
+            lines.extend(receipt_lines)
+        StaffReceipt.objects.bulk_create(lines, batch_size=1000)
+
+        refresh_staff_daily_rollups(staff_receipt_rollup_keys(lines))
+        # bulk_create skips post_save
+        publish_receipt_events('receipt_created', receipts)
+        return receipts
+
+
+class CreateReceiptModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+
+    salon = serializers.IntegerField(
+        source='salon_id', required=False, allow_null=True)
+    staff_receipts = CreateStaffReceiptSerializer(many=True, required=False)
 
     class Meta:
         model = ReceiptModel
         fields = '__all__'
+        # totals are summed from the lines, a receipt with discounts or
+        # adjustments keeps its entered total, see salon.totals
+        read_only_fields = ('house_tip_amount',)
+        list_serializer_class = BulkCreateReceiptListSerializer
+
+    def validate(self, attrs):
+        # bulk creation validates every receipt's relations at once
+        if self.parent is None:
+            validate_receipt_relations([attrs])
+        return attrs
 
-    def add_staff_receipts(self, staff_receipts: list):
+    @transaction.atomic
+    def create(self, validated_data):
+        staff_receipts = validated_data.pop('staff_receipts', [])
+        receipt = ReceiptModel(**validated_data)
+        lines = build_staff_receipts(receipt, staff_receipts)
 
-        receipts = []
-        for staff_receipt in staff_receipts:
-
-            receipt = StaffReceipt()
-            receipt.receipt = self.instance
-            receipt.service_amount = staff_receipt.get('service_amount', 0)
-            receipt.service_name = staff_receipt.get('service_name', '')
-            receipt.staff_id = staff_receipt.get('staff')
-            receipt.tip_amount = staff_receipt.get('tip_amount', 0)
-            receipt.discount_price = staff_receipt.get('discount_price', 0)
-            receipt.discount_percent = staff_receipt.get('discount_percent', 0)
-            receipt.created_at = staff_receipt.get('created_at')
-            receipt.updated_at = staff_receipt.get('updated_at')
-            receipt.save()
-            receipts.append(receipt)
-
-        self.instance.staff_receipts.set(receipts)
+        tip_split_settings = get_tip_split_settings([receipt.salon_id])
+        if receipt.salon_id in tip_split_settings:
+            split_receipt_tips(
+                receipt, lines, *tip_split_settings[receipt.salon_id])
+        apply_receipt_totals(receipt, lines)
 
-        return self.instance
+        receipt.save()
+        for line in lines:
+            line.receipt = receipt
+        lines = StaffReceipt.objects.bulk_create(lines)
+
+        refresh_staff_daily_rollups(staff_receipt_rollup_keys(lines))
+        return receipt
+
+
+class UpdateStaffReceiptSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """A line of update-receipt, without an id it's a new line."""
+    id = serializers.IntegerField(required=False)
+    staff = serializers.IntegerField(source='staff_id', required=False)
+
+    class Meta:
+        model = StaffReceipt
+        fields = ['id', 'staff', 'service_amount', 'service_name', 'tip_amount',
+                  'discount_price', 'discount_percent', 'created_at']
+
+    def validate(self, attrs):
+        if attrs.get('id') is None and attrs.get('staff_id') is None:
+            raise serializers.ValidationError(
+                {"staff": "New lines need a staff"})
+        return attrs
 
 
-class UpdateReceiptModelSerializer(serializers.ModelSerializer):
+class UpdateReceiptModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # the receipt's full list of lines, leave it out to keep them as they are
+    staff_receipts = UpdateStaffReceiptSerializer(
+        many=True, required=False, write_only=True)
 
     class Meta:
         model = ReceiptModel
         fields = '__all__'
+        read_only_fields = ('house_tip_amount',)
 
-    def update_staff_receipts(self, staff_receipts: list):
-        for staff_receipt in staff_receipts:
-            staff_receipt_id = staff_receipt.get('id')
-            if staff_receipt_id:
-                receipt = self.instance
-                service_amount = staff_receipt.get('service_amount', 0)
-                service_name = staff_receipt.get('service_name', '')
-                staff_id = staff_receipt.get('staff')
-                tip_amount = staff_receipt.get('tip_amount', 0)
-                discount_price = staff_receipt.get('discount_price', 0)
-                discount_percent = staff_receipt.get('discount_percent', 0)
-                print("aaa: ",staff_id)
-                # receipt = StaffReceipt.objects.get(id=staff_receipt_id)
-                receipt, created = StaffReceipt.objects.update_or_create(
-                    id=staff_receipt_id,
-                    defaults={
-                        "receipt": receipt,
-                        "service_amount": service_amount,
-                        "service_name": service_name,
-                        "staff_id": staff_id,
-                        "tip_amount": tip_amount,
-                        "discount_price": discount_price,
-                        "discount_percent": discount_percent,
-                    }
-                )
-                
+    def validate(self, attrs):
+        staff_receipts = attrs.get('staff_receipts')
+        if staff_receipts is None:
+            return attrs
+
+        validate_receipt_relations([{
+            'staff_receipts': [line for line in staff_receipts if 'staff_id' in line]
+        }])
+
+        line_ids = [line['id'] for line in staff_receipts if line.get('id') is not None]
+        if len(line_ids) != len(set(line_ids)):
+            raise serializers.ValidationError(
+                {"staff_receipts": "Line ids are repeated"})
+        unknown_ids = set(line_ids) - set(StaffReceipt.objects.filter(
+            receipt=self.instance).values_list('id', flat=True))
+        if unknown_ids:
+            raise serializers.ValidationError(
+                {"staff_receipts": f"Lines {sorted(unknown_ids)} are not on this receipt"})
+        return attrs
 
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        staff_receipts = validated_data.pop('staff_receipts', None)
+        instance = super().update(instance, validated_data)
+        return self.update_staff_receipts(staff_receipts)
+
+    def update_staff_receipts(self, staff_receipts):
+        if staff_receipts is not None:
+            apply_staff_receipt_changes(self.instance, staff_receipts)
+
+        # server-side tip split, when the salon has a rule
+        resplit_receipt_tips(self.instance)
+        refresh_receipt_totals(self.instance)
         return self.instance
 
 
-class SalonSerializer(serializers.ModelSerializer):
+class SalonSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Salon
         fields = '__all__'
         # depth = 1
 
 
-class StaffSalonSerializer(serializers.ModelSerializer):
+class StaffSalonSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Salon
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     staff_detail = serializers.SerializerMethodField()
 
@@ -137,33 +352,33 @@ class UserSerializer(serializers.ModelSerializer):
             return StaffDetailSerializer(obj.staff).data
 
 
-class StaffDetailSerializer(serializers.ModelSerializer):
+class StaffDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     salon = serializers.SerializerMethodField()
 
     class Meta:
         model = Staff
-        fields = '__all__'
+        exclude = ['pin_hash']
 
     def get_salon(self, obj):
         if (hasattr(obj, 'salon')):
             return StaffSalonSerializer(obj.salon).data
 
 
-class SalonStaffSerializer(serializers.ModelSerializer):
+class SalonStaffSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     salon = serializers.SerializerMethodField()
 
     class Meta:
         model = Staff
-        fields = '__all__'
+        exclude = ['pin_hash']
 
     def get_salon(self, obj):
         if (hasattr(obj, 'salon')):
             return StaffSalonSerializer(obj.salon).data
 
 
-class StaffSerializer(serializers.ModelSerializer):
+class StaffSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Staff
         fields = ['id', 'first_name', 'last_name', 'phone', 'email', 'role']
@@ -175,7 +390,7 @@ class StaffSerializer(serializers.ModelSerializer):
         data['salon'] = SalonSerializer(instance.salon).data
         return data
 
-class AddStaffSerializer(serializers.ModelSerializer):
+class AddStaffSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Staff
         fields = ['first_name','phone', 'email', 'salon',]
@@ -190,7 +405,78 @@ class AddStaffSerializer(serializers.ModelSerializer):
         staff.save()
         return staff
 
-class RegisterSerializer(serializers.ModelSerializer):
+class StaffImportListSerializer(TimedListSerializer):
+
+    def validate(self, attrs):
+        """
+        Checks across rows, a query each rather than one per row: phones
+        and emails repeated in the file or already taken, unknown roles.
+        """
+        phones = [row['phone'] for row in attrs]
+        emails = [row['email'] for row in attrs if row.get('email')]
+        taken_phones = set(User.objects.filter(
+            username__in=phones).values_list('username', flat=True))
+        taken_emails = set(Staff.all_objects.filter(
+            email__in=emails).values_list('email', flat=True))
+        role_ids = Role.objects.get_ids()
+
+        errors = []
+        seen_phones = set()
+        seen_emails = set()
+        for row in attrs:
+            row_errors = {}
+            phone = row['phone']
+            email = row.get('email')
+            if phone in taken_phones:
+                row_errors['phone'] = ['A user with this phone already exists.']
+            elif phone in seen_phones:
+                row_errors['phone'] = ['This phone is repeated in the import.']
+            if email in taken_emails:
+                row_errors['email'] = ['Staff with this email already exists.']
+            elif email and email in seen_emails:
+                row_errors['email'] = ['This email is repeated in the import.']
+            if row['role'] not in role_ids:
+                row_errors['role'] = [f'No role titled {row["role"]}.']
+            seen_phones.add(phone)
+            seen_emails.add(email)
+            errors.append(row_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        return import_staff(self.context['salon'], validated_data)
+
+
+class StaffImportSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """One row of a bulk staff import, see SalonViewSet.import_staff."""
+
+    # uniqueness is checked for all rows at once by the list serializer
+    email = serializers.EmailField(required=False, allow_null=True)
+    role = serializers.CharField(default=UserRoleEnums.STAFF.value)
+
+    class Meta:
+        model = Staff
+        fields = ['first_name', 'last_name', 'email', 'phone', 'gender',
+                  'address', 'date_of_birth', 'hire_date', 'commission_rate',
+                  'role']
+        list_serializer_class = StaffImportListSerializer
+        extra_kwargs = {
+            'first_name': {'required': True, 'allow_null': False, 'allow_blank': False},
+            'commission_rate': {'allow_null': False, 'min_value': 0, 'max_value': 1},
+        }
+
+
+class StaffPinSerializer(serializers.Serializer):
+    pin = serializers.RegexField(r'^\d{4,6}$', write_only=True)
+
+
+class StaffSwitchSerializer(StaffPinSerializer):
+    staff = serializers.IntegerField()
+
+
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True, required=True, validators=[validate_password]
     )
@@ -223,7 +509,7 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(required=True, write_only=True)
 
 
-class StaffReceiptStatisticsSerializer(serializers.Serializer):
+class StaffReceiptStatisticsSerializer(TimedSerializerMixin, serializers.Serializer):
     date = serializers.DateField()
     total_service_amount = serializers.DecimalField(
         max_digits=10, decimal_places=2, default=0)
@@ -250,7 +536,33 @@ class StaffLoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 
-class UserDeviceModelSerializer(serializers.ModelSerializer):
+class UserDeviceModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserDeviceModel
         fields = '__all__'
+
+
+# flat rows of the salon changes feed, clients join them by id
+
+class SyncReceiptSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ReceiptModel
+        fields = '__all__'
+
+
+class SyncStaffReceiptSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = StaffReceipt
+        fields = '__all__'
+
+
+class SyncStaffSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Staff
+        exclude = ['is_deleted', 'pin_hash']
+
+
+class SyncTombstoneSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = SyncTombstone
+        fields = ['id', 'entity', 'object_id', 'deleted_at']
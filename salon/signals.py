@@ -0,0 +1,230 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from .access import invalidate_salon_access
+from .enums import SyncEntityEnums
+from .live import publish_receipt_events
+from .models import (
+    ROLE_IDS_CACHE_KEY,
+    ReceiptModel,
+    Role,
+    Salon,
+    Staff,
+    StaffReceipt,
+    SyncTombstone
+)
+from .report_cache import bump_salon_versions
+from .rollups import business_date, refresh_staff_daily_rollups
+from .staff_pins import invalidate_pin_verifiers
+
+
+# Keep StaffDailyRollup in sync with StaffReceipt / ReceiptModel writes.
+# Instances remember the values they were loaded with so that moving a line
+# to another staff, day or receipt also refreshes the bucket it left.
+
+@receiver(post_init, sender=StaffReceipt)
+def remember_staff_receipt_state(sender, instance, **kwargs):
+    instance._rollup_state = (
+        instance.receipt_id,
+        instance.staff_id,
+        instance.created_at,
+    )
+
+
+@receiver(post_init, sender=ReceiptModel)
+def remember_receipt_state(sender, instance, **kwargs):
+    instance._rollup_state = instance.salon_id
+
+
+def _staff_receipt_keys(states):
+    states = [
+        (receipt_id, staff_id, created_at)
+        for receipt_id, staff_id, created_at in states
+        if receipt_id and staff_id and created_at
+    ]
+    if not states:
+        return set()
+
+    salon_ids = dict(ReceiptModel.objects.filter(
+        id__in={state[0] for state in states}
+    ).values_list('id', 'salon_id'))
+
+    return {
+        (salon_ids.get(receipt_id), staff_id, business_date(created_at))
+        for receipt_id, staff_id, created_at in states
+    }
+
+
+def _receipt_keys(receipt, salon_ids):
+    lines = StaffReceipt.objects.filter(
+        receipt_id=receipt.id
+    ).values_list('staff_id', 'created_at')
+    return {
+        (salon_id, staff_id, business_date(created_at))
+        for staff_id, created_at in lines
+        for salon_id in salon_ids
+    }
+
+
+@receiver(post_save, sender=StaffReceipt)
+def refresh_rollups_on_staff_receipt_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = (instance.receipt_id, instance.staff_id, instance.created_at)
+    refresh_staff_daily_rollups(
+        _staff_receipt_keys({instance._rollup_state, current}))
+    instance._rollup_state = current
+
+
+@receiver(post_delete, sender=StaffReceipt)
+def refresh_rollups_on_staff_receipt_delete(sender, instance, **kwargs):
+    refresh_staff_daily_rollups(
+        _staff_receipt_keys({instance._rollup_state}))
+
+
+@receiver(post_save, sender=ReceiptModel)
+def refresh_rollups_on_receipt_save(sender, instance, created=False, raw=False, **kwargs):
+    # a new receipt has no lines yet, they refresh their own buckets
+    if raw or created:
+        instance._rollup_state = instance.salon_id
+        return
+    refresh_staff_daily_rollups(
+        _receipt_keys(instance, {instance._rollup_state, instance.salon_id}))
+    instance._rollup_state = instance.salon_id
+
+
+@receiver(pre_delete, sender=ReceiptModel)
+def collect_rollups_on_receipt_delete(sender, instance, **kwargs):
+    instance._rollup_keys = _receipt_keys(instance, {instance.salon_id})
+
+
+@receiver(post_delete, sender=ReceiptModel)
+def refresh_rollups_on_receipt_delete(sender, instance, **kwargs):
+    refresh_staff_daily_rollups(getattr(instance, '_rollup_keys', set()))
+
+
+# Drop cached SalonAccess when salon ownership, staff membership or the
+# user's is_active changes.
+
+@receiver(post_init, sender=Salon)
+def remember_salon_owner(sender, instance, **kwargs):
+    instance._access_owner_id = instance.owner_id
+
+
+@receiver(post_save, sender=Salon)
+@receiver(post_delete, sender=Salon)
+def invalidate_access_on_salon_change(sender, instance, **kwargs):
+    invalidate_salon_access(instance._access_owner_id, instance.owner_id)
+    instance._access_owner_id = instance.owner_id
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_access_on_staff_change(sender, instance, **kwargs):
+    invalidate_salon_access(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_access_on_user_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_salon_access(instance.id)
+
+
+@receiver(post_init, sender=Staff)
+def remember_staff_salon(sender, instance, **kwargs):
+    instance._pin_salon_id = instance.salon_id
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_pins_on_staff_change(sender, instance, **kwargs):
+    invalidate_pin_verifiers(instance._pin_salon_id, instance.salon_id)
+    instance._pin_salon_id = instance.salon_id
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role_ids(sender, instance, **kwargs):
+    cache.delete(ROLE_IDS_CACHE_KEY)
+
+
+# Receipt and staff fields that don't reach the rollups still show up in
+# cached reports, line writes bump through refresh_staff_daily_rollups.
+
+@receiver(post_save, sender=ReceiptModel)
+@receiver(post_delete, sender=ReceiptModel)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_reports_on_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_salon_versions({instance.salon_id})
+
+
+# Tombstones for the salon changes feed. Soft-deleted staff count as
+# deleted, restoring them bumps updated_at and sends them again.
+
+@receiver(post_delete, sender=ReceiptModel)
+def tombstone_receipt(sender, instance, **kwargs):
+    if instance.salon_id:
+        SyncTombstone.objects.create(
+            salon_id=instance.salon_id,
+            entity=SyncEntityEnums.RECEIPT.value,
+            object_id=instance.id,
+        )
+
+
+@receiver(pre_delete, sender=StaffReceipt)
+def collect_staff_receipt_salon(sender, instance, **kwargs):
+    # on cascade the receipt row may be deleted before its lines
+    instance._sync_salon_id = ReceiptModel.objects.filter(
+        id=instance.receipt_id).values_list('salon_id', flat=True).first()
+
+
+@receiver(post_delete, sender=StaffReceipt)
+def tombstone_staff_receipt(sender, instance, **kwargs):
+    salon_id = getattr(instance, '_sync_salon_id', None)
+    if salon_id:
+        SyncTombstone.objects.create(
+            salon_id=salon_id,
+            entity=SyncEntityEnums.STAFF_RECEIPT.value,
+            object_id=instance.id,
+        )
+
+
+@receiver(post_init, sender=Staff)
+def remember_staff_deleted(sender, instance, **kwargs):
+    instance._sync_deleted = instance.is_deleted
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def tombstone_staff(sender, instance, raw=False, **kwargs):
+    deleted = kwargs['signal'] is post_delete or (
+        instance.is_deleted and not instance._sync_deleted)
+    instance._sync_deleted = instance.is_deleted
+    if deleted and instance.salon_id and not raw:
+        SyncTombstone.objects.create(
+            salon_id=instance.salon_id,
+            entity=SyncEntityEnums.STAFF.value,
+            object_id=instance.id,
+        )
+
+
+# Live receipt events, published once the write commits.
+
+@receiver(post_save, sender=ReceiptModel)
+def publish_receipt_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        publish_receipt_events(
+            'receipt_created' if created else 'receipt_updated', [instance])
+
+
+@receiver(post_delete, sender=ReceiptModel)
+def publish_receipt_deleted(sender, instance, **kwargs):
+    # the lines are gone by now, collect_rollups_on_receipt_delete kept them
+    staff_ids = {key[1] for key in getattr(instance, '_rollup_keys', ())}
+    publish_receipt_events(
+        'receipt_deleted', [instance], {instance.id: staff_ids})
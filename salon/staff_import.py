@@ -0,0 +1,63 @@
+import csv
+import io
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .access import invalidate_salon_access
+from .hashing import make_passwords
+from .models import Role, Staff
+from .report_cache import bump_salon_versions
+from .staff_pins import invalidate_pin_verifiers
+
+
+def read_staff_csv(file):
+    """
+    Rows of an uploaded staff CSV as dicts keyed by the header, blank cells
+    left out so they fall back to the serializer defaults.
+    """
+    text = io.StringIO(file.read().decode('utf-8-sig'), newline='')
+    return [
+        {key.strip(): value.strip() for key, value in row.items()
+         if key and value and value.strip()}
+        for row in csv.DictReader(text)
+    ]
+
+
+def import_staff(salon, rows):
+    """
+    Create a user and a staff row for every validated row, with the phone
+    as the first password like Staff.save(). Passwords are hashed up front
+    in worker processes, outside the transaction, then users and staff go
+    in with one bulk insert each. bulk_create skips the Staff and User
+    signals, so the caches they clear are cleared here. Returns the new
+    staff.
+    """
+    passwords = make_passwords(row['phone'] for row in rows)
+    role_ids = Role.objects.get_ids()
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=row['phone'],
+                email=row.get('email') or '',
+                first_name=row['first_name'],
+                last_name=row.get('last_name') or '',
+                password=password,
+            )
+            for row, password in zip(rows, passwords)
+        ])
+        staff = Staff.objects.bulk_create([
+            Staff(
+                salon=salon,
+                user=user,
+                role_id=role_ids[row['role']],
+                **{field: value for field, value in row.items() if field != 'role'},
+            )
+            for row, user in zip(rows, users)
+        ])
+
+    bump_salon_versions([salon.id])
+    invalidate_salon_access(*(user.id for user in users))
+    invalidate_pin_verifiers(salon.id)
+    return staff
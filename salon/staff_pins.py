@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .access import SalonAccess
+from .models import Staff
+
+PIN_VERIFIERS_CACHE_KEY = 'staff-pins:{salon_id}'
+PIN_FAILURES_CACHE_KEY = 'staff-pin-failures:{scope}'
+
+
+class PinLocked(Exception):
+    pass
+
+
+def make_pin_hash(staff_id, pin):
+    """
+    Keyed digest of a staff PIN. A 4-6 digit PIN falls to brute force
+    under any hash, so it is guarded by the server-side key and the
+    failure limits instead of a slow hasher, and checks stay fast.
+    """
+    return salted_hmac('salon.staff_pins', f'{staff_id}:{pin}',
+                       algorithm='sha256').hexdigest()
+
+
+def get_pin_verifiers(salon_id):
+    """{staff_id: (user_id, role, pin_hash)} of the salon's staff with a PIN."""
+    key = PIN_VERIFIERS_CACHE_KEY.format(salon_id=salon_id)
+    verifiers = cache.get(key)
+    if verifiers is None:
+        rows = Staff.objects.filter(
+            salon_id=salon_id, is_active=True, user__isnull=False,
+        ).exclude(pin_hash='').values_list('id', 'user_id', 'role__title', 'pin_hash')
+        verifiers = {staff_id: verifier for staff_id, *verifier in rows}
+        cache.set(key, verifiers, settings.STAFF_PIN_CACHE_TTL)
+    return verifiers
+
+
+def invalidate_pin_verifiers(*salon_ids):
+    cache.delete_many([
+        PIN_VERIFIERS_CACHE_KEY.format(salon_id=salon_id)
+        for salon_id in set(salon_ids) if salon_id
+    ])
+
+
+def check_pin(salon_id, staff_id, pin, device_id):
+    """
+    SalonAccess of the staff member when the PIN matches, else None.
+    Failures are counted per device (the user signed in on it) and per
+    staff member on that device, so one device guessing can't lock the
+    others out. Past either limit PinLocked is raised until
+    STAFF_PIN_LOCKOUT seconds pass.
+    """
+    staff_key = PIN_FAILURES_CACHE_KEY.format(scope=f'{device_id}:{salon_id}:{staff_id}')
+    device_key = PIN_FAILURES_CACHE_KEY.format(scope=device_id)
+    failures = cache.get_many([staff_key, device_key])
+    if (failures.get(staff_key, 0) >= settings.STAFF_PIN_MAX_FAILURES or
+            failures.get(device_key, 0) >= settings.STAFF_PIN_DEVICE_MAX_FAILURES):
+        raise PinLocked('Too many wrong PINs, try again later')
+
+    verifier = get_pin_verifiers(salon_id).get(staff_id)
+    if verifier is not None:
+        user_id, role, pin_hash = verifier
+        if constant_time_compare(make_pin_hash(staff_id, pin), pin_hash):
+            cache.delete(staff_key)
+            return SalonAccess(user_id=user_id, staff_id=staff_id,
+                               staff_salon_id=salon_id, role=role)
+
+    for key in (staff_key, device_key):
+        # add() starts the window, incr() keeps its expiry
+        cache.add(key, 0, settings.STAFF_PIN_LOCKOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,74 @@
+from datetime import datetime
+from decimal import Decimal
+from itertools import count
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from salon.authentication import SalonRefreshToken
+from salon.enums import UserRoleEnums
+from salon.models import ReceiptModel, Role, Salon, Staff, StaffReceipt
+
+_numbers = count(1)
+
+
+def local_datetime(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+def api_client(user):
+    """APIClient sending a salon access token of the user."""
+    client = APIClient()
+    token = SalonRefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def make_salon(**fields):
+    fields.setdefault('name', 'Salon')
+    fields.setdefault('email', 'salon@example.com')
+    return Salon.objects.create(**fields)
+
+
+def make_staff(salon, **fields):
+    number = next(_numbers)
+    fields.setdefault('first_name', f'Staff {number}')
+    fields.setdefault('phone', f'555{number:07d}')
+    fields.setdefault('email', f'staff{number}@example.com')
+    return Staff.objects.create(salon=salon, **fields)
+
+
+def make_receipt(salon, lines=(), **fields):
+    """A receipt with one StaffReceipt per (staff, service, tip) line."""
+    receipt = ReceiptModel.objects.create(salon=salon, **fields)
+    for staff, service_amount, tip_amount in lines:
+        StaffReceipt.objects.create(
+            receipt=receipt,
+            staff=staff,
+            service_amount=Decimal(service_amount),
+            tip_amount=Decimal(tip_amount),
+            created_at=receipt.created_at,
+        )
+    return receipt
+
+
+class SalonTestMixin:
+
+    def setUp(self):
+        cache.clear()
+        for role in UserRoleEnums:
+            Role.objects.create(title=role.value)
+        self.addCleanup(cache.clear)
+
+
+# Staff.save() hashes the phone as the first password, keep that cheap
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SalonTestCase(SalonTestMixin, TestCase):
+    pass
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SalonTransactionTestCase(SalonTestMixin, TransactionTestCase):
+    """For tests whose writes have to commit."""
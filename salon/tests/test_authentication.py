@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.test import APIClient, APIRequestFactory
+
+from salon.authentication import SalonJWTAuthentication, SalonRefreshToken
+
+from .base import SalonTestCase, api_client, make_salon, make_staff
+
+
+class SalonJWTAuthenticationTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.url = reverse('salon-staff-receipts', args=[self.salon.id])
+
+    def test_no_user_query(self):
+        client = api_client(self.owner)
+        client.get(self.url)
+
+        # salon and report queries only, the access comes from the cache
+        with self.assertNumQueries(3):
+            response = client.get(self.url, {'page_size': 10})
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivated_user_rejected(self):
+        client = api_client(self.owner)
+        self.assertEqual(client.get(self.url).status_code, 200)
+
+        self.owner.is_active = False
+        self.owner.save()
+
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+    def test_deleted_user_rejected(self):
+        client = api_client(self.owner)
+        self.salon.owner = None
+        self.salon.save()
+        self.owner.delete()
+
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+    def test_ownership_change_applies_before_token_expiry(self):
+        client = api_client(self.owner)
+        self.assertEqual(client.get(self.url).status_code, 200)
+
+        self.salon.owner = User.objects.create(username='buyer')
+        self.salon.save()
+
+        response = client.get(self.url)
+        self.assertEqual(response.data['data'], [])
+        self.assertEqual(response.data['total_turn'], 0)
+
+    def test_staff_deletion_applies_before_token_expiry(self):
+        staff = make_staff(self.salon)
+        client = api_client(staff.user)
+        url = reverse('salon-switch-staff', args=[self.salon.id])
+        # a member of the salon, turned away for the missing PIN only
+        self.assertIn('pin', client.post(url).data['message'])
+
+        staff.hard_delete()
+
+        self.assertIn('permission', client.post(url).data['message'])
+
+    def test_refresh_rejects_inactive_user(self):
+        refresh = SalonRefreshToken.for_user(self.owner)
+        self.owner.is_active = False
+        self.owner.save()
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def authenticate(self, user):
+        token = SalonRefreshToken.for_user(user).access_token
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        request.user, _ = SalonJWTAuthentication().authenticate(request)
+        return request
+
+    def test_admin_flags_come_from_the_user(self):
+        admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+
+        request = self.authenticate(admin)
+        self.assertTrue(IsAdminUser().has_permission(request, None))
+        self.assertEqual(request.user.username, 'admin')
+        self.assertTrue(request.user.has_perm('salon.delete_salon'))
+
+        request = self.authenticate(self.owner)
+        self.assertFalse(IsAdminUser().has_permission(request, None))
+        self.assertFalse(request.user.has_perm('salon.delete_salon'))
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from salon.benchmarks import isolated_backends
+from salon.live import InProcessLiveBroker, get_live_broker
+
+from .base import SalonTestCase
+
+
+# a cache of its own, standing in for the shared Redis
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'shared',
+}})
+class IsolatedBackendsTests(SalonTestCase):
+
+    def test_clearing_leaves_the_configured_cache_alone(self):
+        cache.set('session', 'kept')
+
+        with isolated_backends():
+            cache.set('report', 'cached')
+            cache.clear()
+            self.assertIsNone(cache.get('session'))
+
+        self.assertEqual(cache.get('session'), 'kept')
+        self.assertIsNone(cache.get('report'))
+
+    @override_settings(LIVE_BROKER='salon.tests.test_live.SharedInProcessLiveBroker')
+    def test_events_go_to_an_in_process_broker(self):
+        with isolated_backends():
+            self.assertIs(type(get_live_broker()), InProcessLiveBroker)
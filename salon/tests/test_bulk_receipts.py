@@ -0,0 +1,85 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from salon.models import NotificationOutbox, ReceiptModel, StaffReceipt
+
+from .base import SalonTestCase, api_client, make_salon, make_staff
+
+
+class BulkCreateReceiptsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.staff = [make_staff(self.salon) for _ in range(2)]
+        self.client = api_client(self.owner)
+        self.url = reverse('receiptmodel-bulk-create')
+
+    def receipts(self, count):
+        return [
+            {
+                'salon': self.salon.id,
+                'payment_status': 'PAID',
+                'staff_receipts': [
+                    {'staff': staff.id, 'service_amount': '30.00', 'tip_amount': '4.00'}
+                    for staff in self.staff
+                ],
+            }
+            for _ in range(count)
+        ]
+
+    def test_receipts_lines_and_notifications_created(self):
+        response = self.client.post(self.url, {'receipts': self.receipts(3)}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        receipt_ids = response.data['data']
+        self.assertEqual(sorted(receipt_ids),
+                         sorted(ReceiptModel.objects.values_list('id', flat=True)))
+        self.assertEqual(StaffReceipt.objects.filter(receipt_id__in=receipt_ids).count(), 6)
+        self.assertEqual(
+            ReceiptModel.objects.get(id=receipt_ids[0]).total_amount, Decimal('68.00'))
+
+        notifications = NotificationOutbox.objects.order_by('receipt_id')
+        self.assertEqual([item.receipt_id for item in notifications], sorted(receipt_ids))
+        self.assertEqual({item.event for item in notifications}, {'receipt_created'})
+        self.assertEqual(set(notifications[0].user_ids),
+                         {self.owner.id, *(staff.user_id for staff in self.staff)})
+
+    def test_invalid_item_rejects_every_receipt(self):
+        receipts = self.receipts(3)
+        receipts[2]['staff_receipts'][0]['staff'] = 0
+
+        response = self.client.post(self.url, receipts, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid staff ids: [0]', str(response.data['message']))
+        self.assertFalse(ReceiptModel.objects.exists())
+
+    def test_failure_while_writing_rolls_back_everything(self):
+        with mock.patch('salon.views.enqueue_receipt_notifications',
+                        side_effect=RuntimeError('outbox down')):
+            response = self.client.post(self.url, self.receipts(3), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReceiptModel.objects.exists())
+        self.assertFalse(StaffReceipt.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_query_count_does_not_grow_with_the_receipts(self):
+        # load the token user's access into the cache first
+        self.client.post(self.url, self.receipts(1), format='json')
+
+        counts = []
+        for count in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, self.receipts(count), format='json')
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
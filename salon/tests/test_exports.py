@@ -0,0 +1,71 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from salon.exports import STAFF_RECEIPT_CSV_HEADER, staff_receipt_csv_rows
+from salon.models import StaffReceipt
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+
+class ExportStaffReceiptsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.anna = make_staff(self.salon, first_name='Anna', last_name='Nguyen')
+        self.bob = make_staff(self.salon, first_name='Bob', last_name='')
+        self.receipt = make_receipt(
+            self.salon, [(self.anna, '30.00', '4.00'), (self.bob, '20.00', '2.00')],
+            created_at=local_datetime(2025, 3, 10), payment_status='PAID')
+        make_receipt(self.salon, [(self.anna, '15.50', '1.50')],
+                     created_at=local_datetime(2025, 3, 11), payment_status='PAID')
+        # unpaid work is not exported
+        make_receipt(self.salon, [(self.bob, '99.00', '9.00')],
+                     created_at=local_datetime(2025, 3, 11), payment_status='PENDING')
+
+    def read_rows(self, lines):
+        return list(csv.reader(io.StringIO(''.join(lines))))
+
+    def totals(self, row):
+        return (row[0], row[1], row[2], Decimal(row[5]), Decimal(row[6]))
+
+    def test_streamed_csv(self):
+        url = reverse('salon-staff-receipts-export', args=[self.salon.id])
+        response = api_client(self.owner).get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'salon-{self.salon.id}-staff-receipts.csv',
+                      response['Content-Disposition'])
+
+        rows = self.read_rows(line.decode() for line in response.streaming_content)
+        self.assertEqual(rows[0], STAFF_RECEIPT_CSV_HEADER)
+        self.assertEqual([row[0] for row in rows[1:3]], [str(self.anna.id)] * 2)
+        self.assertEqual(
+            [self.totals(row) for row in rows[3:]],
+            [(str(self.anna.id), 'Anna Nguyen', 'SUBTOTAL', Decimal('45.50'), Decimal('5.50')),
+             (str(self.bob.id), 'Bob', str(self.receipt.id), Decimal('20.00'),
+              Decimal('2.00')),
+             (str(self.bob.id), 'Bob', 'SUBTOTAL', Decimal('20.00'), Decimal('2.00')),
+             ('', '', 'TOTAL', Decimal('65.50'), Decimal('7.50'))])
+
+    def test_staff_member_exports_their_own_rows(self):
+        url = reverse('salon-staff-receipts-export', args=[self.salon.id])
+        response = api_client(self.bob.user).get(url)
+
+        self.assertEqual(response.status_code, 200)
+        rows = self.read_rows(line.decode() for line in response.streaming_content)
+        self.assertEqual({row[0] for row in rows[1:-1]}, {str(self.bob.id)})
+        self.assertEqual(self.totals(rows[-1])[3:], (Decimal('20.00'), Decimal('2.00')))
+
+    def test_empty_export_is_the_header_only(self):
+        rows = self.read_rows(staff_receipt_csv_rows(StaffReceipt.objects.none()))
+
+        self.assertEqual(rows, [STAFF_RECEIPT_CSV_HEADER])
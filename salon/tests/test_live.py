@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, override_settings
+
+from salon import live
+from salon.authentication import SalonRefreshToken
+from salon.live import InProcessLiveBroker, LiveBroker
+
+from .base import SalonTestCase, api_client, make_salon
+
+
+class SharedInProcessLiveBroker(InProcessLiveBroker):
+    # stands in for Redis, the test runs in a single process
+    shared = True
+
+
+class LiveBrokerTests(SalonTestCase):
+
+    def test_broker_must_implement_every_method(self):
+        class PublishOnlyBroker(LiveBroker):
+            def publish(self, salon_id, event):
+                return '1'
+
+        with self.assertRaises(TypeError):
+            PublishOnlyBroker()
+
+
+class LiveStreamTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.url = f'/api/salons/{self.salon.id}/live/'
+        token = SalonRefreshToken.for_user(self.owner).access_token
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+        live._broker = None
+        self.addCleanup(setattr, live, '_broker', None)
+
+    @override_settings(LIVE_BROKER='salon.tests.test_live.SharedInProcessLiveBroker')
+    def test_refused_under_wsgi(self):
+        response = api_client(self.owner).get(self.url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('ASGI', response.data['message'])
+
+    @override_settings(LIVE_BROKER='salon.live.InProcessLiveBroker')
+    async def test_refused_without_a_shared_broker(self):
+        response = await AsyncClient().get(self.url, headers=self.headers)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('REDIS_URL', response.json()['message'])
+
+    @override_settings(LIVE_BROKER='salon.tests.test_live.SharedInProcessLiveBroker')
+    async def test_streams_under_asgi_with_a_shared_broker(self):
+        # it would close the connection holding the test's transaction
+        with mock.patch('salon.views.close_old_connections'):
+            response = await AsyncClient().get(self.url, headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertIn(b'event: ready', await anext(chunks))
+        await chunks.aclose()
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.serializers import BaseSerializer
+
+from salon.metrics import RequestTimer, TimedListSerializer, current_timer
+from salon.models import StaffReceipt
+from salon.serializers import (
+    BulkCreateReceiptListSerializer,
+    CreateReceiptModelSerializer,
+    StaffReceiptSerializer
+)
+
+from .base import SalonTestCase, api_client, make_receipt, make_salon, make_staff
+
+DRF_SERIALIZER_DATA = BaseSerializer.data
+
+
+class SerializerTimingTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        staff = make_staff(self.salon)
+        make_receipt(self.salon, lines=[(staff, '40', '5'), (staff, '20', '0')])
+
+    def test_many_gets_a_timed_list_unless_meta_sets_one(self):
+        self.assertIsInstance(StaffReceiptSerializer([], many=True), TimedListSerializer)
+        self.assertIsInstance(
+            CreateReceiptModelSerializer(data=[], many=True), BulkCreateReceiptListSerializer)
+
+    def test_nested_serializers_count_once(self):
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            StaffReceiptSerializer(StaffReceipt.objects.all(), many=True).data
+        finally:
+            current_timer.reset(token)
+
+        self.assertGreater(timer.serialize_seconds, 0)
+        self.assertFalse(timer.serializing)
+
+    def test_requests_leave_drf_unpatched(self):
+        response = api_client(self.owner).get('/api/staff-receipt/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIs(BaseSerializer.data, DRF_SERIALIZER_DATA)
+
+
+class MetricsEndpointTests(SalonTestCase):
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_refused_without_a_token_configured(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_requires_the_token(self):
+        local = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        wrong = self.client.get(
+            '/metrics', headers={'Authorization': 'Bearer wrong'})
+        scrape = self.client.get(
+            '/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+
+        self.assertEqual((local.status_code, wrong.status_code), (403, 403))
+        self.assertEqual(scrape.status_code, 200)
+        self.assertIn(b'salon_http_request_duration_seconds', scrape.content)
@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+import httpx
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from services.fake_onesignal import FakeOneSignalServer
+from services.onesignal_service import OneSignalSendError, OneSignalService
+from salon.enums import NotificationStatusEnums
+from salon.models import NotificationOutbox, UserDeviceModel
+from salon.notifications import CLAIM_LEASE, retry_delay, send_pending_notifications
+
+from .base import SalonTestCase
+
+
+class OneSignalServiceTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOneSignalServer(fail_every=2).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.service = OneSignalService(
+            api_root=self.server.api_root, chunk_size=2, concurrency=1, max_retries=0)
+        self.player_ids = [f'player-{index}' for index in range(5)]
+
+    def test_results_per_chunk(self):
+        result = self.service.send_notification_by_ids(self.player_ids)
+
+        self.assertEqual([chunk['player_ids'] for chunk in result['chunks']],
+                         [['player-0', 'player-1'], ['player-2', 'player-3'], ['player-4']])
+        self.assertEqual([chunk['error'] is None for chunk in result['chunks']],
+                         [True, False, True])
+        self.assertEqual(len(result['responses']), 2)
+        self.assertEqual(result['failed_player_ids'], ['player-2', 'player-3'])
+        self.assertEqual(result['metrics']['failed_chunks'], 1)
+
+    def test_raise_errors_carries_failed_players(self):
+        with self.assertRaises(OneSignalSendError) as raised:
+            self.service.send_notification_by_ids(self.player_ids, raise_errors=True)
+
+        self.assertEqual(raised.exception.failed_player_ids, ['player-2', 'player-3'])
+        self.assertIn('503', str(raised.exception))
+
+    def test_caller_data_is_sent(self):
+        self.service.send_notification_by_ids(self.player_ids[:1], data={'receipt_id': 7})
+        self.service.send_notification_by_ids(self.player_ids[:1])
+
+        self.assertEqual([body['data'] for body in self.server.bodies],
+                         [{'receipt_id': 7}, {'type': 'receipt'}])
+
+    def test_retry_after_a_lost_response_does_not_push_twice(self):
+        server = FakeOneSignalServer().start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = httpx.Client()
+        self.addCleanup(client.close)
+        real_post = client.post
+        calls = []
+
+        def post(*args, **kwargs):
+            # the server takes the first request but its response is lost
+            response = real_post(*args, **kwargs)
+            calls.append(response)
+            if len(calls) == 1:
+                raise httpx.ReadTimeout('response lost')
+            return response
+
+        client.post = post
+        service = OneSignalService(api_root=server.api_root, client=client,
+                                   chunk_size=2, max_retries=1)
+
+        result = service.send_notification_by_ids(self.player_ids[:2])
+
+        self.assertEqual(result['failed_player_ids'], [])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len({body['external_id'] for body in server.bodies}), 1)
+        self.assertEqual(server.players, 2)
+
+
+class SendNotificationsTests(SalonTestCase):
+    """The outbox worker against a local stand-in for the OneSignal API."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOneSignalServer().start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # the worker's own backoff is under test, not the client's retries
+        self.service = OneSignalService(api_root=self.server.api_root, max_retries=0)
+
+        user = User.objects.create(username='owner')
+        UserDeviceModel.objects.create(user=user, device_id='player-1')
+        self.item = NotificationOutbox.objects.create(
+            event='receipt_created', heading='New receipt', user_ids=[user.id])
+
+    def send(self, max_attempts=3):
+        return send_pending_notifications(max_attempts=max_attempts, service=self.service)
+
+    def make_due(self):
+        NotificationOutbox.objects.filter(id=self.item.id).update(
+            next_attempt_at=timezone.now())
+
+    def test_sent(self):
+        self.assertEqual(self.send(), (1, 0, 0))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, NotificationStatusEnums.SENT.value)
+        self.assertEqual(self.item.attempts, 1)
+        self.assertIsNotNone(self.item.sent_at)
+        self.assertEqual(self.server.players, 1)
+        self.assertEqual(self.send(), (0, 0, 0))
+        self.assertEqual(self.server.requests, 1)
+
+    def test_retry_with_backoff_until_failed(self):
+        self.server.fail_every = 1
+
+        for attempt in (1, 2):
+            before = timezone.now()
+            self.assertEqual(self.send(), (0, 1, 0))
+
+            self.item.refresh_from_db()
+            self.assertEqual(self.item.status, NotificationStatusEnums.PENDING.value)
+            self.assertEqual(self.item.attempts, attempt)
+            self.assertIn('503', self.item.last_error)
+            self.assertGreaterEqual(self.item.next_attempt_at, before + retry_delay(attempt))
+            # not due before its backoff runs out
+            self.assertEqual(self.send(), (0, 0, 0))
+            self.make_due()
+
+        self.assertEqual(self.send(), (0, 0, 1))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, NotificationStatusEnums.FAILED.value)
+        self.assertEqual(self.item.attempts, 3)
+        self.assertEqual(self.server.requests, 3)
+        self.make_due()
+        self.assertEqual(self.send(), (0, 0, 0))
+
+    def test_claimed_row_waits_for_its_lease(self):
+        NotificationOutbox.objects.filter(id=self.item.id).update(
+            status=NotificationStatusEnums.SENDING.value,
+            attempts=1,
+            next_attempt_at=timezone.now() + CLAIM_LEASE,
+        )
+        self.assertEqual(self.send(), (0, 0, 0))
+
+        # the worker that claimed it died, the next one sends it
+        self.make_due()
+        self.assertEqual(self.send(), (1, 0, 0))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.attempts, 2)
+
+    def test_expired_lease_out_of_attempts_fails(self):
+        NotificationOutbox.objects.filter(id=self.item.id).update(
+            status=NotificationStatusEnums.SENDING.value, attempts=3)
+
+        self.assertEqual(self.send(), (0, 0, 0))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, NotificationStatusEnums.FAILED.value)
+        self.assertEqual(self.server.requests, 0)
+
+    def test_retry_only_failed_chunks(self):
+        user = User.objects.create(username='staff')
+        for index in range(2, 5):
+            UserDeviceModel.objects.create(user=user, device_id=f'player-{index}')
+        self.item.user_ids.append(user.id)
+        self.item.save()
+        self.server.fail_every = 2
+        self.service.chunk_size = 1
+        self.service.concurrency = 1
+
+        self.assertEqual(self.send(), (0, 1, 0))
+        self.item.refresh_from_db()
+        self.assertEqual(len(self.item.player_ids), 2)
+        self.assertEqual(self.server.requests, 4)
+
+        self.server.fail_every = 0
+        self.make_due()
+        self.assertEqual(self.send(), (1, 0, 0))
+        self.assertEqual(self.server.requests, 6)
+        self.assertEqual(self.server.players, 6)
@@ -0,0 +1,136 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from salon.models import StaffReceipt
+from salon.pagination import KeysetPagination
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+
+class ReceiptListPaginationTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        salon = make_salon(owner=owner)
+        staff = make_staff(salon)
+        self.receipts = [
+            make_receipt(salon, [(staff, '30.00', '4.00')],
+                         created_at=local_datetime(2025, 3, day))
+            for day in range(1, 6)
+        ]
+        self.client = api_client(owner)
+        self.url = reverse('receiptmodel-list')
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([receipt['id'] for receipt in response.data],
+                         [receipt.id for receipt in reversed(self.receipts)])
+
+    def test_page_size_opts_in(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual([receipt['id'] for receipt in response.data['results']],
+                         [self.receipts[4].id, self.receipts[3].id])
+
+        ids = [receipt['id'] for receipt in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [receipt['id'] for receipt in response.data['results']]
+        self.assertEqual(ids, [receipt.id for receipt in reversed(self.receipts)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'nope'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class MandatoryPaginationTests(SalonTestCase):
+    """The salon lists and /api/staff-receipt/ always page by (created_at, id)."""
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=owner)
+        staff = make_staff(self.salon)
+        self.receipts = [
+            make_receipt(self.salon, [(staff, '30.00', '4.00')],
+                         created_at=local_datetime(2025, 3, day), payment_status='PAID')
+            for day in range(1, 4)
+        ]
+        # rows tied on created_at, told apart by id
+        self.receipts += [
+            make_receipt(self.salon, [(staff, '30.00', '4.00')],
+                         created_at=local_datetime(2025, 3, 4), payment_status='PAID')
+            for _ in range(4)
+        ]
+        self.client = api_client(owner)
+
+    def expected_ids(self, rows):
+        return [row.id for row in sorted(
+            rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+    def walk(self, url):
+        pages = [self.client.get(url, {'page_size': 2})]
+        while pages[-1].data['next']:
+            pages.append(self.client.get(pages[-1].data['next']))
+        for page in pages:
+            self.assertEqual(page.status_code, 200, page.data)
+        return pages
+
+    def page_ids(self, pages):
+        return [row['id'] for page in pages for row in page.data['data']]
+
+    def assertTotalsOnFirstPageOnly(self, pages):
+        self.assertEqual(pages[0].data['total_turn'], 7)
+        self.assertEqual(pages[0].data['total_amount'], Decimal('210.00'))
+        for page in pages[1:]:
+            self.assertNotIn('total_turn', page.data)
+
+    def test_salon_receipts(self):
+        pages = self.walk(reverse('salon-receipts', args=[self.salon.id]))
+
+        self.assertEqual([len(page.data['data']) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(self.page_ids(pages), self.expected_ids(self.receipts))
+
+    def test_salon_staff_receipts(self):
+        pages = self.walk(reverse('salon-staff-receipts', args=[self.salon.id]))
+
+        lines = StaffReceipt.objects.all()
+        self.assertEqual(self.page_ids(pages), self.expected_ids(lines))
+        self.assertTotalsOnFirstPageOnly(pages)
+
+    def test_staff_receipt_list(self):
+        pages = self.walk(reverse('staffreceipt-list'))
+
+        lines = StaffReceipt.objects.all()
+        self.assertEqual(self.page_ids(pages), self.expected_ids(lines))
+        self.assertTotalsOnFirstPageOnly(pages)
+
+    def test_default_page_size(self):
+        url = reverse('salon-receipts', args=[self.salon.id])
+        with mock.patch.object(KeysetPagination, 'page_size', 3):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data['data']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_tied_rows_stay_stable_when_a_row_is_added(self):
+        url = reverse('salon-staff-receipts', args=[self.salon.id])
+        first = self.client.get(url, {'page_size': 2})
+        # a late line with the tied timestamp sorts above the cursor
+        make_receipt(self.salon, [(self.receipts[0].staff_receipts.get().staff, '1', '0')],
+                     created_at=local_datetime(2025, 3, 4), payment_status='PAID')
+
+        pages = [first]
+        while pages[-1].data['next']:
+            pages.append(self.client.get(pages[-1].data['next']))
+
+        ids = self.page_ids(pages)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, self.expected_ids(
+            StaffReceipt.objects.filter(receipt__in=self.receipts)))
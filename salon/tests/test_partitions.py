@@ -0,0 +1,67 @@
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
+
+from salon.models import ReceiptArchive
+from salon.partitions import (
+    add_months,
+    attached_partitions,
+    ensure_partitions,
+    month_start,
+    partition_name
+)
+
+from .base import SalonTestCase, local_datetime, make_receipt, make_salon, make_staff
+
+
+@skipUnless(connection.vendor == 'postgresql', 'receipt tables are partitioned on PostgreSQL')
+class EnsurePartitionsTests(SalonTestCase):
+
+    def test_months_with_rows_in_the_default_partition_are_skipped(self):
+        far = add_months(month_start(timezone.localdate()), 10)
+        # past the partitions the migration created, so it lands in the default one
+        make_receipt(make_salon(), created_at=local_datetime(far.year, far.month, 15))
+
+        out = StringIO()
+        call_command('archive_receipt_partitions', '--dry-run', '--ahead', '11', stdout=out)
+        self.assertIn(f'salon_receiptmodel_default has rows of {far:%Y-%m}', out.getvalue())
+
+        created, blocked = ensure_partitions(months_ahead=11)
+
+        self.assertEqual(blocked, [('salon_receiptmodel', far)])
+        self.assertIn(partition_name('salon_staffreceipt', far), created)
+        self.assertIn(partition_name('salon_receiptmodel', add_months(far, 1)), created)
+        with connection.cursor() as cursor:
+            self.assertNotIn(far, attached_partitions(cursor, 'salon_receiptmodel'))
+
+
+class ArchiveCutoffTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        salon = make_salon()
+        make_receipt(salon, lines=[(make_staff(salon), '40', '5')],
+                     created_at=local_datetime(2024, 3, 10))
+        ReceiptArchive.objects.create(
+            table_name='salon_receiptmodel', month=date(2024, 1, 1), chunk=0,
+            first_id=1, last_id=1, row_count=1, data=b'')
+
+    def test_commands_refuse_archived_dates(self):
+        for command in ('rebuild_staff_rollups', 'resplit_tips'):
+            with self.subTest(command), self.assertRaisesMessage(
+                    CommandError, 'Receipts before 2024-02-01 are archived'):
+                call_command(command, '--from', '2024-01-31', '--to', '2024-03-31')
+
+        with self.assertRaisesMessage(CommandError, 'archived'):
+            call_command('rebuild_staff_rollups', '--from', '2024-01-31',
+                         '--to', '2024-03-31', '--verify')
+
+    def test_commands_run_after_the_cutoff(self):
+        for command in ('rebuild_staff_rollups', 'resplit_tips'):
+            out = StringIO()
+            call_command(command, '--from', '2024-02-01', '--to', '2024-03-31', stdout=out)
+            self.assertIn('2024-02-01', out.getvalue())
@@ -0,0 +1,117 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import ProtectedError
+from django.urls import reverse
+
+from salon.models import PayPeriod, PayrollSnapshot
+from salon.payroll import close_pay_period, compute_payroll
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+START = date(2025, 3, 1)
+END = date(2025, 3, 31)
+
+
+class PayrollTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.anna = make_staff(self.salon, commission_rate=0.6)
+        self.bob = make_staff(self.salon, commission_rate=0.45)
+        self.add_receipt(self.anna, '33.33', '5.00')
+        self.add_receipt(self.anna, '10.00', '1.00')
+        self.add_receipt(self.bob, '20.00', '2.00')
+        # unpaid and out of range work is not paid out
+        self.add_receipt(self.bob, '99.00', '9.00', payment_status='PENDING')
+        self.add_receipt(self.bob, '99.00', '9.00', day=1, month=4)
+
+        self.other_salon = make_salon(owner=User.objects.create(username='other'))
+        self.add_receipt(make_staff(self.other_salon, commission_rate=0.5), '50.00', '0')
+
+    def add_receipt(self, staff, service, tip, payment_status='PAID', day=10, month=3):
+        return make_receipt(staff.salon, [(staff, service, tip)],
+                            created_at=local_datetime(2025, month, day),
+                            payment_status=payment_status)
+
+    def payroll(self, **params):
+        url = reverse('salon-payroll', args=[self.salon.id])
+        return api_client(self.owner).get(url, params)
+
+    def test_compute_payroll(self):
+        payroll = compute_payroll(START, END, salon_ids=[self.salon.id])
+
+        self.assertEqual(
+            [(row['staff_id'], row['service_amount'], row['commission_amount'],
+              row['tip_amount'], row['turn_count'], row['net_payout'])
+             for row in payroll],
+            [(self.anna.id, Decimal('43.33'), Decimal('26.00'), Decimal('6.00'), 2,
+              Decimal('32.00')),
+             (self.bob.id, Decimal('20.00'), Decimal('9.00'), Decimal('2.00'), 1,
+              Decimal('11.00'))])
+        self.assertEqual(payroll[0]['commission_rate'], Decimal('0.6000'))
+        self.assertEqual(len(compute_payroll(START, END)), 3)
+
+    def test_close_snapshots_every_salon_once(self):
+        pay_period = close_pay_period(PayPeriod.objects.create(start_date=START, end_date=END))
+
+        self.assertTrue(pay_period.is_closed)
+        self.assertEqual(pay_period.snapshots.count(), 3)
+        close_pay_period(pay_period)
+        self.assertEqual(pay_period.snapshots.count(), 3)
+
+    def test_closed_period_is_served_from_its_snapshots(self):
+        pay_period = close_pay_period(PayPeriod.objects.create(start_date=START, end_date=END))
+        # later work and a rate change don't reach a closed period
+        self.add_receipt(self.anna, '100.00', '10.00')
+        self.anna.commission_rate = 1
+        self.anna.save()
+
+        for params in ({'period': pay_period.id},
+                       {'start_date': START.isoformat(), 'end_date': END.isoformat()}):
+            response = self.payroll(**params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['period']['status'], 'CLOSED')
+            self.assertEqual([row['net_payout'] for row in response.data['data']],
+                             [Decimal('32.00'), Decimal('11.00')])
+            self.assertEqual(response.data['summary']['net_payout'], Decimal('43.00'))
+
+        response = self.payroll(start_date='2025-03-01', end_date='2025-03-30')
+        self.assertEqual(response.data['period']['status'], 'OPEN')
+        self.assertEqual(response.data['data'][0]['net_payout'], Decimal('159.33'))
+
+    def test_snapshots_are_immutable(self):
+        close_pay_period(PayPeriod.objects.create(start_date=START, end_date=END))
+        snapshot = PayrollSnapshot.objects.get(staff=self.anna)
+
+        with self.assertRaises(ValueError):
+            snapshot.save()
+        with self.assertRaises(ProtectedError):
+            self.anna.hard_delete()
+
+        # a soft-deleted staff member keeps their payroll history
+        self.anna.delete()
+        self.assertEqual(PayrollSnapshot.objects.filter(staff=self.anna).count(), 1)
+
+    def test_salon_period(self):
+        pay_period = close_pay_period(PayPeriod.objects.create(
+            salon=self.salon, start_date=START, end_date=END))
+        self.assertEqual({row.salon_id for row in pay_period.snapshots.all()},
+                         {self.salon.id})
+
+        response = self.payroll(start_date=START.isoformat(), end_date=END.isoformat())
+        self.assertEqual(response.data['period']['id'], pay_period.id)
+
+    def test_period_of_another_salon_rejected(self):
+        pay_period = PayPeriod.objects.create(
+            salon=self.other_salon, start_date=START, end_date=END)
+
+        response = self.payroll(period=pay_period.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(response.data['data'])
+
+        response = self.payroll(start_date=START.isoformat(), end_date=END.isoformat())
+        self.assertIsNone(response.data['period']['id'])
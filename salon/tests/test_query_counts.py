@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from salon.access import get_cached_salon_access
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+
+class ListQueryCountTests(SalonTestCase):
+    """
+    The receipt lists and reports load their serializer graph up front, so
+    the query count doesn't grow with the number of receipts returned.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        # run the bumps of the fixtures, a TestCase never commits them
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salon = make_salon(owner=self.owner)
+            self.staff = [make_staff(self.salon) for _ in range(3)]
+        self.client = api_client(self.owner)
+        # the SalonAccess is cached across requests, time a warm one
+        get_cached_salon_access(self.owner.id)
+
+    def add_receipts(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, count + 1):
+                make_receipt(
+                    self.salon,
+                    [(staff, '30.00', '4.00') for staff in self.staff],
+                    created_at=local_datetime(2025, 3, day),
+                    payment_status='PAID',
+                )
+
+    def assertListQueries(self, url, num):
+        """num queries for 2 receipts and still num for 12."""
+        for count in (2, 10):
+            self.add_receipts(count)
+            # new receipts bump the salon version, the reports are computed
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def test_receipt_list(self):
+        self.assertListQueries(reverse('receiptmodel-list'), 2)
+
+    def test_staff_receipt_list(self):
+        self.assertListQueries(reverse('staffreceipt-list'), 2)
+
+    def test_salon_receipts(self):
+        self.assertListQueries(reverse('salon-receipts', args=[self.salon.id]), 3)
+
+    def test_salon_staff_receipts(self):
+        self.assertListQueries(
+            reverse('salon-staff-receipts', args=[self.salon.id]), 3)
+
+    def test_salon_staff_receipts_statistics(self):
+        self.assertListQueries(
+            reverse('salon-staff-receipts-statistics', args=[self.salon.id]), 3)
+
+    def test_salon_staff_service_revenue(self):
+        self.assertListQueries(
+            reverse('salon-staff-service-revenue', args=[self.salon.id]), 3)
@@ -0,0 +1,40 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+
+from .base import SalonTestCase, local_datetime, make_receipt, make_salon, make_staff
+
+
+@skipUnless(connection.vendor == 'postgresql', 'query plans are PostgreSQL only')
+class ReportQueryPlanTests(SalonTestCase):
+    """
+    check_report_plans on a small seeded salon, with sequential scans
+    turned off: the planner then only picks one when no index applies.
+    """
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=owner)
+        other_salon = make_salon()
+        for salon in (self.salon, other_salon):
+            staff = [make_staff(salon) for _ in range(3)]
+            for day in range(1, 29):
+                make_receipt(
+                    salon,
+                    [(member, '30.00', '4.00') for member in staff],
+                    created_at=local_datetime(2025, 2, day),
+                    payment_status='PAID' if day % 2 else 'PENDING',
+                )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_report_actions_use_indexes(self):
+        for params in ('', 'created_at_range_after=2025-02-10&created_at_range_before=2025-02-20'):
+            with self.subTest(params=params):
+                call_command('check_report_plans', salon_id=self.salon.id,
+                             params=params, stdout=StringIO())
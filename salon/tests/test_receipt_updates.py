@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from salon.enums import SyncEntityEnums
+from salon.models import StaffDailyRollup, StaffReceipt, SyncTombstone
+from salon.rollups import verify_staff_daily_rollups
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+DAY = local_datetime(2025, 3, 10).date()
+
+
+class UpdateReceiptLinesTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.anna = make_staff(self.salon)
+        self.bob = make_staff(self.salon)
+        self.client = api_client(self.owner)
+
+    def make_receipt(self, line_count=2):
+        return make_receipt(
+            self.salon, [(self.anna, '30.00', '4.00')] * line_count,
+            created_at=local_datetime(2025, 3, 10))
+
+    def update(self, receipt, staff_receipts):
+        url = reverse('receiptmodel-update-receipt', args=[receipt.id])
+        response = self.client.put(
+            url, {'staff_receipts': staff_receipts}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def rollup(self, staff):
+        return StaffDailyRollup.objects.filter(
+            salon=self.salon, staff=staff, date=DAY).first()
+
+    def assertInSync(self):
+        self.assertEqual(verify_staff_daily_rollups(DAY, DAY), [])
+
+    def line_ids(self, receipt):
+        return list(receipt.staff_receipts.order_by('id').values_list('id', flat=True))
+
+    def test_insert(self):
+        receipt = self.make_receipt()
+        kept = self.line_ids(receipt)
+
+        self.update(receipt, [
+            *({'id': line_id} for line_id in kept),
+            {'staff': self.bob.id, 'service_amount': '25.00', 'tip_amount': '3.00'},
+        ])
+
+        new_line = receipt.staff_receipts.get(staff=self.bob)
+        self.assertEqual(new_line.created_at, receipt.created_at)
+        self.assertEqual(self.line_ids(receipt), [*kept, new_line.id])
+        self.assertEqual(self.rollup(self.bob).service_amount, Decimal('25.00'))
+        self.assertInSync()
+
+    def test_update(self):
+        receipt = self.make_receipt()
+        first, second = self.line_ids(receipt)
+
+        self.update(receipt, [
+            {'id': first, 'service_amount': '50.00'},
+            {'id': second, 'staff': self.bob.id},
+        ])
+
+        self.assertEqual(StaffReceipt.objects.get(id=first).service_amount, Decimal('50.00'))
+        self.assertEqual(StaffReceipt.objects.get(id=second).staff_id, self.bob.id)
+        self.assertEqual(self.rollup(self.anna).service_amount, Decimal('50.00'))
+        self.assertEqual(self.rollup(self.bob).service_amount, Decimal('30.00'))
+        self.assertInSync()
+
+    def test_delete(self):
+        receipt = self.make_receipt()
+        first, second = self.line_ids(receipt)
+
+        self.update(receipt, [{'id': first}])
+
+        self.assertEqual(self.line_ids(receipt), [first])
+        self.assertEqual(
+            list(SyncTombstone.objects.values_list('salon_id', 'entity', 'object_id')),
+            [(self.salon.id, SyncEntityEnums.STAFF_RECEIPT.value, second)])
+        self.assertEqual(self.rollup(self.anna).turn_count, 1)
+        receipt.refresh_from_db()
+        self.assertEqual(receipt.total_amount, Decimal('34.00'))
+        self.assertInSync()
+
+    def test_delete_every_line(self):
+        receipt = self.make_receipt()
+
+        self.update(receipt, [])
+
+        self.assertEqual(self.line_ids(receipt), [])
+        self.assertEqual(SyncTombstone.objects.count(), 2)
+        self.assertIsNone(self.rollup(self.anna))
+        self.assertInSync()
+
+    def test_unknown_line_rejected(self):
+        receipt = self.make_receipt()
+        other = self.make_receipt(line_count=1)
+
+        url = reverse('receiptmodel-update-receipt', args=[receipt.id])
+        response = self.client.put(
+            url, {'staff_receipts': [{'id': self.line_ids(other)[0]}]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.line_ids(receipt)), 2)
+
+    def test_query_count_does_not_grow_with_the_lines(self):
+        # load the token user's access into the cache first
+        self.update(self.make_receipt(), [])
+
+        counts = []
+        for line_count in (3, 30):
+            receipt = self.make_receipt(line_count)
+            kept, changed, *deleted = self.line_ids(receipt)
+            staff_receipts = [
+                {'id': kept},
+                {'id': changed, 'service_amount': '45.00'},
+                *({'staff': self.bob.id, 'service_amount': '10.00', 'tip_amount': '1.00'}
+                  for _ in deleted),
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.update(receipt, staff_receipts)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertInSync()
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from salon.models import ReceiptModel, Salon
+from salon.replicas import REPLICA_DB_ALIAS, ReplicaRouter, read_replica, record_write
+
+from .base import SalonTransactionTestCase, api_client, make_receipt, make_salon, make_staff
+
+
+class FakeRequest:
+    def __init__(self, user):
+        self.user = user
+
+
+def close_replica():
+    # its pooled sessions would keep the test database from being dropped
+    connection = connections[REPLICA_DB_ALIAS]
+    connection.close()
+    if hasattr(connection, 'close_pool'):
+        connection.close_pool()
+
+
+# with DB_REPLICA_HOST set, the replica alias mirrors default in tests: it
+# reads the same test database over its own connection, so the fixtures
+# have to commit for it to see them
+@skipUnless(REPLICA_DB_ALIAS in settings.DATABASES, 'no replica alias, set DB_REPLICA_HOST')
+class ReplicaRoutingTests(SalonTransactionTestCase):
+    # only configured aliases, the runner checks them even when skipping
+    databases = {'default', REPLICA_DB_ALIAS} & set(settings.DATABASES)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(close_replica)
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        make_receipt(self.salon, lines=[(make_staff(self.salon), '40', '5')])
+        self.settle_salon()
+
+    def settle_salon(self):
+        # as if the salon last changed before the read-your-writes window
+        Salon.objects.filter(id=self.salon.id).update(
+            data_changed_at=timezone.now() - timedelta(hours=1))
+        self.salon.refresh_from_db()
+
+    def test_reads_in_the_block_go_to_the_replica(self):
+        with read_replica(FakeRequest(self.owner), self.salon):
+            self.assertEqual(ReceiptModel.objects.all().db, REPLICA_DB_ALIAS)
+            self.assertEqual(ReceiptModel.objects.count(), 1)
+        self.assertEqual(ReceiptModel.objects.all().db, 'default')
+
+    def test_writes_stay_on_default(self):
+        with read_replica(FakeRequest(self.owner), self.salon):
+            receipt = make_receipt(self.salon)
+        self.assertEqual(receipt._state.db, 'default')
+        self.assertFalse(ReplicaRouter().allow_migrate(REPLICA_DB_ALIAS, 'salon'))
+
+    def test_users_who_just_wrote_read_from_default(self):
+        record_write(self.owner.id)
+
+        with read_replica(FakeRequest(self.owner), self.salon):
+            self.assertEqual(ReceiptModel.objects.all().db, 'default')
+
+    def test_recently_changed_salons_read_from_default(self):
+        make_receipt(self.salon)
+        self.salon.refresh_from_db()
+
+        with read_replica(FakeRequest(self.owner), self.salon):
+            self.assertEqual(ReceiptModel.objects.all().db, 'default')
+
+    def test_report_reads_follow_the_owners_writes(self):
+        client = api_client(self.owner)
+        url = f'/api/salons/{self.salon.id}/receipts/'
+
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+            self.assertEqual(client.get(url).status_code, 200)
+        self.assertTrue(replica_queries)
+
+        response = client.post(f'/api/salons/{self.salon.id}/create-receipt/', {
+            'staff_receipts': []}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        # the salon settled again, only the owner's own write keeps them on default
+        self.settle_salon()
+
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+            response = client.get(url)
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertFalse(replica_queries)
@@ -0,0 +1,119 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from salon.models import Salon
+
+from .base import SalonTestCase, api_client, local_datetime, make_receipt, make_salon, make_staff
+
+
+class SalonVersionTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # run the bumps of the fixtures, a TestCase never commits them
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salon = make_salon()
+            self.staff = [make_staff(self.salon) for _ in range(3)]
+        self.salon.refresh_from_db()
+
+    def salon_updates(self, queries):
+        return [query for query in queries.captured_queries
+                if query['sql'].startswith('UPDATE "salon_salon"')]
+
+    def test_one_bump_per_transaction(self):
+        version = self.salon.data_version
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    receipt = make_receipt(
+                        self.salon, [(staff, '30.00', '4.00') for staff in self.staff])
+                    with transaction.atomic():
+                        receipt.staff_receipts.first().delete()
+                    self.assertEqual(self.salon_updates(queries), [])
+
+        self.assertEqual(len(self.salon_updates(queries)), 1)
+        self.salon.refresh_from_db()
+        self.assertEqual(self.salon.data_version, version + 1)
+
+    def test_no_bump_on_rollback(self):
+        version = self.salon.data_version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    make_receipt(self.salon, [(self.staff[0], '30.00', '4.00')])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(Salon.objects.get(id=self.salon.id).data_version, version)
+
+
+class ReportValidatorTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salon = make_salon(owner=owner)
+            self.staff = make_staff(self.salon)
+        self.client = api_client(owner)
+        self.url = reverse('salon-staff-receipts-statistics', args=[self.salon.id])
+
+    def add_receipt(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_receipt(self.salon, [(self.staff, '30.00', '4.00')],
+                         created_at=local_datetime(2025, 3, 10), payment_status='PAID')
+
+    def test_etag_revalidation(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # a write within the same second still changes the ETag
+        self.add_receipt()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['total_turn'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_ignored(self):
+        self.client.get(self.url)
+        self.add_receipt()
+
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(local_datetime(2100, 1, 1).timestamp()))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['total_turn'], 1)
+
+
+class ReportCacheStatsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.url = reverse('report_cache_stats')
+
+    def test_admin_reads_the_counters(self):
+        client = api_client(self.owner)
+        report_url = reverse('salon-staff-receipts-statistics', args=[self.salon.id])
+        client.get(report_url)
+        client.get(report_url)
+
+        admin = User.objects.create(username='admin', is_staff=True)
+        response = api_client(admin).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        stats = response.data['data']['staff-receipts-statistics']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+        self.assertEqual(response.data['data']['staff-receipts']['hit_ratio'], None)
+
+    def test_owner_turned_away(self):
+        self.assertEqual(api_client(self.owner).get(self.url).status_code, 403)
@@ -0,0 +1,148 @@
+import threading
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection, transaction
+
+from salon.models import StaffDailyRollup, StaffReceipt
+from salon.rollups import rebuild_staff_daily_rollups, verify_staff_daily_rollups
+
+from .base import (
+    SalonTestCase,
+    SalonTransactionTestCase,
+    local_datetime,
+    make_receipt,
+    make_salon,
+    make_staff
+)
+
+DAY = date(2025, 3, 10)
+NEXT_DAY = date(2025, 3, 11)
+
+
+class StaffDailyRollupSignalTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.salon = make_salon()
+        self.anna = make_staff(self.salon)
+        self.bob = make_staff(self.salon)
+        self.receipt = make_receipt(
+            self.salon,
+            [(self.anna, '40.00', '5.00'), (self.anna, '20.00', '2.00')],
+            created_at=local_datetime(2025, 3, 10),
+        )
+
+    def assertInSync(self):
+        self.assertEqual(verify_staff_daily_rollups(DAY, NEXT_DAY), [])
+
+    def rollup(self, staff, day=DAY, payment_status='PENDING'):
+        return StaffDailyRollup.objects.get(
+            salon=self.salon, staff=staff, date=day, payment_status=payment_status)
+
+    def test_create(self):
+        rollup = self.rollup(self.anna)
+        self.assertEqual(rollup.service_amount, Decimal('60.00'))
+        self.assertEqual(rollup.tip_amount, Decimal('7.00'))
+        self.assertEqual(rollup.turn_count, 2)
+        self.assertInSync()
+
+    def test_update(self):
+        line = self.receipt.staff_receipts.order_by('id').first()
+        line.service_amount = Decimal('100.00')
+        line.save()
+
+        self.assertEqual(self.rollup(self.anna).service_amount, Decimal('120.00'))
+        self.assertInSync()
+
+    def test_move_to_other_staff(self):
+        line = self.receipt.staff_receipts.order_by('id').first()
+        line.staff = self.bob
+        line.save()
+
+        self.assertEqual(self.rollup(self.anna).service_amount, Decimal('20.00'))
+        self.assertEqual(self.rollup(self.bob).service_amount, Decimal('40.00'))
+        self.assertInSync()
+
+    def test_move_to_other_date(self):
+        for line in self.receipt.staff_receipts.all():
+            line.created_at = local_datetime(2025, 3, 11)
+            line.save()
+
+        self.assertFalse(StaffDailyRollup.objects.filter(date=DAY).exists())
+        self.assertEqual(self.rollup(self.anna, NEXT_DAY).turn_count, 2)
+        self.assertInSync()
+
+    def test_delete_line(self):
+        self.receipt.staff_receipts.order_by('id').first().delete()
+
+        self.assertEqual(self.rollup(self.anna).turn_count, 1)
+        self.assertInSync()
+
+    def test_bulk_delete_lines(self):
+        StaffReceipt.objects.filter(receipt=self.receipt).delete()
+
+        self.assertFalse(StaffDailyRollup.objects.exists())
+        self.assertInSync()
+
+    def test_delete_receipt(self):
+        self.receipt.delete()
+
+        self.assertFalse(StaffDailyRollup.objects.exists())
+        self.assertInSync()
+
+    def test_payment_status_change(self):
+        self.receipt.payment_status = 'PAID'
+        self.receipt.save()
+
+        self.assertEqual(self.rollup(self.anna, payment_status='PAID').turn_count, 2)
+        self.assertFalse(StaffDailyRollup.objects.filter(payment_status='PENDING').exists())
+        self.assertInSync()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs advisory locks')
+class RebuildStaffDailyRollupsTests(SalonTransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.salon = make_salon()
+        self.staff = make_staff(self.salon)
+        make_receipt(self.salon, [(self.staff, '40.00', '5.00')],
+                     created_at=local_datetime(2025, 3, 10))
+
+    def test_rebuild_waits_for_a_receipt_write(self):
+        written, release = threading.Event(), threading.Event()
+
+        def write_receipt():
+            try:
+                with transaction.atomic():
+                    make_receipt(self.salon, [(self.staff, '20.00', '2.00')],
+                                 created_at=local_datetime(2025, 3, 10))
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        def rebuild():
+            try:
+                rebuild_staff_daily_rollups(DAY, NEXT_DAY)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write_receipt)
+        writer.start()
+        written.wait(10)
+        rebuilder = threading.Thread(target=rebuild)
+        rebuilder.start()
+        rebuilder.join(0.5)
+        self.assertTrue(rebuilder.is_alive())
+
+        release.set()
+        writer.join()
+        rebuilder.join()
+
+        rollup = StaffDailyRollup.objects.get(staff=self.staff, date=DAY)
+        self.assertEqual(rollup.service_amount, Decimal('60.00'))
+        self.assertEqual(rollup.turn_count, 2)
+        self.assertEqual(verify_staff_daily_rollups(DAY, NEXT_DAY), [])
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import override_settings
+from django.urls import reverse
+
+from salon.access import ACCESS_CACHE_KEY
+from salon.hashing import make_passwords
+from salon.models import Staff
+from salon.staff_pins import PIN_VERIFIERS_CACHE_KEY
+
+from .base import SalonTestCase, api_client, make_salon, make_staff
+
+CSV = (
+    'first_name,last_name,phone,email,role,commission_rate\n'
+    'Anna,Nguyen,5550000101,anna@example.com,,0.6\n'
+    'Bob,,5550000102,,Receptionist,\n'
+)
+
+
+class ImportStaffTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.client = api_client(self.owner)
+        self.url = reverse('salon-import-staff', args=[self.salon.id])
+
+    def import_rows(self, rows):
+        return self.client.post(self.url, rows, format='json')
+
+    def test_csv_import(self):
+        upload = SimpleUploadedFile('staff.csv', CSV.encode(), content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        staff = Staff.objects.filter(id__in=response.data['data']).order_by('first_name')
+        self.assertEqual(
+            [(member.first_name, member.phone, member.role.title, member.commission_rate,
+              member.user.username) for member in staff],
+            [('Anna', '5550000101', 'Staff', 0.6, '5550000101'),
+             ('Bob', '5550000102', 'Receptionist', 0, '5550000102')])
+        self.assertTrue(all(member.salon_id == self.salon.id for member in staff))
+        # the phone is the first password, as for Staff.save()
+        self.assertTrue(staff[0].user.check_password('5550000101'))
+
+    def test_json_import_clears_the_staff_caches(self):
+        cache.set(PIN_VERIFIERS_CACHE_KEY.format(salon_id=self.salon.id), {})
+        next_user_id = User.objects.order_by('-id').first().id + 1
+        cache.set(ACCESS_CACHE_KEY.format(user_id=next_user_id), 'stale')
+
+        response = self.import_rows({'staff': [
+            {'first_name': 'Anna', 'phone': '5550000101'}]})
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIsNone(cache.get(PIN_VERIFIERS_CACHE_KEY.format(salon_id=self.salon.id)))
+        self.assertIsNone(cache.get(ACCESS_CACHE_KEY.format(user_id=next_user_id)))
+
+    def test_taken_and_repeated_phones_and_emails_rejected(self):
+        taken = make_staff(self.salon, email='taken@example.com')
+
+        response = self.import_rows([
+            {'first_name': 'Anna', 'phone': taken.phone},
+            {'first_name': 'Bob', 'phone': '5550000102', 'email': 'taken@example.com'},
+            {'first_name': 'Cam', 'phone': '5550000103', 'email': 'cam@example.com'},
+            {'first_name': 'Dan', 'phone': '5550000103', 'email': 'cam@example.com'},
+            {'first_name': 'Eve', 'phone': '5550000105', 'role': 'JANITOR'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['message']['non_field_errors']
+        self.assertIn('phone', errors[0])
+        self.assertIn('email', errors[1])
+        self.assertEqual(errors[2], {})
+        self.assertEqual(set(errors[3]), {'phone', 'email'})
+        self.assertIn('role', errors[4])
+        self.assertEqual(Staff.objects.count(), 1)
+        self.assertFalse(User.objects.filter(
+            username__in=['5550000102', '5550000103', '5550000105']).exists())
+
+    def test_all_or_nothing(self):
+        with mock.patch.object(Staff.objects, 'bulk_create',
+                               side_effect=IntegrityError('staff insert failed')):
+            response = self.import_rows([
+                {'first_name': 'Anna', 'phone': '5550000101'},
+                {'first_name': 'Bob', 'phone': '5550000102'},
+            ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username__in=['5550000101', '5550000102']).exists())
+        self.assertFalse(Staff.objects.exists())
+
+
+class MakePasswordsTests(SalonTestCase):
+
+    @override_settings(PASSWORD_HASH_WORKERS=2)
+    def test_pooled_hashes_verify(self):
+        passwords = [f'555000{index:04d}' for index in range(6)]
+
+        hashes = make_passwords(passwords)
+
+        self.assertEqual(len(set(hashes)), len(passwords))
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
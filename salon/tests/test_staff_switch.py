@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from salon.staff_pins import make_pin_hash
+
+from .base import SalonTestCase, api_client, make_salon, make_staff
+
+
+@override_settings(STAFF_PIN_MAX_FAILURES=3, STAFF_PIN_DEVICE_MAX_FAILURES=5)
+class StaffSwitchTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.salon = make_salon(owner=self.owner)
+        self.staff = make_staff(self.salon)
+        self.staff.pin_hash = make_pin_hash(self.staff.id, '1234')
+        self.staff.save()
+        # the staff member also owns a salon of their own
+        self.own_salon = make_salon(owner=self.staff.user)
+        self.device = api_client(self.owner)
+        self.url = reverse('salon-switch-staff', args=[self.salon.id])
+
+    def switch(self, pin='1234', device=None):
+        return (device or self.device).post(
+            self.url, {'staff': self.staff.id, 'pin': pin})
+
+    def switched_client(self):
+        response = self.switch()
+        self.assertEqual(response.status_code, 200, response.data)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['data']['access']}")
+        return client
+
+    def test_switch_token_never_owns(self):
+        client = self.switched_client()
+
+        self.assertEqual(client.get(reverse('salon-my-salons')).data['data'], [])
+        response = client.get(
+            reverse('salon-staff-service-revenue', args=[self.own_salon.id]))
+        self.assertIn('permission', response.data['message'])
+        # the staff member's own salon still works with their own login
+        response = api_client(self.staff.user).get(
+            reverse('salon-staff-service-revenue', args=[self.own_salon.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_switch_token_stops_when_staff_leaves(self):
+        client = self.switched_client()
+        url = reverse('salon-staff-receipts', args=[self.salon.id])
+        self.assertEqual(client.get(url).status_code, 200)
+
+        self.staff.salon = make_salon()
+        self.staff.save()
+
+        self.assertEqual(client.get(url).status_code, 401)
+
+    def test_wrong_pin(self):
+        self.assertEqual(self.switch('0000').status_code, 401)
+
+    def test_lockout_is_per_device(self):
+        for _ in range(3):
+            self.assertEqual(self.switch('0000').status_code, 401)
+        self.assertEqual(self.switch().status_code, 429)
+
+        # another device in the salon is not locked out by the first one
+        other_device = api_client(make_staff(self.salon).user)
+        self.assertEqual(self.switch(device=other_device).status_code, 200)
+
+    def test_device_limit_across_staff(self):
+        other = make_staff(self.salon)
+        for staff_id in (self.staff.id, self.staff.id, other.id, other.id, other.id):
+            response = self.device.post(self.url, {'staff': staff_id, 'pin': '0000'})
+            self.assertEqual(response.status_code, 401)
+
+        self.assertEqual(self.switch().status_code, 429)
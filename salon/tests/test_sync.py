@@ -0,0 +1,108 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from salon.models import ReceiptModel
+from salon.sync import (
+    decode_sync_token,
+    encode_sync_token,
+    get_salon_changes,
+    sync_horizon
+)
+
+from .base import SalonTransactionTestCase, make_receipt, make_salon, make_staff
+
+
+def receipt_ids(changes):
+    return [row['id'] for row in changes['receipts']]
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SalonChangesTests(SalonTransactionTestCase):
+    """Writes commit here, so the feed's horizon can move past them."""
+
+    def setUp(self):
+        super().setUp()
+        self.salon = make_salon()
+        staff = make_staff(self.salon)
+        self.receipts = [
+            make_receipt(self.salon, lines=[(staff, '40', '5')])
+            for _ in range(5)
+        ]
+
+    def test_pages_send_every_row_once_in_order(self):
+        pages = [get_salon_changes(self.salon, limit=2)]
+        while pages[-1]['has_more']:
+            pages.append(get_salon_changes(
+                self.salon, token=pages[-1]['next'], limit=2))
+
+        self.assertEqual([receipt_ids(page) for page in pages],
+                         [[r.id for r in self.receipts[:2]],
+                          [r.id for r in self.receipts[2:4]],
+                          [self.receipts[4].id]])
+        self.assertEqual(sum(len(page['staff_receipts']) for page in pages), 5)
+
+        update = ReceiptModel.objects.get(id=self.receipts[1].id)
+        update.save()
+        changes = get_salon_changes(self.salon, token=pages[-1]['next'])
+        self.assertEqual(receipt_ids(changes), [update.id])
+
+    def test_cursor_never_passes_the_horizon(self):
+        changes = get_salon_changes(self.salon)
+        horizon = sync_horizon()
+
+        for cursor in decode_sync_token(changes['next']).values():
+            self.assertLessEqual(cursor, horizon)
+
+    @skipIf(connection.vendor == 'postgresql', 'ordered by commit on PostgreSQL')
+    @override_settings(SYNC_OVERLAP_SECONDS=60)
+    def test_recent_rows_wait_for_the_overlap(self):
+        changes = get_salon_changes(self.salon)
+        self.assertEqual(receipt_ids(changes), [])
+
+        later = timezone.now() + timedelta(seconds=61)
+        with mock.patch('salon.sync.timezone.now', return_value=later):
+            changes = get_salon_changes(self.salon, token=changes['next'])
+        self.assertEqual(receipt_ids(changes), [r.id for r in self.receipts])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs sync_xid')
+    def test_rows_of_an_open_transaction_are_not_skipped(self):
+        started, release = threading.Event(), threading.Event()
+        late = []
+
+        def write_late_receipt():
+            try:
+                with transaction.atomic():
+                    late.append(make_receipt(self.salon))
+                    started.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write_late_receipt)
+        writer.start()
+        started.wait(10)
+        # commits first, with a later transaction id
+        early = make_receipt(self.salon)
+
+        changes = get_salon_changes(self.salon)
+        self.assertEqual(receipt_ids(changes), [r.id for r in self.receipts])
+
+        release.set()
+        writer.join()
+        changes = get_salon_changes(self.salon, token=changes['next'])
+        self.assertEqual(receipt_ids(changes), [late[0].id, early.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs sync_xid')
+    def test_time_based_token_is_invalid(self):
+        token = encode_sync_token({
+            name: (timezone.now(), 0)
+            for name in decode_sync_token(get_salon_changes(self.salon)['next'])
+        })
+
+        with self.assertRaisesMessage(ValueError, 'Invalid sync token'):
+            get_salon_changes(self.salon, token=token)
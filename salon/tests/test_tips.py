@@ -0,0 +1,113 @@
+from datetime import date
+from decimal import Decimal
+
+from salon.enums import TipSplitRuleEnums
+from salon.models import ReceiptModel, StaffDailyRollup
+from salon.rollups import verify_staff_daily_rollups
+from salon.tips import resplit_salon_tips, split_cents, split_tip_amounts
+
+from .base import SalonTestCase, local_datetime, make_receipt, make_salon, make_staff
+
+DAY = date(2025, 3, 10)
+
+
+class SplitTests(SalonTestCase):
+
+    def test_largest_remainder_first(self):
+        self.assertEqual(split_cents(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(split_cents(1000, [3000, 2000, 1000]), [500, 333, 167])
+        self.assertEqual(split_cents(5, [0, 0]), [3, 2])
+        self.assertEqual(split_cents(7, []), [])
+
+    def test_parts_add_up_to_the_total(self):
+        for total in (0, 1, 99, 1001, 123457):
+            for weights in ([1], [1, 2], [3333, 3333, 3334], [1, 0, 7, 19, 250]):
+                parts = split_cents(total, weights)
+                self.assertEqual(sum(parts), total, (total, weights))
+                self.assertEqual(len(parts), len(weights))
+
+    def test_equal(self):
+        self.assertEqual(
+            split_tip_amounts(Decimal('10.00'), ['30', '10', '20'], TipSplitRuleEnums.EQUAL.value),
+            (Decimal('0.00'), [Decimal('3.34'), Decimal('3.33'), Decimal('3.33')]))
+
+    def test_proportional(self):
+        self.assertEqual(
+            split_tip_amounts(Decimal('10.00'), ['30', '10', '20'],
+                              TipSplitRuleEnums.PROPORTIONAL.value),
+            (Decimal('0.00'), [Decimal('5.00'), Decimal('1.67'), Decimal('3.33')]))
+
+    def test_pooled(self):
+        house, tips = split_tip_amounts(
+            Decimal('10.01'), ['30', '10'], TipSplitRuleEnums.POOLED.value, Decimal('0.25'))
+
+        self.assertEqual(house, Decimal('2.50'))
+        self.assertEqual(tips, [Decimal('5.63'), Decimal('1.88')])
+        self.assertEqual(house + sum(tips), Decimal('10.01'))
+
+    def test_manual_is_not_split(self):
+        self.assertIsNone(
+            split_tip_amounts(Decimal('10.00'), ['30'], TipSplitRuleEnums.MANUAL.value))
+
+
+class ResplitSalonTipsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # run the bumps of the fixtures, a TestCase never commits them
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salon = make_salon(tip_split_rule=TipSplitRuleEnums.EQUAL.value)
+            self.anna = make_staff(self.salon)
+            self.bob = make_staff(self.salon)
+
+    def add_receipt(self, lines, day=10, **fields):
+        return make_receipt(self.salon, lines, created_at=local_datetime(2025, 3, day),
+                            **fields)
+
+    def tips(self, receipt):
+        return list(receipt.staff_receipts.order_by('id').values_list('tip_amount', flat=True))
+
+    def test_resplit_in_range(self):
+        receipt = self.add_receipt(
+            [(self.anna, '30.00', '9.00'), (self.bob, '10.00', '1.00')], tip_total_amount='10')
+        outside = self.add_receipt([(self.anna, '30.00', '9.00')], day=12,
+                                   tip_total_amount='1')
+
+        count = resplit_salon_tips(self.salon, DAY, DAY, rule=TipSplitRuleEnums.PROPORTIONAL.value)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(self.tips(receipt), [Decimal('7.50'), Decimal('2.50')])
+        self.assertEqual(self.tips(outside), [Decimal('9.00')])
+        self.assertEqual(
+            StaffDailyRollup.objects.get(staff=self.anna, date=DAY).tip_amount, Decimal('7.50'))
+        self.assertEqual(verify_staff_daily_rollups(DAY, date(2025, 3, 12)), [])
+
+    def test_salon_rule_by_default(self):
+        receipt = self.add_receipt(
+            [(self.anna, '30.00', '9.00'), (self.bob, '10.00', '1.00')], tip_total_amount='10')
+
+        resplit_salon_tips(self.salon, DAY, DAY)
+
+        self.assertEqual(self.tips(receipt), [Decimal('5.00'), Decimal('5.00')])
+
+    def test_manual_rule_changes_nothing(self):
+        receipt = self.add_receipt([(self.anna, '30.00', '9.00')], tip_total_amount='10')
+
+        self.assertEqual(
+            resplit_salon_tips(self.salon, DAY, DAY, rule=TipSplitRuleEnums.MANUAL.value), 0)
+        self.assertEqual(self.tips(receipt), [Decimal('9.00')])
+
+    def test_house_tip_change_bumps_the_salon_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            receipt = self.add_receipt([], tip_total_amount='10')
+        self.salon.refresh_from_db()
+        version = self.salon.data_version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resplit_salon_tips(self.salon, DAY, DAY, rule=TipSplitRuleEnums.POOLED.value,
+                               house_share=Decimal('0.5'))
+
+        self.assertEqual(ReceiptModel.objects.get(id=receipt.id).house_tip_amount,
+                         Decimal('5.00'))
+        self.salon.refresh_from_db()
+        self.assertEqual(self.salon.data_version, version + 1)
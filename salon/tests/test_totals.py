@@ -0,0 +1,131 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from salon.enums import TipSplitRuleEnums
+from salon.models import ReceiptModel
+from salon.serializers import CreateReceiptModelSerializer, UpdateReceiptModelSerializer
+
+from .base import SalonTestCase, make_receipt, make_salon, make_staff
+
+
+class ReceiptTotalsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.salon = make_salon()
+        self.staff = make_staff(self.salon)
+
+    def create_receipt(self, lines, **fields):
+        serializer = CreateReceiptModelSerializer(data={
+            'salon': self.salon.id,
+            'staff_receipts': [
+                {'staff': self.staff.id, 'service_amount': service, 'tip_amount': tip}
+                for service, tip in lines
+            ],
+            **fields,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def totals(self, receipt):
+        receipt.refresh_from_db()
+        return (receipt.sub_total_amount, receipt.tip_total_amount, receipt.total_amount)
+
+    def test_split_salon_sums_the_lines(self):
+        self.salon.tip_split_rule = TipSplitRuleEnums.EQUAL.value
+        self.salon.save()
+
+        receipt = self.create_receipt(
+            [('40', '0'), ('20', '0')], tip_total_amount='9', total_amount='1')
+
+        self.assertEqual(self.totals(receipt), (Decimal('60'), Decimal('9'), Decimal('69')))
+
+    def test_manual_salon_sums_the_line_tips(self):
+        receipt = self.create_receipt(
+            [('40', '3'), ('20', '2')], tip_total_amount='8')
+
+        self.assertEqual(self.totals(receipt), (Decimal('60'), Decimal('5'), Decimal('65')))
+
+    def test_update_sums_the_manual_line_tips(self):
+        receipt = self.create_receipt([('40', '3')], tip_total_amount='8')
+        line = receipt.staff_receipts.get()
+
+        serializer = UpdateReceiptModelSerializer(receipt, data={'staff_receipts': [
+            {'id': line.id, 'service_amount': '50', 'tip_amount': '4'}]}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self.totals(receipt), (Decimal('50'), Decimal('4'), Decimal('54')))
+
+    def test_adjusted_receipt_keeps_the_entered_total(self):
+        receipt = self.create_receipt(
+            [('40', '5')], custom_discount=10, sub_total_amount='36',
+            tip_total_amount='5', total_amount='41')
+
+        self.assertEqual(self.totals(receipt), (Decimal('40'), Decimal('5'), Decimal('41')))
+
+    def test_adjusted_total_follows_the_line_tips(self):
+        receipt = self.create_receipt(
+            [('40', '5')], return_amount='10', tip_total_amount='8', total_amount='38')
+
+        self.assertEqual(self.totals(receipt), (Decimal('40'), Decimal('5'), Decimal('35')))
+
+
+class ReconcileReceiptTotalsTests(SalonTestCase):
+
+    def setUp(self):
+        super().setUp()
+        salon = make_salon()
+        staff = make_staff(salon)
+        self.wrong = make_receipt(salon, lines=[(staff, '40', '5')], tip_total_amount='5')
+        self.also_wrong = make_receipt(salon, lines=[(staff, '30', '0')])
+        self.adjusted = make_receipt(
+            salon, lines=[(staff, '40', '5')], return_amount='10',
+            sub_total_amount='40', tip_total_amount='2', total_amount='32')
+        self.adjusted_matching = make_receipt(
+            salon, lines=[(staff, '40', '5')], return_amount='10',
+            sub_total_amount='40', tip_total_amount='5', total_amount='35')
+
+    def call(self, *args, **options):
+        out = StringIO()
+        call_command('reconcile_receipt_totals', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_report_only_lists_mismatches(self):
+        output = self.call()
+
+        self.assertIn(f'receipt {self.wrong.id} ', output)
+        self.assertIn(f'receipt {self.also_wrong.id} ', output)
+        self.assertIn(f'receipt {self.adjusted.id} (salon {self.adjusted.salon_id}): '
+                      f'sub total / tip total / total 40.00 / 2.00 / 32.00, '
+                      f'lines sum to 40.00 / 5.00 / 35.00', output)
+        self.assertNotIn(f'receipt {self.adjusted_matching.id} ', output)
+        self.assertIn('3 receipts mismatched', output)
+        self.wrong.refresh_from_db()
+        self.assertEqual(self.wrong.total_amount, 0)
+
+    def test_fix_prints_the_diff_and_repairs_only_the_chosen_receipts(self):
+        output = self.call('--fix', self.wrong.id, self.adjusted.id,
+                           self.adjusted_matching.id, '--no-input')
+
+        self.assertIn(f'receipt {self.wrong.id}: sub total / tip total / total '
+                      f'0.00 / 5.00 / 0.00 -> 40.00 / 5.00 / 45.00', output)
+        self.assertIn(f'receipt {self.adjusted.id}: sub total / tip total / total '
+                      f'40.00 / 2.00 / 32.00 -> 40.00 / 5.00 / 35.00', output)
+        self.assertIn(f'receipt {self.adjusted_matching.id}: nothing to fix', output)
+        self.assertEqual(
+            dict(ReceiptModel.objects.values_list('id', 'total_amount')),
+            {self.wrong.id: Decimal('45'), self.also_wrong.id: Decimal('0'),
+             self.adjusted.id: Decimal('35'), self.adjusted_matching.id: Decimal('35')})
+
+    def test_fix_asks_first(self):
+        with mock.patch('builtins.input', return_value='n') as prompt:
+            output = self.call('--fix', self.wrong.id)
+
+        prompt.assert_called_once()
+        self.assertIn('Nothing changed', output)
+        self.wrong.refresh_from_db()
+        self.assertEqual(self.wrong.total_amount, 0)
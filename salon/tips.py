@@ -0,0 +1,225 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .enums import TipSplitRuleEnums
+from .models import ReceiptModel, Salon, StaffReceipt
+from .report_cache import bump_salon_versions
+from .rollups import business_date, day_start, refresh_staff_daily_rollups
+
+TIP_SPLIT_RULES = {}
+
+
+def register_tip_split_rule(name):
+    """
+    Register fn(tip_cents, service_cents, house_share) -> (house_cents,
+    line_cents) under a TipSplitRuleEnums value. Amounts are int cents,
+    line_cents has one entry per service_cents entry and everything adds
+    up to tip_cents.
+    """
+    def decorator(fn):
+        TIP_SPLIT_RULES[name] = fn
+        return fn
+    return decorator
+
+
+def to_cents(value):
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def split_cents(total, weights):
+    """
+    Split int total proportionally to int weights, largest remainder
+    first, so the parts are whole cents that add up to total exactly.
+    """
+    if not weights:
+        return []
+
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+
+    parts = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        part, remainder = divmod(total * weight, weight_sum)
+        parts.append(part)
+        remainders.append((-remainder, index))
+
+    for _, index in sorted(remainders)[:total - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+
+@register_tip_split_rule(TipSplitRuleEnums.PROPORTIONAL.value)
+def split_proportional(tip_cents, service_cents, house_share):
+    return 0, split_cents(tip_cents, service_cents)
+
+
+@register_tip_split_rule(TipSplitRuleEnums.EQUAL.value)
+def split_equal(tip_cents, service_cents, house_share):
+    return 0, split_cents(tip_cents, [1] * len(service_cents))
+
+
+@register_tip_split_rule(TipSplitRuleEnums.POOLED.value)
+def split_pooled(tip_cents, service_cents, house_share):
+    house_cents = to_cents(from_cents(tip_cents) * house_share)
+    return house_cents, split_cents(tip_cents - house_cents, service_cents)
+
+
+def update_by_value(model, field, values):
+    """
+    Write {pk: value} as one UPDATE per distinct value. Split tips repeat
+    a lot, which makes this far cheaper than bulk_update's CASE per row.
+    updated_at is bumped by hand, update() skips auto_now.
+    """
+    updated_at = timezone.now()
+    ids_by_value = {}
+    for pk, value in values.items():
+        ids_by_value.setdefault(value, []).append(pk)
+
+    for value, ids in ids_by_value.items():
+        for start in range(0, len(ids), 1000):
+            model.objects.filter(
+                id__in=ids[start:start + 1000]
+            ).update(**{field: value, 'updated_at': updated_at})
+
+
+def get_tip_split_settings(salon_ids):
+    """{salon_id: (rule, house_share)} of salons that split tips server side."""
+    return {
+        salon_id: (rule, house_share)
+        for salon_id, rule, house_share in Salon.objects.filter(
+            id__in=salon_ids,
+        ).exclude(
+            tip_split_rule=TipSplitRuleEnums.MANUAL.value,
+        ).values_list('id', 'tip_split_rule', 'tip_house_share')
+    }
+
+
+def split_tip_amounts(tip_total_amount, service_amounts, rule,
+                      house_share=Decimal(0)):
+    """
+    (house_tip_amount, [tip_amount per line]) as 2-place Decimals, or None
+    when the rule doesn't split tips server side.
+    """
+    split = TIP_SPLIT_RULES.get(rule)
+    if split is None:
+        return None
+
+    house_cents, line_cents = split(
+        to_cents(tip_total_amount),
+        [to_cents(amount) for amount in service_amounts],
+        Decimal(house_share or 0),
+    )
+    return from_cents(house_cents), [from_cents(cents) for cents in line_cents]
+
+
+def split_receipt_tips(receipt, lines, rule, house_share=Decimal(0)):
+    """
+    Set tip_amount of the receipt's lines and its house_tip_amount from
+    tip_total_amount, in memory. Returns False for MANUAL salons, whose
+    client-entered tips are kept as they are.
+    """
+    split = split_tip_amounts(
+        receipt.tip_total_amount,
+        [line.service_amount for line in lines],
+        rule, house_share)
+    if split is None:
+        return False
+
+    receipt.house_tip_amount, tip_amounts = split
+    for line, tip_amount in zip(lines, tip_amounts):
+        line.tip_amount = tip_amount
+    return True
+
+
+@transaction.atomic
+def resplit_receipt_tips(receipt):
+    """Split an existing receipt's tips again, e.g. after its lines changed."""
+    settings = get_tip_split_settings([receipt.salon_id]).get(receipt.salon_id)
+    if settings is None:
+        return False
+
+    lines = list(StaffReceipt.objects.filter(receipt=receipt).order_by('id'))
+    split_receipt_tips(receipt, lines, *settings)
+
+    updated_at = timezone.now()
+    for line in lines:
+        line.updated_at = updated_at
+    StaffReceipt.objects.bulk_update(lines, ['tip_amount', 'updated_at'])
+    ReceiptModel.objects.filter(id=receipt.id).update(
+        house_tip_amount=receipt.house_tip_amount, updated_at=updated_at)
+    # update() skips the receipt signals and a house tip change alone
+    # touches no rollup, so the salon's version is moved here
+    bump_salon_versions({receipt.salon_id})
+
+    refresh_staff_daily_rollups({
+        (receipt.salon_id, line.staff_id, business_date(line.created_at))
+        for line in lines
+    })
+    return True
+
+
+@transaction.atomic
+def resplit_salon_tips(salon, date_from, date_to, rule=None, house_share=None):
+    """
+    Split again the tips of every salon receipt created between the dates,
+    with the salon's rule unless one is given. Reads receipts and lines in
+    two queries, computes in integer cents and writes only the amounts
+    that changed. Returns the number of receipts re-split.
+    """
+    rule = rule or salon.tip_split_rule
+    if house_share is None:
+        house_share = salon.tip_house_share
+    if rule not in TIP_SPLIT_RULES:
+        return 0
+
+    receipts = ReceiptModel.objects.filter(
+        salon=salon,
+        created_at__gte=day_start(date_from),
+        created_at__lt=day_start(date_to + timedelta(days=1)),
+    ).values_list('id', 'tip_total_amount', 'house_tip_amount')
+
+    # plain tuples, model instances cost more than the split itself
+    lines_by_receipt = {receipt[0]: [] for receipt in receipts}
+    lines = StaffReceipt.objects.filter(
+        receipt_id__in=lines_by_receipt,
+    ).values_list(
+        'id', 'receipt_id', 'staff_id', 'service_amount', 'tip_amount', 'created_at'
+    ).order_by('id')
+    for line in lines:
+        lines_by_receipt[line[1]].append(line)
+
+    changed_house_tips = {}
+    changed_tips = {}
+    rollup_keys = set()
+    for receipt_id, tip_total_amount, house_tip_amount in receipts:
+        receipt_lines = lines_by_receipt[receipt_id]
+        new_house_tip_amount, tip_amounts = split_tip_amounts(
+            tip_total_amount,
+            [line[3] for line in receipt_lines],
+            rule, house_share)
+
+        if new_house_tip_amount != house_tip_amount:
+            changed_house_tips[receipt_id] = new_house_tip_amount
+        for line, tip_amount in zip(receipt_lines, tip_amounts):
+            if line[4] != tip_amount:
+                changed_tips[line[0]] = tip_amount
+                rollup_keys.add((salon.id, line[2], business_date(line[5])))
+
+    update_by_value(ReceiptModel, 'house_tip_amount', changed_house_tips)
+    update_by_value(StaffReceipt, 'tip_amount', changed_tips)
+
+    # house tips don't reach the rollups, their refresh won't bump the salon
+    if changed_house_tips:
+        bump_salon_versions({salon.id})
+    refresh_staff_daily_rollups(rollup_keys)
+    return len(lines_by_receipt)
@@ -0,0 +1,208 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import ReceiptModel, StaffReceipt
+from .report_cache import bump_salon_versions
+
+CENT = Decimal('0.01')
+TOTAL_FIELDS = ('sub_total_amount', 'tip_total_amount', 'total_amount')
+# receipt level amounts the total can't be derived with, see has_adjustments
+ADJUSTMENT_FIELDS = ('custom_discount', 'return_amount', 'bonus_amount')
+
+
+def has_adjustments(adjustments, discounted_lines):
+    """
+    True when the receipt has a receipt level discount, return or bonus,
+    or discounted lines. How those reach the total is up to the client,
+    so the total of such a receipt is taken as entered.
+    """
+    return bool(discounted_lines) or any(adjustments)
+
+
+def _amount(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+def compute_totals(service_amount, tip_amount, house_tip_amount, entered=None):
+    """
+    (sub_total_amount, tip_total_amount, total_amount) of a receipt from
+    the sums of its lines. The sub total is the lines' service amounts and
+    the tip total their tips plus the house share, whatever the salon's
+    split rule. The total is the two added up, unless the receipt has
+    adjustments: then entered is its (total_amount, tip_total_amount) as
+    entered, and the total keeps the adjustments, moved by the difference
+    between the entered and the summed tips.
+    """
+    sub_total_amount = _amount(service_amount)
+    tip_total_amount = _amount(Decimal(tip_amount or 0) + Decimal(house_tip_amount or 0))
+    if entered is None:
+        total_amount = sub_total_amount + tip_total_amount
+    else:
+        entered_total, entered_tip_total = entered
+        total_amount = (_amount(entered_total) - _amount(entered_tip_total) +
+                        tip_total_amount)
+    return sub_total_amount, tip_total_amount, total_amount
+
+
+def is_discounted(line):
+    return bool(line.discount_price or line.discount_percent)
+
+
+def entered_totals(receipt, discounted_lines):
+    """What compute_totals keeps of the receipt's entered totals."""
+    if has_adjustments(
+            [getattr(receipt, field) for field in ADJUSTMENT_FIELDS],
+            discounted_lines):
+        return receipt.total_amount, receipt.tip_total_amount
+    return None
+
+
+def apply_receipt_totals(receipt, lines):
+    """
+    Set the totals of a receipt being created from its lines, in memory,
+    after its tips are split.
+    """
+    totals = compute_totals(
+        sum((Decimal(line.service_amount or 0) for line in lines), Decimal(0)),
+        sum((Decimal(line.tip_amount or 0) for line in lines), Decimal(0)),
+        receipt.house_tip_amount,
+        entered_totals(receipt, any(is_discounted(line) for line in lines)),
+    )
+    for field, value in zip(TOTAL_FIELDS, totals):
+        setattr(receipt, field, value)
+
+
+def get_line_sums(receipt_ids):
+    """
+    {receipt_id: (service amount, tip amount, line count, discounted line
+    count)} in one grouped query.
+    """
+    rows = StaffReceipt.objects.filter(
+        receipt_id__in=receipt_ids,
+    ).values('receipt_id').annotate(
+        total_service_amount=Sum('service_amount'),
+        total_tip_amount=Sum('tip_amount'),
+        line_count=Count('id'),
+        discounted_count=Count('id', filter=(
+            ~Q(discount_price=0) | ~Q(discount_percent=0))),
+    ).order_by()
+    return {
+        row['receipt_id']: (row['total_service_amount'],
+                            row['total_tip_amount'],
+                            row['line_count'],
+                            row['discounted_count'])
+        for row in rows
+    }
+
+
+def expected_receipt_totals(receipt, line_sums):
+    """Totals the receipt should have given get_line_sums() of it."""
+    service_amount, tip_amount, _, discounted_count = line_sums.get(
+        receipt.id, (0, 0, 0, 0))
+    return compute_totals(
+        service_amount, tip_amount, receipt.house_tip_amount,
+        entered_totals(receipt, discounted_count))
+
+
+def stored_totals(receipt):
+    values = (getattr(receipt, field) for field in TOTAL_FIELDS)
+    return tuple(Decimal(0) if value is None else value for value in values)
+
+
+def refresh_receipt_totals(receipt):
+    """
+    Recompute a saved receipt's totals from one aggregate over its lines,
+    writing them only when they changed.
+    """
+    totals = expected_receipt_totals(receipt, get_line_sums([receipt.id]))
+    if stored_totals(receipt) == totals:
+        return False
+
+    totals = dict(zip(TOTAL_FIELDS, totals))
+    for field, value in totals.items():
+        setattr(receipt, field, value)
+    receipt.updated_at = timezone.now()
+    ReceiptModel.objects.filter(id=receipt.id).update(
+        **totals, updated_at=receipt.updated_at)
+    return True
+
+
+def iter_receipt_total_chunks(salon_id=None, start_id=0, chunk_size=2000):
+    """
+    Walk receipts in id order, chunk_size at a time, and yield
+    (last id, receipts checked, lines summed, mismatches) per chunk, where
+    mismatches are (receipt_id, salon_id, stored totals, expected totals).
+    Only one chunk of receipts is held at a time.
+    """
+    receipts = ReceiptModel.objects.order_by('id').only(
+        'id', 'salon_id', 'house_tip_amount', *ADJUSTMENT_FIELDS, *TOTAL_FIELDS)
+    if salon_id is not None:
+        receipts = receipts.filter(salon_id=salon_id)
+
+    last_id = start_id
+    while True:
+        chunk = list(receipts.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+
+        line_sums = get_line_sums([receipt.id for receipt in chunk])
+        mismatches = []
+        for receipt in chunk:
+            expected = expected_receipt_totals(receipt, line_sums)
+            if stored_totals(receipt) != expected:
+                mismatches.append(
+                    (receipt.id, receipt.salon_id, stored_totals(receipt), expected))
+
+        yield (last_id, len(chunk),
+               sum(line_sum[2] for line_sum in line_sums.values()),
+               mismatches)
+
+
+def get_receipt_total_diffs(receipt_ids):
+    """
+    {receipt_id: (stored totals, expected totals)} of the receipts whose
+    totals don't match their lines, read without locking for a preview.
+    """
+    receipts = list(ReceiptModel.objects.filter(id__in=receipt_ids).only(
+        'id', 'salon_id', 'house_tip_amount', *ADJUSTMENT_FIELDS, *TOTAL_FIELDS))
+    line_sums = get_line_sums(receipt_ids)
+
+    diffs = {}
+    for receipt in receipts:
+        expected = expected_receipt_totals(receipt, line_sums)
+        if stored_totals(receipt) != expected:
+            diffs[receipt.id] = (stored_totals(receipt), expected)
+    return diffs
+
+
+@transaction.atomic
+def repair_receipt_totals(receipt_ids):
+    """
+    Rewrite the totals of the receipts from their lines, locked and
+    summed again so a concurrent edit is not overwritten with stale sums.
+    Returns the ids of the receipts changed.
+    """
+    receipts = list(ReceiptModel.objects.select_for_update().filter(
+        id__in=receipt_ids,
+    ).only('id', 'salon_id', 'house_tip_amount', *ADJUSTMENT_FIELDS, *TOTAL_FIELDS))
+    line_sums = get_line_sums(receipt_ids)
+
+    updated_at = timezone.now()
+    changed = []
+    for receipt in receipts:
+        totals = expected_receipt_totals(receipt, line_sums)
+        if stored_totals(receipt) == totals:
+            continue
+        for field, value in zip(TOTAL_FIELDS, totals):
+            setattr(receipt, field, value)
+        receipt.updated_at = updated_at
+        changed.append(receipt)
+
+    ReceiptModel.objects.bulk_update(
+        changed, [*TOTAL_FIELDS, 'updated_at'], batch_size=500)
+    bump_salon_versions({receipt.salon_id for receipt in changed})
+    return [receipt.id for receipt in changed]
@@ -15,6 +15,8 @@ urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('login/', views.LoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('report-cache/stats/', views.ReportCacheStatsView.as_view(),
+         name='report_cache_stats'),
 
 
 ]
@@ -2,8 +2,11 @@
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Group, User, Permission
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.db import close_old_connections, transaction
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status, permissions, views
 from rest_framework.decorators import action
@@ -12,24 +15,54 @@ from django.db.models import Sum, Count, F, DecimalField
 from django.db.models.functions import Cast
 
 from rest_framework_simplejwt.tokens import RefreshToken
+from salon.authentication import SalonRefreshToken, StaffSwitchToken
 from django.contrib.auth import authenticate
 from .serializers import UserSerializer, LoginSerializer, RegisterSerializer, StaffSerializer, AddStaffSerializer
 from django.db.models.functions import TruncDate
 from services.onesignal_service import OneSignalService
 from django.contrib.auth import authenticate
+from salon.access import get_salon_access
+from salon.exports import staff_receipt_csv_rows
+from salon.notifications import enqueue_receipt_notification, enqueue_receipt_notifications
+from salon.pagination import KeysetPagination, OptInKeysetPagination
+from salon.payroll import get_salon_pay_period, get_salon_payroll, salon_pay_periods
+from salon.rollups import day_start
+from salon.report_cache import (
+    cached_report,
+    not_modified_response,
+    report_cache_stats,
+    set_report_validators
+)
+from salon.replicas import read_replica, replica_for
+from salon.staff_import import read_staff_csv
+from salon.staff_pins import PinLocked, check_pin, make_pin_hash
+from salon.sync import get_salon_changes
+from salon.live import (
+    EventStreamRenderer,
+    LiveUnavailable,
+    check_live_available,
+    live_event_stream
+)
+from salon.metrics import metrics_allowed, registry
 from salon.permissions import (
     CanViewReceipts,
     CanViewStaff,
     IsSalonOwner,
     IsSalonStaff,
     CanDeleteStaffReceipt,
-    CanViewSalonSalaryReport
+    CanViewSalonSalaryReport,
+    CanSyncSalon,
+    CanFollowSalon,
+    CanManageSalonStaff,
+    CanSwitchSalonStaff,
+    CanSetStaffPin
 )
 
 from .models import (
     Staff,
     ReceiptModel,
     StaffReceipt,
+    StaffDailyRollup,
     Salon,
     UserDeviceModel
 )
@@ -42,7 +75,10 @@ from .serializers import (
     SalonSerializer,
     StaffLoginSerializer,
     UserDeviceModelSerializer,
-    SalonStaffSerializer
+    SalonStaffSerializer,
+    StaffImportSerializer,
+    StaffPinSerializer,
+    StaffSwitchSerializer
 )
 
 from salon.enums import (
@@ -51,6 +87,12 @@ from salon.enums import (
 )
 
 import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+BULK_CREATE_RECEIPTS_LIMIT = 500
+STAFF_IMPORT_LIMIT = 200
+SYNC_MAX_PAGE_SIZE = 1000
 
 
 class StaffFilter(django_filters.FilterSet):
@@ -79,13 +121,58 @@ class StaffViewSet(viewsets.ModelViewSet):
     search_fields = ['first_name', 'last_name', 'email', 'phone']
     ordering_fields = ['first_name', 'last_name', 'hire_date', 'salary']
 
+    # set the PIN used to switch to this staff member on a salon device
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path='set-pin',
+        url_name='set-pin',
+        permission_classes=[IsAuthenticated, CanSetStaffPin]
+    )
+    def set_pin(self, request, pk=None):
+        try:
+            staff = self.get_object()
+            serializer = StaffPinSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'status': 'error',
+                    'message': serializer.errors,
+                    'data': None
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            staff.pin_hash = make_pin_hash(staff.id, serializer.validated_data['pin'])
+            staff.save(update_fields=['pin_hash', 'updated_at'])
+            return Response({
+                'status': 'success',
+                'message': 'PIN set successfully',
+                'data': None
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def filter_business_date(queryset, name, value):
+    """
+    One local day as a range on the raw column, which indexes and receipt
+    partition pruning can use, unlike a cast to date.
+    """
+    return queryset.filter(**{
+        f'{name}__gte': day_start(value),
+        f'{name}__lt': day_start(value + timedelta(days=1)),
+    })
+
 
 class ReceiptFilter(django_filters.FilterSet):
 
-    created_at_range = django_filters.DateFromToRangeFilter()
+    created_at_range = django_filters.DateFromToRangeFilter(
+        field_name="created_at")
 
     created_at = django_filters.DateFilter(
-        field_name="created_at", lookup_expr='date')
+        field_name="created_at", method=filter_business_date)
 
     staff = django_filters.CharFilter(
         field_name='staff_receipts__staff', lookup_expr='exact'
@@ -103,8 +190,11 @@ class ReceiptModelViewSet(viewsets.ModelViewSet):
     """
     API endpoint for receipt management
     """
-    queryset = ReceiptModel.objects.all()
+    queryset = ReceiptModelSerializer.setup_eager_loading(
+        ReceiptModel.objects.all())
     serializer_class = ReceiptModelSerializer
+    # the plain list is the public contract, ?page_size= or ?cursor= pages it
+    pagination_class = OptInKeysetPagination
     filterset_class = ReceiptFilter
     search_fields = ['payment_method', 'payment_method_price']
     ordering_fields = ['created_at', 'payment_method_price']
@@ -116,46 +206,6 @@ class ReceiptModelViewSet(viewsets.ModelViewSet):
     # permission_classes = [CanViewReceipts]
     # Custom action to create receipt
 
-    def send_create_receipt_notification(self, salon_receipt):
-
-        try:
-            # comment:
-            staff_receipts = salon_receipt['staff_receipts']
-
-            notification_string = ""
-            user_ids = []
-            owner_id = salon_receipt['salon']['owner']
-            user_ids.append(owner_id)
-
-            for staff_receipt in staff_receipts:
-                user_ids.append(staff_receipt['user']['id'])
-                notification_string += f"{
-                    staff_receipt['user']['first_name']} - "
-                notification_string += f"Sale: ${
-                    staff_receipt['service_amount']} - "
-                notification_string += f"Tip: ${
-                    staff_receipt['tip_amount']} \n"
-
-            user_device_ids = UserDeviceModel.objects.filter(
-                user__id__in=user_ids,
-                device_id__isnull=False
-            ).values('device_id')
-            device_ids = [item['device_id'] for item in user_device_ids]
-
-            heading = f"New receipt: {salon_receipt["payment_status"]}"
-            notification = OneSignalService()
-
-            notification.send_notification_by_ids(
-                heading=heading,
-                content=notification_string,
-                player_ids=device_ids)
-
-        except Exception as e:
-            print(f"Error sending notification: {str(e)}")
-            return None
-        # end try
-        # )
-
     @action(detail=False, methods=['post'], url_path='create-receipt', url_name='create-receipt')
     def create_receipt(self, request):
 
@@ -164,14 +214,12 @@ class ReceiptModelViewSet(viewsets.ModelViewSet):
             serializer = CreateReceiptModelSerializer(data=request.data)
 
             if serializer.is_valid():
-                serializer.save()
+                with transaction.atomic():
+                    receipt = serializer.save()
+                    enqueue_receipt_notification(receipt, 'receipt_created')
 
-                data = serializer.add_staff_receipts(
-                    request.data.get('staff_receipts'))
-                serializer = ReceiptModelSerializer(data, many=False)
-
-                self.send_create_receipt_notification(
-                    salon_receipt=serializer.data)
+                receipt = self.get_queryset().get(id=receipt.id)
+                serializer = ReceiptModelSerializer(receipt, many=False)
 
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -179,6 +227,37 @@ class ReceiptModelViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         # end try
 
+    # create many receipts in one transaction
+    @action(detail=False, methods=['post'], url_path='bulk-create', url_name='bulk-create')
+    def bulk_create_receipts(self, request):
+        try:
+            receipts = request.data
+            if isinstance(receipts, dict):
+                receipts = receipts.get('receipts', [])
+
+            serializer = CreateReceiptModelSerializer(
+                data=receipts, many=True, max_length=BULK_CREATE_RECEIPTS_LIMIT)
+            if serializer.is_valid():
+                with transaction.atomic():
+                    receipts = serializer.save()
+                    enqueue_receipt_notifications(receipts, 'receipt_created')
+                return Response({
+                    'status': 'success',
+                    'message': 'Receipts created successfully',
+                    'data': [receipt.id for receipt in receipts]
+                }, status=status.HTTP_201_CREATED)
+            return Response({
+                'status': 'error',
+                'message': serializer.errors,
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
     # update receipt
     @action(
         detail=True,
@@ -191,18 +270,19 @@ class ReceiptModelViewSet(viewsets.ModelViewSet):
         try:
             receipt = self.get_object()
 
-            serializer = UpdateReceiptModelSerializer(
-                receipt, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
+            with transaction.atomic():
+                # concurrent edits of the receipt wait here for this one
+                receipt = ReceiptModel.objects.select_for_update().get(id=receipt.id)
+                serializer = UpdateReceiptModelSerializer(
+                    receipt, data=request.data, partial=True)
+                if serializer.is_valid():
+                    data = serializer.save()
+                    enqueue_receipt_notification(data, 'receipt_updated')
 
-                data = serializer.update_staff_receipts(
-                    request.data.get('staff_receipts'))
+            if serializer.is_valid():
+                data = self.get_queryset().get(id=data.id)
                 serializer = ReceiptModelSerializer(data, many=False)
 
-                self.send_create_receipt_notification(
-                    salon_receipt=serializer.data)
-
                 return Response({
                     'status': 'success',
                     'message': 'Receipt updated successfully',
@@ -239,7 +319,7 @@ class StaffReceiptFilter(django_filters.FilterSet):
 
     )
     created_at = django_filters.DateFilter(
-        field_name="created_at", lookup_expr='date')
+        field_name="created_at", method=filter_business_date)
     salon = django_filters.CharFilter(
         field_name='receipt__salon', lookup_expr='exact'
     )
@@ -253,12 +333,22 @@ class StaffReceiptFilter(django_filters.FilterSet):
         }
 
 
+def staff_receipt_totals(queryset):
+    return queryset.aggregate(
+        total_amount=Sum('service_amount'),
+        total_tip=Sum('tip_amount'),
+        total_turn=Count('id'),
+    )
+
+
 class StaffReceiptViewSet(viewsets.ModelViewSet):
     """
     API endpoint for staff receipt management
     """
-    queryset = StaffReceipt.objects.all()
+    queryset = StaffReceiptSerializer.setup_eager_loading(
+        StaffReceipt.objects.all())
     serializer_class = StaffReceiptSerializer
+    pagination_class = KeysetPagination
     # permission_classes = [IsAuthenticated]
     filterset_class = StaffReceiptFilter
     search_fields = ['staff', 'receipt']
@@ -268,30 +358,21 @@ class StaffReceiptViewSet(viewsets.ModelViewSet):
         try:
             queryset = self.filter_queryset(self.get_queryset())
 
-            # Calculate total amount
-            totals = queryset.aggregate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount')
-            )
-
-            # Handle None values
-            total_amount = totals.get('total_service_amount', 0)
-            total_tip = totals.get('total_tip_amount', 0)
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
 
-            # get total turn
-            total_turn = queryset.count()
-
-            serializer = self.get_serializer(queryset, many=True)
-
-            return Response({
+            response = {
                 'status': 'success',
                 'message': 'Staff receipts retrieved successfully',
                 'data': serializer.data,
-                'total_amount': total_amount,
-                'total_tip': total_tip,
-                'total_turn': total_turn,
+                'next': self.paginator.get_next_link(),
+            }
 
-            }, status=status.HTTP_200_OK)
+            # totals cover every page, only send them with the first one
+            if self.paginator.is_first_page:
+                response.update(staff_receipt_totals(queryset))
+
+            return Response(response, status=status.HTTP_200_OK)
 
         except Exception as e:
             return Response({
@@ -319,6 +400,36 @@ class StaffReceiptViewSet(viewsets.ModelViewSet):
         return super().destroy(self, request, *args, **kwargs)
 
 
+class StaffDailyRollupFilter(django_filters.FilterSet):
+    """
+    StaffReceiptFilter params that can be answered from StaffDailyRollup.
+    """
+
+    created_at_range = django_filters.DateFromToRangeFilter(
+        field_name="date",
+    )
+    created_at = django_filters.DateFilter(
+        field_name="date", lookup_expr='exact')
+    salon = django_filters.CharFilter(
+        field_name='salon', lookup_expr='exact'
+    )
+
+    class Meta:
+        model = StaffDailyRollup
+        fields = {
+            'staff': ['exact'],
+        }
+
+
+# payroll columns summed into the payroll response's summary
+PAYROLL_TOTAL_FIELDS = ('service_amount', 'commission_amount', 'tip_amount',
+                        'discount_price', 'net_payout')
+
+
+# StaffReceiptFilter params that need the raw StaffReceipt rows
+ROLLUP_UNSUPPORTED_PARAMS = ('receipt', 'created_at__gte', 'created_at__lte')
+
+
 class SalonViewSet(viewsets.ModelViewSet):
     """
     API endpoint for salon management
@@ -332,6 +443,44 @@ class SalonViewSet(viewsets.ModelViewSet):
     filterset_fields = ['name', 'address', 'phone', 'email']
     ordering = ['name', 'address', 'phone', 'email']
     date_hierarchy = 'created_at'
+
+    def get_paid_staff_receipts(self, request, salon):
+        if get_salon_access(request.user).owns(salon.id):
+            query_set = StaffReceipt.objects.filter(
+                receipt__salon=salon,
+                receipt__payment_status=PaymentStatusEnums.PAID.value,
+            ).all()
+        else:
+            query_set = StaffReceipt.objects.filter(
+                receipt__salon=salon,
+                staff_id=get_salon_access(request.user).staff_id,
+                receipt__payment_status=PaymentStatusEnums.PAID.value,
+            )
+
+        return StaffReceiptFilter(request.GET, queryset=query_set).qs
+
+    def get_staff_rollups(self, request, salon):
+        """
+        PAID StaffDailyRollup rows visible to the user, or None when the
+        filters can only be answered from the raw StaffReceipt rows.
+        """
+        if any(param in request.GET for param in ROLLUP_UNSUPPORTED_PARAMS):
+            return None
+
+        if get_salon_access(request.user).owns(salon.id):
+            query_set = StaffDailyRollup.objects.filter(
+                salon=salon,
+                payment_status=PaymentStatusEnums.PAID.value,
+            )
+        else:
+            query_set = StaffDailyRollup.objects.filter(
+                salon=salon,
+                staff_id=get_salon_access(request.user).staff_id,
+                payment_status=PaymentStatusEnums.PAID.value,
+            )
+
+        return StaffDailyRollupFilter(request.GET, queryset=query_set).qs
+
     # get salon's staffs
 
     @action(
@@ -364,23 +513,38 @@ class SalonViewSet(viewsets.ModelViewSet):
     def get_receipts(self, request, pk=None):
         try:
             salon = self.get_object()
-            if salon.owner == request.user:
+
+            not_modified = not_modified_response('receipts', request, salon)
+            if not_modified is not None:
+                return not_modified
+
+            if get_salon_access(request.user).owns(salon.id):
                 receipts = ReceiptModel.objects.filter(
                     salon=salon)
                 receipts = ReceiptFilter(request.GET, queryset=receipts).qs
             else:
                 receipts = ReceiptModel.objects.filter(
                     salon=salon,
-                    staff_receipts__staff=request.user.staff,
+                    staff_receipts__staff_id=get_salon_access(request.user).staff_id,
                 )
                 receipts = ReceiptFilter(request.GET, queryset=receipts).qs
 
-            serializer = ReceiptModelSerializer(receipts, many=True)
-            return Response({
+            with read_replica(request, salon):
+                paginator = KeysetPagination()
+                page = paginator.paginate_queryset(
+                    ReceiptModelSerializer.setup_eager_loading(receipts),
+                    request
+                )
+                serializer = ReceiptModelSerializer(page, many=True)
+                data = serializer.data
+
+            response = Response({
                 'status': 'success',
                 'message': 'Receipts retrieved successfully',
-                'data': serializer.data
+                'data': data,
+                'next': paginator.get_next_link(),
             }, status=status.HTTP_200_OK)
+            return set_report_validators(response, 'receipts', request, salon)
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -393,7 +557,12 @@ class SalonViewSet(viewsets.ModelViewSet):
     def get_staff_receipts(self, request, pk=None):
         try:
             salon = self.get_object()
-            if IsAdminUser and salon.owner == request.user:
+
+            not_modified = not_modified_response('staff-receipts', request, salon)
+            if not_modified is not None:
+                return not_modified
+
+            if get_salon_access(request.user).owns(salon.id):
                 staff_receipts = StaffReceipt.objects.filter(
                     receipt__salon=salon,
                     receipt__payment_status=PaymentStatusEnums.PAID.value,
@@ -402,34 +571,64 @@ class SalonViewSet(viewsets.ModelViewSet):
                 staff_receipts = StaffReceipt.objects.filter(
                     receipt__salon=salon,
                     receipt__payment_status=PaymentStatusEnums.PAID.value,
-                    staff=request.user.staff,
+                    staff_id=get_salon_access(request.user).staff_id,
                 )
 
             staff_receipts = StaffReceiptFilter(
                 request.GET, queryset=staff_receipts).qs
 
-            # Calculate total amount
-            totals = staff_receipts.aggregate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount')
-            )
+            def build_response():
+                paginator = KeysetPagination()
+                page = paginator.paginate_queryset(
+                    StaffReceiptSerializer.setup_eager_loading(staff_receipts),
+                    request
+                )
+                serializer = StaffReceiptSerializer(page, many=True)
 
-            # Handle None values
-            total_amount = totals.get('total_service_amount', 0)
-            total_tip = totals.get('total_tip_amount', 0)
+                response = {
+                    'status': 'success',
+                    'message': 'Staff receipts retrieved successfully',
+                    'data': serializer.data,
+                    'next': paginator.get_next_link(),
+                }
+
+                # totals cover every page, only send them with the first one
+                if paginator.is_first_page:
+                    response.update(staff_receipt_totals(staff_receipts))
+                return response
+
+            with read_replica(request, salon):
+                data = cached_report('staff-receipts', request, salon, build_response)
+            response = Response(data, status=status.HTTP_200_OK)
+            return set_report_validators(response, 'staff-receipts', request, salon)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            # get total turn
-            total_turn = staff_receipts.count()
+    # export salon's staff receipts for payroll
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='staff-receipts/export.csv',
+        url_name='staff-receipts-export',
+    )
+    def export_staff_receipts(self, request, pk=None):
+        try:
+            salon = self.get_object()
+            # rows stream after the view returns, so pin the alias up front
+            staff_receipts = self.get_paid_staff_receipts(request, salon).using(
+                replica_for(request, salon))
 
-            serializer = StaffReceiptSerializer(staff_receipts, many=True)
-            return Response({
-                'status': 'success',
-                'message': 'Staff receipts retrieved successfully',
-                'data': serializer.data,
-                'total_amount': total_amount,
-                'total_tip': total_tip,
-                'total_turn': total_turn,
-            }, status=status.HTTP_200_OK)
+            response = StreamingHttpResponse(
+                staff_receipt_csv_rows(staff_receipts),
+                content_type='text/csv'
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="salon-{salon.id}-staff-receipts.csv"')
+            return response
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -448,45 +647,48 @@ class SalonViewSet(viewsets.ModelViewSet):
         try:
             salon = self.get_object()
 
-            if salon.owner == request.user:
-                query_set = StaffReceipt.objects.filter(
-                    receipt__salon=salon,
-                    receipt__payment_status=PaymentStatusEnums.PAID.value,
-                ).all()
-            else:
-                query_set = StaffReceipt.objects.filter(
-                    receipt__salon=salon,
-                    staff=request.user.staff,
-                    receipt__payment_status=PaymentStatusEnums.PAID.value,
-                )
+            not_modified = not_modified_response('staff-receipts-statistics', request, salon)
+            if not_modified is not None:
+                return not_modified
 
-            query_set = StaffReceiptFilter(request.GET, queryset=query_set).qs
-            query_set = query_set.annotate(
-                date=TruncDate('created_at')
-            )
+            def build_response():
+                query_set = self.get_staff_rollups(request, salon)
+                total_turn = Sum('turn_count', default=0)
 
-            grouped_receipt = query_set.values(
-                'date',
-            )
+                if query_set is None:
+                    total_turn = Count('id')
+                    query_set = self.get_paid_staff_receipts(request, salon)
+                    query_set = query_set.annotate(
+                        date=TruncDate('created_at')
+                    )
 
-            grouped_receipt = grouped_receipt.annotate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount'),
-                total_turn=Count('id'),
-            ).order_by('-date')
+                grouped_receipt = query_set.values(
+                    'date',
+                )
 
-            summary = query_set.aggregate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount'),
-                total_turn=Count('id')
-            )
+                grouped_receipt = grouped_receipt.annotate(
+                    total_service_amount=Sum('service_amount'),
+                    total_tip_amount=Sum('tip_amount'),
+                    total_turn=total_turn,
+                ).order_by('-date')
 
-            return Response({
-                'status': 'success',
-                'message': 'Staff receipts statistics retrieved successfully',
-                'data': grouped_receipt,
-                'summary': summary
-            }, status=status.HTTP_200_OK)
+                summary = query_set.aggregate(
+                    total_service_amount=Sum('service_amount'),
+                    total_tip_amount=Sum('tip_amount'),
+                    total_turn=total_turn
+                )
+
+                return {
+                    'status': 'success',
+                    'message': 'Staff receipts statistics retrieved successfully',
+                    'data': list(grouped_receipt),
+                    'summary': summary
+                }
+
+            with read_replica(request, salon):
+                data = cached_report('staff-receipts-statistics', request, salon, build_response)
+            response = Response(data, status=status.HTTP_200_OK)
+            return set_report_validators(response, 'staff-receipts-statistics', request, salon)
 
         except Exception as e:
             return Response({
@@ -507,45 +709,192 @@ class SalonViewSet(viewsets.ModelViewSet):
         try:
             salon = self.get_object()
 
-            if salon.owner == request.user:
-                query_set = StaffReceipt.objects.filter(
-                    receipt__salon=salon,
-                    receipt__payment_status=PaymentStatusEnums.PAID.value,
-                ).all()
-            else:
-                query_set = StaffReceipt.objects.filter(
-                    receipt__salon=salon,
-                    staff=request.user.staff,
-                    receipt__payment_status=PaymentStatusEnums.PAID.value,
+            not_modified = not_modified_response('staff-service-revenue', request, salon)
+            if not_modified is not None:
+                return not_modified
+
+            def build_response():
+                query_set = self.get_staff_rollups(request, salon)
+                total_turn = Sum('turn_count', default=0)
+
+                if query_set is None:
+                    total_turn = Count('id')
+                    query_set = self.get_paid_staff_receipts(request, salon)
+
+                grouped_receipt = query_set.values(
+                    'staff_id',
+                    'staff__first_name',
+                    'staff__commission_rate',
                 )
 
-            query_set = StaffReceiptFilter(request.GET, queryset=query_set).qs
-           
-            grouped_receipt = query_set.values(
-                'staff_id',
-                'staff__first_name',
-                'staff__commission_rate',
-            )
+                grouped_receipt = grouped_receipt.annotate(
+                    total_service_amount=Sum('service_amount'),
+                    total_tip_amount=Sum('tip_amount'),
+                    total_turn=total_turn,
+                    service_revenue=Cast(F('total_service_amount') * F('staff__commission_rate'),
+                                         DecimalField(max_digits=10, decimal_places=2))
+                )
 
-            grouped_receipt = grouped_receipt.annotate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount'),
-                total_turn=Count('id'),
-                service_revenue=Cast(F('total_service_amount') * F('staff__commission_rate'),
-                                     DecimalField(max_digits=10, decimal_places=2))
-            )
+                summary = query_set.aggregate(
+                    total_service_amount=Sum('service_amount'),
+                    total_tip_amount=Sum('tip_amount'),
+                    total_turn=total_turn
+                )
+
+                return {
+                    'status': 'success',
+                    'message': 'Staff revenue statistics retrieved successfully',
+                    'data': list(grouped_receipt),
+                    'summary': summary
+                }
+
+            with read_replica(request, salon):
+                data = cached_report('staff-service-revenue', request, salon, build_response)
+            response = Response(data, status=status.HTTP_200_OK)
+            return set_report_validators(response, 'staff-service-revenue', request, salon)
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            summary = query_set.aggregate(
-                total_service_amount=Sum('service_amount'),
-                total_tip_amount=Sum('tip_amount'),
-                total_turn=Count('id')
+    # get what changed in the salon since a sync token
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='changes',
+        url_name='changes',
+        permission_classes=[IsAuthenticated, CanSyncSalon]
+    )
+    def get_changes(self, request, pk=None):
+        """
+        ?since=<token from the last response's next>, none for a full copy.
+        Keep calling with next while has_more is true.
+        """
+        try:
+            salon = self.get_object()
+
+            limit = request.GET.get('limit')
+            if limit:
+                limit = min(int(limit), SYNC_MAX_PAGE_SIZE)
+
+            changes = get_salon_changes(
+                salon, token=request.GET.get('since'), limit=limit)
+
+            return Response({
+                'status': 'success',
+                'message': 'Salon changes retrieved successfully',
+                'data': changes
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    # follow salon's receipts as server-sent events
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='live',
+        url_name='live',
+        permission_classes=[IsAuthenticated, CanFollowSalon],
+        renderer_classes=[JSONRenderer, EventStreamRenderer]
+    )
+    def live(self, request, pk=None):
+        """
+        Receipt created / updated / deleted events. Owners get every event,
+        or one staff member's with ?staff=, staff only their own. Reconnect
+        with Last-Event-ID (or ?last_event_id=) to resume where it stopped.
+        Only served by the ASGI app, core.asgi, with a shared broker.
+        """
+        try:
+            salon = self.get_object()
+            check_live_available(request._request)
+
+            access = get_salon_access(request.user)
+            staff_id = request.GET.get('staff')
+            if not access.owns(salon.id):
+                staff_id = access.staff_id
+
+            last_event_id = (request.headers.get('Last-Event-ID')
+                             or request.GET.get('last_event_id'))
+
+            # the stream only reads the broker, free the connection for its length
+            close_old_connections()
+
+            response = StreamingHttpResponse(
+                live_event_stream(
+                    salon.id,
+                    last_event_id=last_event_id,
+                    staff_id=int(staff_id) if staff_id else None,
+                ),
+                content_type='text/event-stream'
             )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        except LiveUnavailable as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    # get salon's payroll for a pay period
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='payroll',
+        url_name='payroll',
+        permission_classes=[IsAuthenticated, CanViewSalonSalaryReport]
+    )
+    def get_payroll(self, request, pk=None):
+        """
+        ?period=<id> for a stored PayPeriod, or ?start_date=&end_date= for
+        any range. Closed periods are served from their snapshots.
+        """
+        try:
+            salon = self.get_object()
+
+            period_id = request.GET.get('period')
+            if period_id:
+                pay_period = get_object_or_404(salon_pay_periods(salon), id=period_id)
+            else:
+                pay_period = get_salon_pay_period(
+                    salon,
+                    date.fromisoformat(request.GET['start_date']),
+                    date.fromisoformat(request.GET['end_date']),
+                )
+
+            payroll = get_salon_payroll(pay_period, salon.id)
+            summary = {
+                field: sum((row[field] for row in payroll), Decimal(0))
+                for field in PAYROLL_TOTAL_FIELDS
+            }
 
             return Response({
                 'status': 'success',
-                'message': 'Staff revenue statistics retrieved successfully',
-                'data': grouped_receipt,
-                'summary': summary
+                'message': 'Payroll retrieved successfully',
+                'data': payroll,
+                'summary': summary,
+                'period': {
+                    'id': pay_period.id,
+                    'start_date': pay_period.start_date,
+                    'end_date': pay_period.end_date,
+                    'status': pay_period.status,
+                    'closed_at': pay_period.closed_at,
+                }
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -564,11 +913,10 @@ class SalonViewSet(viewsets.ModelViewSet):
             serializer = CreateReceiptModelSerializer(data=request.data)
             if serializer.is_valid():
 
-                serializer.save(salon=salon)
-
-                data = serializer.add_staff_receipts(
-                    request.data.get('staff_receipts'))
-                serializer = ReceiptModelSerializer(data, many=False)
+                receipt = serializer.save(salon_id=salon.id)
+                receipt = ReceiptModelSerializer.setup_eager_loading(
+                    ReceiptModel.objects.all()).get(id=receipt.id)
+                serializer = ReceiptModelSerializer(receipt, many=False)
 
                 # notification = OneSignalService()
                 # res = notification.send_to_all(
@@ -597,8 +945,8 @@ class SalonViewSet(viewsets.ModelViewSet):
     )
     def get_my_salons(self, request):
         try:
-            user = request.user
-            salons = user.salon_set.all()
+            salons = Salon.objects.filter(
+                id__in=get_salon_access(request.user).owned_salon_ids)
             serializer = SalonSerializer(salons, many=True)
             return Response({
                 'status': 'success',
@@ -666,6 +1014,109 @@ class SalonViewSet(viewsets.ModelViewSet):
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    # switch the staff member using a shared salon device by PIN
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path='switch-staff',
+        url_name='switch-staff',
+        permission_classes=[IsAuthenticated, CanSwitchSalonStaff]
+    )
+    def switch_staff(self, request, pk=None):
+        """
+        The device stays signed in with its own token and posts
+        {"staff": <id>, "pin": "1234"}; the access token returned acts as
+        that staff member for STAFF_SWITCH_TOKEN_LIFETIME seconds.
+        """
+        try:
+            salon = self.get_object()
+            serializer = StaffSwitchSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'status': 'error',
+                    'message': serializer.errors,
+                    'data': None
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            access = check_pin(salon.id, serializer.validated_data['staff'],
+                               serializer.validated_data['pin'], request.user.id)
+            if access is None:
+                return Response({
+                    'status': 'error',
+                    'message': 'Invalid staff or PIN',
+                    'data': None
+                }, status=status.HTTP_401_UNAUTHORIZED)
+
+            token = StaffSwitchToken.for_access(access)
+            return Response({
+                'status': 'success',
+                'message': 'Staff switched successfully',
+                'data': {
+                    'staff_id': access.staff_id,
+                    'access': str(token),
+                    'expires_in': int(token.lifetime.total_seconds()),
+                }
+            }, status=status.HTTP_200_OK)
+        except PinLocked as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    # add many salon staff from a CSV upload or JSON
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path='import-staff',
+        url_name='import-staff',
+        permission_classes=[IsAuthenticated, CanManageSalonStaff]
+    )
+    def import_staff(self, request, pk=None):
+        """
+        Either a CSV file in the multipart field file, with a header row of
+        staff fields, or JSON: a list of staff or {"staff": [...]}. Nothing
+        is created unless every row is valid.
+        """
+        try:
+            salon = self.get_object()
+
+            if 'file' in request.FILES:
+                rows = read_staff_csv(request.FILES['file'])
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get('staff', [])
+
+            serializer = StaffImportSerializer(
+                data=rows, many=True, allow_empty=False,
+                max_length=STAFF_IMPORT_LIMIT, context={'salon': salon})
+            if not serializer.is_valid():
+                return Response({
+                    'status': 'error',
+                    'message': serializer.errors,
+                    'data': None
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            staff = serializer.save()
+            return Response({
+                'status': 'success',
+                'message': f'{len(staff)} staff added successfully',
+                'data': [member.id for member in staff]
+            }, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }, status=status.HTTP_400_BAD_REQUEST)
+
     # soft delete salon staff
     @action(
         detail=True,
@@ -697,7 +1148,7 @@ class RegisterView(views.APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = SalonRefreshToken.for_user(user)
 
             return Response({
                 'user': UserSerializer(user).data,
@@ -720,7 +1171,7 @@ class LoginView(views.APIView):
             )
 
             if user:
-                refresh = RefreshToken.for_user(user)
+                refresh = SalonRefreshToken.for_user(user)
 
                 if user:
                     return Response({
@@ -755,7 +1206,7 @@ class LoginView(views.APIView):
     #             password = request.GET.get('password')
     #             user = authenticate(username=username, password=password)
     #             if user:
-    #                 refresh = RefreshToken.for_user(user)
+    #                 refresh = SalonRefreshToken.for_user(user)
     #                 return Response({
     #                     'user': UserSerializer(user).data,
     #                     'refresh': str(refresh),
@@ -879,3 +1330,23 @@ class UserDeviceViewSet(viewsets.ModelViewSet):
                 'message': str(e),
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ReportCacheStatsView(views.APIView):
+    """Hit ratio and recompute time of the cached salon reports."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'status': 'success',
+            'message': 'Report cache stats retrieved successfully',
+            'data': report_cache_stats()
+        }, status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    """Request metrics of this worker in Prometheus text format."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
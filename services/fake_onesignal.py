@@ -0,0 +1,103 @@
+"""
+Local stand-in for the OneSignal notifications API, used to benchmark and
+exercise OneSignalService offline.
+
+    python -m services.fake_onesignal --port 8765 --latency 0.05
+    ONESIGNAL_API_ROOT=http://127.0.0.1:8765/api/v1 python manage.py send_notifications
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOneSignalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        server = self.server
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        with server.lock:
+            server.requests += 1
+            server.bodies.append(body)
+            fail = server.fail_every and server.requests % server.fail_every == 0
+            # a repeated external_id gets the first notification back, like
+            # the real API's idempotency
+            external_id = body.get('external_id')
+            notification_id = server.notifications.get(external_id)
+            if notification_id is None:
+                server.players += len(body.get('include_player_ids', []))
+                if not fail:
+                    notification_id = str(uuid.uuid4())
+                    if external_id:
+                        server.notifications[external_id] = notification_id
+
+        if fail:
+            self._send(503, {'errors': ['Service unavailable']})
+            return
+        self._send(200, {
+            'id': notification_id,
+            'recipients': len(body.get('include_player_ids', [])),
+        })
+
+    def _send(self, status_code, payload):
+        response = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOneSignalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_every=0):
+        super().__init__((host, port), FakeOneSignalHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.players = 0
+        self.notifications = {}
+        self.bodies = []
+
+    @property
+    def api_root(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api/v1'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Seconds to wait before answering each request')
+    parser.add_argument('--fail-every', type=int, default=0,
+                        help='Answer every Nth request with a 503')
+    args = parser.parse_args()
+
+    server = FakeOneSignalServer(
+        args.host, args.port, args.latency, args.fail_every)
+    print(f'Fake OneSignal listening on {server.api_root}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,101 @@
-from onesignal_sdk.client import Client
-from core.settings import (
-    ONESIGNAL_APP_ID,
-    ONESIGNAL_REST_API_KEY
-)
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_ROOT = 'https://onesignal.com/api/v1'
+NOTIFICATIONS_PATH = '/notifications'
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.5
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Process-wide httpx client, so every notification reuses the pooled
+    keep-alive connections to the provider instead of opening a new one.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=httpx.Timeout(settings.ONESIGNAL_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=settings.ONESIGNAL_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.ONESIGNAL_MAX_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class OneSignalSendError(Exception):
+    """
+    Some chunks of a send failed. failed_player_ids are the players of
+    those chunks only, the other chunks went out.
+    """
+
+    def __init__(self, error, failed_player_ids, result):
+        super().__init__(str(error))
+        self.failed_player_ids = failed_player_ids
+        self.result = result
 
 
 class OneSignalService:
-    def __init__(self):
-        self.client = Client(
-            # api_key="wokad5e5zempuazyxoym34zea",
-            app_id=ONESIGNAL_APP_ID,
-            rest_api_key=ONESIGNAL_REST_API_KEY
-        )
+    def __init__(self,
+                 api_root=None,
+                 client=None,
+                 chunk_size=None,
+                 concurrency=None,
+                 max_retries=None):
+        self.client = client or get_http_client()
+        self.url = (api_root or settings.ONESIGNAL_API_ROOT or DEFAULT_API_ROOT).rstrip('/') \
+            + NOTIFICATIONS_PATH
+        self.headers = {'Authorization': f'Basic {settings.ONESIGNAL_REST_API_KEY}'}
+        self.chunk_size = chunk_size or settings.ONESIGNAL_CHUNK_SIZE
+        self.concurrency = concurrency or settings.ONESIGNAL_CONCURRENCY
+        self.max_retries = (settings.ONESIGNAL_MAX_RETRIES
+                            if max_retries is None else max_retries)
+
+    def _post(self, notification_body):
+        """
+        POST one notification, retrying network errors and 429/5xx. Every
+        attempt carries the same external_id, OneSignal's idempotency key,
+        so a retry after a response was lost doesn't push twice.
+        """
+        payload = dict(notification_body, app_id=settings.ONESIGNAL_APP_ID)
+        payload.setdefault('external_id', str(uuid.uuid4()))
+        attempt = 0
+        while True:
+            try:
+                response = self.client.post(
+                    self.url, json=payload, headers=self.headers)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json(), attempt
+                error = httpx.HTTPStatusError(
+                    f'Unexpected http status code {response.status_code}',
+                    request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                raise error
+            attempt += 1
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
 
     def send_to_all(self,
                     heading="New Notification",
@@ -27,37 +111,84 @@ class OneSignalService:
                 'included_segments': ['All']
             }
 
-            response = self.client.send_notification(notification_body)
-            return response.body
+            body, retries = self._post(notification_body)
+            return body
 
         except Exception as e:
             print(f"Error sending notification: {str(e)}")
             return None
 
-    
+
     def send_notification_by_ids(
         self,
         player_ids,
         heading="New Notification",
         content="You have a new notification",
-        data=None
+        data=None,
+        raise_errors=False
     ):
-        try:
-            # return False
+        """
+        Send to player ids in provider sized chunks, concurrently over the
+        shared connection pool. Returns one result per chunk, the player
+        ids of the failed chunks and metrics. With raise_errors a failed
+        chunk raises OneSignalSendError carrying the same.
+        """
+        started = time.perf_counter()
+        if data is None:
             data = {'type': 'receipt'}
+        chunks = list(chunked(list(player_ids), self.chunk_size))
+
+        def send_chunk(chunk):
             notification_body = {
                 'contents': {'en': content},
                 'headings': {'en': heading},
-                'data': data or {},
-                'include_player_ids': player_ids
+                'data': data,
+                'include_player_ids': chunk
+            }
+            try:
+                response, retries = self._post(notification_body)
+                error = None
+            except Exception as e:
+                response, retries, error = None, self.max_retries, str(e)
+            return {
+                'player_ids': chunk,
+                'response': response,
+                'retries': retries,
+                'error': error,
             }
 
-            response = self.client.send_notification(notification_body)
-            
-            print(response.body)
-            
-            return None
+        if len(chunks) <= 1 or self.concurrency <= 1:
+            results = [send_chunk(chunk) for chunk in chunks]
+        else:
+            workers = min(self.concurrency, len(chunks))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(send_chunk, chunks))
 
-        except Exception as e:
-            print(f"Error sending notification: {str(e)}")
-            return None
\ No newline at end of file
+        failed = [chunk for chunk in results if chunk['error']]
+        metrics = {
+            'players': len(player_ids),
+            'chunks': len(chunks),
+            'failed_chunks': len(failed),
+            'retries': sum(chunk['retries'] for chunk in results),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        logger.info('onesignal send %s', metrics)
+
+        result = {
+            'chunks': results,
+            'responses': [chunk['response'] for chunk in results
+                          if chunk['response'] is not None],
+            'failed_player_ids': [player_id for chunk in failed
+                                  for player_id in chunk['player_ids']],
+            'metrics': metrics,
+        }
+
+        if failed:
+            if raise_errors:
+                raise OneSignalSendError(
+                    failed[0]['error'], result['failed_player_ids'], result)
+            logger.warning('onesignal send failed for %d of %d players: %s',
+                           len(result['failed_player_ids']), len(player_ids),
+                           failed[0]['error'])
+
+        return result